@@ -0,0 +1,59 @@
+"""
+Runs-per-minute of the asyncio conversation engine against an in-process stub backend.
+
+Usage:
+    python -m benchmarks.bench_async_conversations --latency 0.05 --concurrency 1 8 64
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+
+from benchmarks.common import StubChatBot, get_null_logger
+from chains.async_converse import AsyncAgentConversationExtended, run_conversations_concurrently
+from utils.config_utils import get_config_paths
+
+
+def build_manager(index: int, chat_bot: StubChatBot, code_dir: str) -> AsyncAgentConversationExtended:
+    _, _, _, task_config_path, _ = get_config_paths()
+    manager = AsyncAgentConversationExtended(
+        f"bench_app_{index}", "stub", "time checking app", get_null_logger(),
+        task_config_path, code_dir,
+    )
+    manager.chat_bot = chat_bot
+    return manager
+
+
+def run_level(concurrency: int, latency: float) -> dict:
+    chat_bot = StubChatBot(latency=latency)
+    with tempfile.TemporaryDirectory() as code_dir:
+        managers = [build_manager(i, chat_bot, code_dir) for i in range(concurrency)]
+        start = time.perf_counter()
+        results = asyncio.run(run_conversations_concurrently(managers))
+        elapsed = time.perf_counter() - start
+
+    failures = [result for result in results if isinstance(result, Exception)]
+    return {
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "runs_per_minute": concurrency / elapsed * 60,
+        "llm_calls": chat_bot.calls,
+        "failures": len(failures),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent conversation runs")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub backend latency per call in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 64], help="Concurrent runs to measure")
+    args = parser.parse_args()
+
+    print(f"{'concurrency':>12} {'elapsed_s':>10} {'runs/min':>10} {'llm_calls':>10} {'failures':>9}")
+    for concurrency in args.concurrency:
+        result = run_level(concurrency, args.latency)
+        print(f"{result['concurrency']:>12} {result['elapsed_s']:>10.3f} {result['runs_per_minute']:>10.1f} "
+              f"{result['llm_calls']:>10} {result['failures']:>9}")
+
+
+if __name__ == "__main__":
+    main()
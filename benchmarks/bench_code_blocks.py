@@ -0,0 +1,63 @@
+"""
+Parsing time of the code blocks of large Coding responses: the former TaskParser regex, applied to
+each "####"-separated part as process_output did, against the single-pass CodeBlockStreamParser fed
+the whole response or the chunks of a simulated stream.
+
+With --backticks one line of every file holds inline backticks, which the regex's ([^`]+) cannot
+cross: it backtracks over the whole part, in time quadratic in its size, and finds no block.
+
+Usage:
+    python -m benchmarks.bench_code_blocks --files 10 50 200 --lines 1000 --chunk_size 64
+    python -m benchmarks.bench_code_blocks --files 2 10 --lines 300 --backticks
+"""
+import argparse
+import re
+
+from benchmarks.common import measure, synthetic_code_response
+from postprocess.code_block_parser import parse_code_blocks
+
+# The pattern of TaskParser.extract_code_block before the single-pass parser
+LEGACY_CODE_BLOCK_PATTERN = re.compile(r'^(.*)\n```(\w+)\n(\'\'\'\n.*\n\'\'\'\n)([^`]+)```', re.MULTILINE | re.DOTALL)
+
+
+def legacy_parse(response: str) -> list:
+    blocks = []
+    for part in response.split("####"):
+        part = part.strip()
+        match = LEGACY_CODE_BLOCK_PATTERN.search(part) if part else None
+        if match:
+            blocks.append((match.group(1).strip(), match.group(2), match.group(3).strip("'''\n"),
+                           match.group(4).strip()))
+    return blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parsing of code blocks")
+    parser.add_argument("--files", type=int, nargs="+", default=[10, 50, 200], help="Files of the response")
+    parser.add_argument("--lines", type=int, default=1000, help="Code lines per file")
+    parser.add_argument("--chunk_size", type=int, default=64, help="Characters per chunk of the simulated stream")
+    parser.add_argument("--backticks", action="store_true", help="Put inline backticks in the code of every file")
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'files':>6} {'MiB':>7} {'regex_ms':>10} {'single_pass_ms':>15} {'streamed_ms':>12} "
+          f"{'regex_blocks':>13} {'blocks':>7}")
+    for num_files in args.files:
+        response = synthetic_code_response(num_files, args.lines)
+        if args.backticks:
+            response = response.replace("compute(0,", "compute(\"`0`\",")
+        chunks = [response[start:start + args.chunk_size] for start in range(0, len(response), args.chunk_size)]
+        blocks = parse_code_blocks(response)
+        assert len(blocks) == num_files
+        assert parse_code_blocks(chunks) == blocks
+
+        regex = measure(lambda: legacy_parse(response), args.iterations)
+        single_pass = measure(lambda: parse_code_blocks(response), args.iterations)
+        streamed = measure(lambda: parse_code_blocks(chunks), args.iterations)
+        print(f"{num_files:>6} {len(response) / 2 ** 20:>7.2f} {regex['p50_ms']:>10.2f} "
+              f"{single_pass['p50_ms']:>15.2f} {streamed['p50_ms']:>12.2f} {len(legacy_parse(response)):>13} "
+              f"{len(blocks):>7}")
+
+
+if __name__ == "__main__":
+    main()
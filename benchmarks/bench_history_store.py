@@ -0,0 +1,61 @@
+"""
+Cost of streaming a long run into a chat_history/ transcript: the time an append adds to Message,
+the size of the transcript against the raw JSON lines, and the time to read back a single turn
+through the offset index against decompressing the transcript up to that turn with gzip.
+
+Usage:
+    python -m benchmarks.bench_history_store --turns 200 1000 --lines 200
+"""
+import argparse
+import gzip
+import itertools
+import json
+import os
+import random
+import tempfile
+
+from benchmarks.common import measure, synthetic_code_response
+from chat.history_store import TranscriptReader, TranscriptWriter
+from chat.message import Message
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compressed chat transcripts")
+    parser.add_argument("--turns", type=int, nargs="+", default=[200, 1000], help="Responses in the transcript")
+    parser.add_argument("--lines", type=int, default=200, help="Code lines per response")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'turns':>6} {'raw_MiB':>8} {'gz_MiB':>7} {'append_ms':>10} {'index_read_ms':>14} {'gzip_scan_ms':>13}")
+    for num_turns in args.turns:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "Coding.jsonl.gz")
+            writer = TranscriptWriter(path)
+            message = Message()
+            writer.attach(message, "assistant")
+            responses = [synthetic_code_response(1 + turn % 3, args.lines) for turn in range(num_turns)]
+            appends = itertools.cycle(responses)
+            append = measure(lambda: message.assistant(next(appends)), args.iterations)
+            for response in responses:
+                message.assistant(response)
+            writer.close()
+
+            raw_size = sum(len(json.dumps(entry)) + 1 for entry in message.messages)
+            reader = TranscriptReader(path)
+            index_read = measure(lambda: reader[random.randrange(len(reader))], args.iterations)
+
+            def gzip_scan():
+                # Without the index, reaching a turn means decompressing every turn before it
+                target = random.randrange(len(reader))
+                with gzip.open(path, "rt", encoding="utf-8") as transcript:
+                    for seq, line in enumerate(transcript):
+                        if seq == target:
+                            return json.loads(line)
+
+            scan = measure(gzip_scan, max(1, args.iterations // 10))
+            print(f"{num_turns:>6} {raw_size / 2 ** 20:>8.1f} {os.path.getsize(path) / 2 ** 20:>7.1f} "
+                  f"{append['p50_ms']:>10.3f} {index_read['p50_ms']:>14.3f} {scan['p50_ms']:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Wall-clock of the Coding phase generated in one completion vs one concurrent completion per file,
+against an in-process stub backend whose latency grows with the length of its responses.
+
+Usage:
+    python -m benchmarks.bench_parallel_coding --files 1 5 20 --lines 100 --tokens_per_sec 2000
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.common import FakeChatBot, get_null_logger
+from chains.async_converse import AsyncAgentConversationExtended
+from utils.config_utils import get_config_paths
+
+
+class GeneratingChatBot(FakeChatBot):
+    """
+    FakeChatBot answering after a fixed latency plus the time to generate its response.
+
+    Attributes:
+        latency (float): Seconds before the first token.
+        tokens_per_sec (float): Generation speed, tokens being approximated by words.
+    """
+
+    def __init__(self, num_files: int, lines_per_file: int, latency: float, tokens_per_sec: float):
+        super().__init__(num_files, lines_per_file)
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+
+    async def asend_messages_and_get_response(self, messages: List[Dict[str, str]], stop_when=None) -> str:
+        self.calls += 1
+        response = self._respond(messages)
+        await asyncio.sleep(self.latency + len(response.split()) / self.tokens_per_sec)
+        return response
+
+
+def run_case(num_files: int, lines_per_file: int, latency: float, tokens_per_sec: float,
+             parallel_coding: bool) -> dict:
+    _, _, _, task_config_path, _ = get_config_paths()
+    chat_bot = GeneratingChatBot(num_files, lines_per_file, latency, tokens_per_sec)
+    with tempfile.TemporaryDirectory() as code_dir:
+        manager = AsyncAgentConversationExtended(
+            "bench_app", "stub", "time checking app", get_null_logger(), task_config_path, code_dir,
+            parallel_coding=parallel_coding,
+        )
+        manager.chat_bot = chat_bot
+        start = time.perf_counter()
+        # CodeFileGenerator prints a line per file, keep it out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager.run_conversations()
+        elapsed = time.perf_counter() - start
+        files = len(manager.intermediate_vars.codes or ())
+    return {"elapsed_s": elapsed, "llm_calls": chat_bot.calls, "files": files}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel per-file code generation")
+    parser.add_argument("--files", type=int, nargs="+", default=[1, 5, 20], help="Files of the generated app")
+    parser.add_argument("--lines", type=int, default=100, help="Code lines per file")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub backend latency per call in seconds")
+    parser.add_argument("--tokens_per_sec", type=float, default=2000, help="Stub backend generation speed")
+    args = parser.parse_args()
+
+    print(f"{'files':>6} {'single_s':>10} {'parallel_s':>11} {'speedup':>8} {'calls':>12}")
+    for num_files in args.files:
+        single = run_case(num_files, args.lines, args.latency, args.tokens_per_sec, parallel_coding=False)
+        parallel = run_case(num_files, args.lines, args.latency, args.tokens_per_sec, parallel_coding=True)
+        print(f"{num_files:>6} {single['elapsed_s']:>10.3f} {parallel['elapsed_s']:>11.3f} "
+              f"{single['elapsed_s'] / parallel['elapsed_s']:>7.2f}x "
+              f"{single['llm_calls']:>5} vs {parallel['llm_calls']:>4}")
+
+
+if __name__ == "__main__":
+    main()
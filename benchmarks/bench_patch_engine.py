@@ -0,0 +1,59 @@
+"""
+Output size of a modification phase answering with whole files against edit blocks, and the time
+the patch engine takes to apply the edits.
+
+A review cycle typically edits a few lines of one file: the whole-file response re-emits that file,
+the edit blocks only the lines that change. Tokens are approximated by words, the generation time
+by tokens / --tokens_per_sec.
+
+Usage:
+    python -m benchmarks.bench_patch_engine --files 5 20 --lines 100 1000 --edits 1 10
+"""
+import argparse
+
+from benchmarks.common import measure, synthetic_code_file, synthetic_code_response, synthetic_edit_response
+from postprocess.code_block_parser import parse_code_blocks
+from postprocess.code_repository import CodeRepository
+from postprocess.patch_engine import apply_edits, parse_edits
+
+
+def build_repository(num_files: int, lines_per_file: int) -> CodeRepository:
+    repository = CodeRepository()
+    for code_block in parse_code_blocks(synthetic_code_response(num_files, lines_per_file)):
+        repository.update_from_block(code_block)
+    return repository
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark edit-block responses against whole files")
+    parser.add_argument("--files", type=int, nargs="+", default=[5, 20], help="Files of the generated app")
+    parser.add_argument("--lines", type=int, nargs="+", default=[100, 1000], help="Code lines per file")
+    parser.add_argument("--edits", type=int, nargs="+", default=[1, 10], help="Lines edited in one file")
+    parser.add_argument("--tokens_per_sec", type=float, default=50, help="Generation speed of the backend")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'files':>6} {'lines':>6} {'edits':>6} {'file_tokens':>12} {'edit_tokens':>12} {'file_gen_s':>11} "
+          f"{'edit_gen_s':>11} {'apply_ms':>9}")
+    for num_files in args.files:
+        for lines_per_file in args.lines:
+            for num_edits in args.edits:
+                edited_lines = list(range(0, lines_per_file, max(1, lines_per_file // num_edits)))[:num_edits]
+                edit_response = synthetic_edit_response(0, edited_lines)
+                edits = parse_edits(edit_response)
+                first_versions = list(build_repository(num_files, lines_per_file))
+                result = apply_edits(CodeRepository(first_versions), edits)
+                assert not result.failed and len(result.applied) == num_edits
+
+                # Each run applies the edits to a fresh repository holding the first version of the files
+                apply = measure(lambda: apply_edits(CodeRepository(first_versions), edits), args.iterations)
+
+                file_tokens = len(synthetic_code_file(0, lines_per_file).split())
+                edit_tokens = len(edit_response.split())
+                print(f"{num_files:>6} {lines_per_file:>6} {num_edits:>6} {file_tokens:>12} {edit_tokens:>12} "
+                      f"{file_tokens / args.tokens_per_sec:>11.1f} {edit_tokens / args.tokens_per_sec:>11.1f} "
+                      f"{apply['p50_ms']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+End-to-end benchmark of the agent pipeline and its hot helpers against a fake chat bot.
+
+Every case runs with synthetic Coding responses of growing size and reports latency
+percentiles, throughput and peak traced memory. Results are stored as JSON so that two
+commits can be compared.
+
+Usage:
+    python -m benchmarks.bench_pipeline --label before
+    python -m benchmarks.bench_pipeline --label after
+    python -m benchmarks.bench_pipeline --compare benchmarks/results/before.json benchmarks/results/after.json
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+from benchmarks.common import FakeChatBot, get_null_logger, measure, synthetic_code_response
+from chains.converse import AgentConversationExtended
+from chat.openai_chat_bot import OpenAIChatBot
+from postprocess.code_block_parser import parse_code_blocks
+from postprocess.code_output_parser import TaskParser
+from postprocess.code_repository import CodeRepository
+from postprocess.codefile_creator import CodeFileGenerator
+from prompt_config.task_config_vars import IntermediateVars
+from prompt_config.taskconfig_formater import DynamicTaskConfigFormatter
+from utils.config_utils import get_config_paths
+
+# Name -> (number of files, lines per file) of the synthetic Coding response
+SIZES = {
+    "small": (1, 20),
+    "medium": (5, 200),
+    "large": (20, 1000),
+}
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def bench_pipeline(num_files, lines_per_file, iterations):
+    _, _, _, task_config_path, _ = get_config_paths()
+    logger = get_null_logger()
+
+    def run():
+        with tempfile.TemporaryDirectory() as code_dir:
+            manager = AgentConversationExtended("bench_app", "gpt-4", "time checking app", logger,
+                                                task_config_path, code_dir)
+            manager.chat_bot = FakeChatBot(num_files, lines_per_file)
+            manager.run_conversations()
+
+    return measure(run, iterations)
+
+
+def bench_extract_code_block(num_files, lines_per_file, iterations):
+    parser = TaskParser("Coding", synthetic_code_response(num_files, lines_per_file))
+    return measure(parser.extract_code_block, iterations)
+
+
+def bench_format_task_config(num_files, lines_per_file, iterations):
+    _, _, _, task_config_path, _ = get_config_paths()
+    with open(task_config_path, "r", encoding="utf-8") as config_file:
+        phase_prompt = json.load(config_file)["Coding"]["phase_prompt"] + ["Codes: \"{codes}\""]
+    codes = CodeRepository()
+    for code_block in parse_code_blocks(synthetic_code_response(num_files, lines_per_file)):
+        codes.update_from_block(code_block)
+    intermediate_vars = IntermediateVars(task="Coding", modality="Application", language="Python", codes=codes)
+
+    def run():
+        DynamicTaskConfigFormatter(intermediate_vars).format_task_config("Programmer", phase_prompt)
+
+    return measure(run, iterations)
+
+
+def bench_calculate_token_count(num_files, lines_per_file, iterations):
+    chat_bot = OpenAIChatBot(model="gpt-4")
+    response = synthetic_code_response(num_files, lines_per_file)
+    messages = [{"role": "system", "content": "You are Programmer."}]
+    for turn in range(5):
+        messages.append({"role": "user", "content": f"Turn {turn}: write the code."})
+        messages.append({"role": "assistant", "content": response})
+    return measure(lambda: chat_bot._calculate_token_count(messages), iterations)
+
+
+def bench_create_code_file(num_files, lines_per_file, iterations):
+    code = "\n".join(f"value_{line} = compute({line})" for line in range(lines_per_file * num_files))
+    counter = itertools.count()
+
+    with tempfile.TemporaryDirectory() as code_dir:
+        def run():
+            # create_code_file never overwrites, so every call writes a new file
+            generator = CodeFileGenerator(f"module_{next(counter)}", "py", "python", "Synthetic module.",
+                                          code, code_dir)
+            generator.create_code_file()
+
+        return measure(run, iterations)
+
+
+CASES = {
+    "pipeline": (bench_pipeline, 5),
+    "extract_code_block": (bench_extract_code_block, 50),
+    "format_task_config": (bench_format_task_config, 200),
+    "calculate_token_count": (bench_calculate_token_count, 20),
+    "create_code_file": (bench_create_code_file, 50),
+}
+
+
+def get_git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(cases, sizes, scale):
+    results = {}
+    for case in cases:
+        func, iterations = CASES[case]
+        for size in sizes:
+            num_files, lines_per_file = SIZES[size]
+            # CodeFileGenerator prints a line per file, keep it out of the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                stats = func(num_files, lines_per_file, max(1, int(iterations * scale)))
+            results[f"{case}/{size}"] = stats
+            print(f"{case + '/' + size:<32} p50={stats['p50_ms']:>10.3f}ms p99={stats['p99_ms']:>10.3f}ms "
+                  f"{stats['throughput_per_s']:>10.1f}/s peak={stats['peak_kib']:>10.1f}KiB")
+    return results
+
+
+def compare(base_path, new_path, threshold):
+    with open(base_path, "r", encoding="utf-8") as base_file:
+        base = json.load(base_file)
+    with open(new_path, "r", encoding="utf-8") as new_file:
+        new = json.load(new_file)
+
+    regressions = 0
+    print(f"{'case':<32} {'base p50':>12} {'new p50':>12} {'change':>8} {'base peak':>12} {'new peak':>12}")
+    for name, new_stats in new["results"].items():
+        base_stats = base["results"].get(name)
+        if base_stats is None:
+            continue
+        change = (new_stats["p50_ms"] - base_stats["p50_ms"]) / base_stats["p50_ms"] if base_stats["p50_ms"] else 0
+        flag = ""
+        if change > threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{name:<32} {base_stats['p50_ms']:>10.3f}ms {new_stats['p50_ms']:>10.3f}ms {change:>+7.1%} "
+              f"{base_stats['peak_kib']:>9.1f}KiB {new_stats['peak_kib']:>9.1f}KiB{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the agent pipeline and its hot helpers")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier of the iterations of every case")
+    parser.add_argument("--label", type=str, help="Name of the results file, defaults to the git revision")
+    parser.add_argument("--output", type=str, help="Path of the results JSON, overrides --label")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="Compare two results files")
+    parser.add_argument("--threshold", type=float, default=0.10, help="p50 slowdown reported as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(args.compare[0], args.compare[1], args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    results = run_benchmarks(args.cases, args.sizes, args.scale)
+
+    revision = get_git_revision()
+    label = args.label or revision or datetime.now().strftime("%Y%m%d%H%M%S")
+    output_path = args.output or os.path.join(RESULTS_DIR, f"{label}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        json.dump({
+            "meta": {
+                "label": label,
+                "git_revision": revision,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "created": datetime.now().isoformat(timespec="seconds"),
+            },
+            "results": results,
+        }, output_file, indent=2)
+    print(f"Results written to '{output_path}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Rendering time of the CodeReviewModification prompt with large codes: the former per-line str.format
+with every IntermediateVars field, a compiled PromptTemplate re-rendered because a field changed,
+and a compiled PromptTemplate whose fields did not change since its last rendering.
+
+Usage:
+    python -m benchmarks.bench_prompt_template --files 5 20 100 --lines 200
+"""
+import argparse
+import itertools
+import json
+
+from benchmarks.common import measure, synthetic_code_response
+from postprocess.code_block_parser import parse_code_blocks
+from postprocess.code_repository import CodeRepository
+from prompt_config.task_config_vars import IntermediateVars
+from prompt_config.taskconfig_formater import DynamicTaskConfigFormatter
+from utils.config_utils import get_config_paths
+
+
+def legacy_format_task_config(intermediate_vars, assistant_role_name, phase_prompt):
+    # DynamicTaskConfigFormatter.format_task_config before the compiled templates
+    formatted_phase_prompt = []
+    for phase_prompt_line in phase_prompt:
+        formatted_phase_prompt.append(phase_prompt_line.format(
+            assistant_role=assistant_role_name, task=intermediate_vars.task, modality=intermediate_vars.modality,
+            language=intermediate_vars.language, ideas=intermediate_vars.ideas, gui=intermediate_vars.gui,
+            codes=intermediate_vars.codes, unimplemented_file=intermediate_vars.unimplemented_file,
+            images=intermediate_vars.images, comments=intermediate_vars.comments,
+            test_reports=intermediate_vars.test_reports, error_summary=intermediate_vars.error_summary,
+            requirements=intermediate_vars.requirements,
+        ))
+    return '\n'.join(formatted_phase_prompt)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compiled prompt templates")
+    parser.add_argument("--files", type=int, nargs="+", default=[5, 20, 100], help="Files in codes")
+    parser.add_argument("--lines", type=int, default=200, help="Code lines per file")
+    parser.add_argument("--phase", type=str, default="CodeReviewModification", help="Phase of TaskConfig.json")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    _, _, _, task_config_path, _ = get_config_paths()
+    with open(task_config_path, "r", encoding="utf-8") as config_file:
+        phase_prompt = json.load(config_file)[args.phase]["phase_prompt"]
+
+    print(f"{'files':>6} {'codes_KiB':>10} {'legacy_ms':>10} {'changed_ms':>11} {'unchanged_ms':>13}")
+    for num_files in args.files:
+        codes = CodeRepository()
+        for code_block in parse_code_blocks(synthetic_code_response(num_files, args.lines)):
+            codes.update_from_block(code_block)
+        intermediate_vars = IntermediateVars(task=args.phase, modality="Application", language="Python",
+                                             codes=codes, comments="Flush the output of main().")
+        formatter = DynamicTaskConfigFormatter(intermediate_vars)
+        assert legacy_format_task_config(intermediate_vars, "Programmer", phase_prompt) == \
+            formatter.format_task_config("Programmer", phase_prompt)
+
+        legacy = measure(lambda: legacy_format_task_config(intermediate_vars, "Programmer", phase_prompt),
+                         args.iterations)
+        counter = itertools.count()
+
+        def render_changed():
+            # A new comment every time, so the template renders instead of reusing its last rendering
+            intermediate_vars.comments = f"Comment {next(counter)}"
+            formatter.format_task_config("Programmer", phase_prompt)
+
+        changed = measure(render_changed, args.iterations)
+        unchanged = measure(lambda: formatter.format_task_config("Programmer", phase_prompt), args.iterations)
+        print(f"{num_files:>6} {len(codes.render()) / 1024:>10.1f} {legacy['p50_ms']:>10.3f} "
+              f"{changed['p50_ms']:>11.3f} {unchanged['p50_ms']:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Import time of main.py startups that must stay light, measured with python -X importtime.
+
+"--help" and "--check_config" must complete without importing a provider client library or any
+other module of HEAVY_MODULES, and the modules imported by main.py, without the interpreter's own
+startup, must stay within STARTUP_BUDGET_MS. The script exits with status 1 when a startup breaks
+either rule, so it can gate a CI job. The import of the conversation engine by a run is reported
+for reference only.
+
+Usage:
+    python -m benchmarks.bench_startup --repeat 5
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+# Budget of the modules imported by a light startup, on top of the interpreter's startup
+STARTUP_BUDGET_MS = 150
+# Modules a light startup must not import
+HEAVY_MODULES = ("openai", "aiohttp", "requests", "tiktoken", "tenacity", "colorlog", "dotenv",
+                 "langchain_nvidia_ai_endpoints")
+IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# (name, command line after the interpreter, whether the budget applies)
+STARTUPS = [
+    ("main.py --help", ["main.py", "--help"], True),
+    ("main.py --check_config", ["main.py", "--check_config"], True),
+    ("import chains.runner", ["-c", "import chains.runner"], False),
+]
+
+
+def import_times(args: List[str]) -> Tuple[Dict[str, int], float]:
+    """
+    Run the interpreter with -X importtime.
+
+    Args:
+        args (List[str]): The command line after the interpreter.
+
+    Returns:
+        Tuple[Dict[str, int], float]: Every imported module with its cumulative import time in
+        microseconds, 0 for nested imports counted in their parent's, and the wall-clock time of the
+        process in milliseconds.
+    """
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=ROOT_DIR,
+                               capture_output=True, text=True)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} exited with {completed.returncode}: {completed.stderr[-2000:]}")
+
+    top_level = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            _, cumulative_us, indent, module = match.groups()
+            # Top-level imports are preceded by a single space, nested ones by two more per level
+            top_level.setdefault(module, 0)
+            if len(indent) == 1:
+                top_level[module] += int(cumulative_us)
+    return top_level, elapsed_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the import time of main.py startups")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per startup, the median is reported")
+    parser.add_argument("--budget_ms", type=float, default=STARTUP_BUDGET_MS,
+                        help="Import budget of a light startup in milliseconds")
+    args = parser.parse_args()
+
+    # The modules of the interpreter's own startup, e.g. site, are not counted against the budget
+    interpreter_modules = set(import_times(["-c", "pass"])[0])
+    failures = []
+    print(f"{'startup':<24} {'imports_ms':>11} {'process_ms':>11} {'budget_ms':>10}  heavy modules")
+    for name, command, budgeted in STARTUPS:
+        import_ms, process_ms, heavy = [], [], set()
+        for _ in range(args.repeat):
+            modules, elapsed_ms = import_times(command)
+            import_ms.append(sum(us for module, us in modules.items() if module not in interpreter_modules) / 1000)
+            process_ms.append(elapsed_ms)
+            heavy.update(module for module in modules if module.split(".")[0] in HEAVY_MODULES)
+        heavy_roots = sorted({module.split(".")[0] for module in heavy})
+        median_ms = statistics.median(import_ms)
+        print(f"{name:<24} {median_ms:>11.1f} {statistics.median(process_ms):>11.1f} "
+              f"{args.budget_ms if budgeted else '-':>10}  {', '.join(heavy_roots) or '-'}")
+        if budgeted and median_ms > args.budget_ms:
+            failures.append(f"{name} imports for {median_ms:.1f} ms, over the {args.budget_ms} ms budget")
+        if budgeted and heavy_roots:
+            failures.append(f"{name} imports {', '.join(heavy_roots)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Microbenchmark of the preflight token count over long conversations.
+
+Replays a conversation of --turns exchanges whose history grows to about --tokens tokens,
+counting the request after every appended exchange, once by re-encoding the whole
+message list and once with the per-entry counts cached on Message.
+
+Usage:
+    python -m benchmarks.bench_token_count --turns 50 --tokens 100000
+"""
+import argparse
+
+from benchmarks.common import measure, synthetic_code_response
+from chat.message import Message
+from chat.openai_chat_bot import OpenAIChatBot
+from chat.token_counter import count_message_tokens, get_encoding
+
+MODEL = "gpt-4"
+
+
+def build_exchanges(turns: int, tokens: int) -> list:
+    # Size the assistant responses so that the whole history reaches about the requested tokens
+    sample = synthetic_code_response(1, 10)
+    tokens_per_line = count_message_tokens({"role": "assistant", "content": sample}, MODEL) / 14
+    lines_per_response = max(1, int(tokens / turns / tokens_per_line) - 4)
+    response = synthetic_code_response(1, lines_per_response)
+    return [(f"Turn {turn}: review the code and continue.", response) for turn in range(turns)]
+
+
+def run_list(chat_bot: OpenAIChatBot, exchanges: list) -> int:
+    messages = [{"role": "system", "content": "You are Programmer."}]
+    num_tokens = 0
+    for user_content, assistant_content in exchanges:
+        messages.append({"role": "user", "content": user_content})
+        messages.append({"role": "assistant", "content": assistant_content})
+        num_tokens = chat_bot._calculate_token_count(messages)
+    return num_tokens
+
+
+def run_message(chat_bot: OpenAIChatBot, exchanges: list) -> int:
+    message = Message()
+    message.system("You are Programmer.")
+    num_tokens = 0
+    for user_content, assistant_content in exchanges:
+        message.user(user_content)
+        message.assistant(assistant_content)
+        num_tokens = chat_bot._calculate_token_count(message)
+    return num_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the preflight token count of long conversations")
+    parser.add_argument("--turns", type=int, default=50, help="Number of exchanges in the conversation")
+    parser.add_argument("--tokens", type=int, default=100000, help="Approximate tokens of the final history")
+    parser.add_argument("--iterations", type=int, default=5, help="Number of timed conversations per case")
+    args = parser.parse_args()
+
+    chat_bot = OpenAIChatBot(model=MODEL)
+    exchanges = build_exchanges(args.turns, args.tokens)
+    # Load the encoding before timing either case
+    get_encoding(MODEL)
+
+    final_tokens = run_list(chat_bot, exchanges)
+    assert final_tokens == run_message(chat_bot, exchanges), "Cached and uncached counts differ"
+    print(f"{args.turns} turns, {final_tokens} tokens in the final request")
+
+    for name, func in [("list (re-encode history)", run_list), ("Message (cached counts)", run_message)]:
+        stats = measure(lambda: func(chat_bot, exchanges), args.iterations)
+        per_turn_ms = stats["mean_ms"] / args.turns
+        print(f"{name:<28} conversation p50={stats['p50_ms']:>10.2f}ms mean/turn={per_turn_ms:>8.3f}ms "
+              f"peak={stats['peak_kib']:>10.1f}KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Behaviour checks of the patch engine, which rewrites the generated files of codes/ from the edit
+blocks and unified diffs of the modification phases.
+
+Each check parses and applies a response to a small repository and asserts on the outcome. The
+script exits with status 1 when a check fails, so it can gate a CI job next to the benchmarks.
+
+Usage:
+    python -m benchmarks.check_patch_engine
+"""
+import sys
+import traceback
+
+from postprocess.code_repository import CodeRepository
+from postprocess.patch_engine import FileEdit, apply_edits, parse_edits
+
+MAIN_PY = """def f():
+    x = 1
+    return x
+
+
+def g():
+    return None
+"""
+
+QUERY_SQL = """-- old comment
+SELECT 1;
+"""
+
+
+def make_repository(*files) -> CodeRepository:
+    repository = CodeRepository()
+    for path, content in files:
+        repository.update(path, "Python" if path.endswith(".py") else "SQL", "", content)
+    return repository
+
+
+def check_removed_sql_comment_line():
+    # "-- old comment" is removed as "--- old comment", which must not read as a file header
+    edits = parse_edits("--- a/query.sql\n+++ b/query.sql\n@@ -1,2 +1,2 @@\n--- old comment\n+-- new comment\n SELECT 1;\n")
+    assert edits == [FileEdit("query.sql", "-- old comment\nSELECT 1;", "-- new comment\nSELECT 1;")], edits
+    result = apply_edits(make_repository(("query.sql", QUERY_SQL)), edits)
+    assert not result.failed and result.updated[0].content == "-- new comment\nSELECT 1;\n", result
+
+
+def check_hunks_of_several_files():
+    response = ("--- a/main.py\n+++ b/main.py\n@@ -2 +2 @@\n-    x = 1\n+    x = 2\n"
+                "--- a/query.sql\n+++ b/query.sql\n@@ -2 +2 @@\n-SELECT 1;\n+SELECT 2;\n")
+    assert parse_edits(response) == [FileEdit("main.py", "    x = 1", "    x = 2"),
+                                      FileEdit("query.sql", "SELECT 1;", "SELECT 2;")], parse_edits(response)
+
+
+def check_undercounted_hunk():
+    edits = parse_edits("--- a/main.py\n+++ b/main.py\n@@ -2 +2 @@\n-    x = 1\n+    x = 2\n+    y = 3\n")
+    assert edits == [FileEdit("main.py", "    x = 1", "    x = 2\n    y = 3")], edits
+
+
+def check_missing_search_with_replace_elsewhere():
+    # "return None" is in g(), that does not make an edit of a line f() never had applied
+    edit = FileEdit("main.py", "def f():\n    x = 11\n", "    return None")
+    result = apply_edits(make_repository(("main.py", MAIN_PY)), [edit])
+    assert result.failed == [edit] and not result.applied and not result.updated, result
+
+
+def check_already_applied_edit():
+    repository = make_repository(("main.py", MAIN_PY))
+    edits = parse_edits("main.py\n<<<<<<< SEARCH\n    x = 1\n=======\n    x = 2\n>>>>>>> REPLACE\n")
+    first = apply_edits(repository, edits)
+    assert first.applied == edits and len(first.updated) == 1, first
+    again = apply_edits(repository, edits)
+    assert again.applied == edits and not again.failed and not again.updated, again
+
+    # Within a single response, an edit repeated after it was applied is not applied twice
+    repository = make_repository(("main.py", MAIN_PY))
+    twice = apply_edits(repository, edits + edits)
+    assert len(twice.applied) == 2 and not twice.failed, twice
+    assert repository.get("main.py").content.count("x = 2") == 1
+
+
+def check_whitespace_insensitive_match():
+    edit = FileEdit("main.py", "x = 1\n  return x", "    x = 3\n    return x")
+    result = apply_edits(make_repository(("main.py", MAIN_PY)), [edit])
+    assert result.applied == [edit], result
+    assert "    x = 3\n    return x\n" in result.updated[0].content, result.updated[0].content
+
+
+def check_new_file_hunk():
+    edits = parse_edits("--- /dev/null\n+++ b/utils.py\n@@ -0,0 +1,2 @@\n+def h():\n+    return 1\n")
+    assert edits == [FileEdit("utils.py", "", "def h():\n    return 1")], edits
+    repository = make_repository(("main.py", MAIN_PY))
+    result = apply_edits(repository, edits)
+    assert result.applied == edits and repository.get("utils.py").content == "def h():\n    return 1", result
+
+
+def check_edit_of_missing_file():
+    edit = FileEdit("missing.py", "x = 1", "x = 2")
+    result = apply_edits(make_repository(("main.py", MAIN_PY)), [edit])
+    assert result.failed == [edit] and not result.updated, result
+
+
+CHECKS = [
+    check_removed_sql_comment_line,
+    check_hunks_of_several_files,
+    check_undercounted_hunk,
+    check_missing_search_with_replace_elsewhere,
+    check_already_applied_edit,
+    check_whitespace_insensitive_match,
+    check_new_file_hunk,
+    check_edit_of_missing_file,
+]
+
+
+def main():
+    failures = 0
+    for check in CHECKS:
+        try:
+            check()
+        except AssertionError:
+            failures += 1
+            print(f"FAIL: {check.__name__}")
+            traceback.print_exc()
+        else:
+            print(f"ok: {check.__name__}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
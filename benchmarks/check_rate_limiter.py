@@ -0,0 +1,106 @@
+"""
+Behaviour checks of the classification of provider errors by the rate limiter, which decides which
+failed requests are retried and which ones shrink the concurrency of a provider/model.
+
+Each check raises a provider-shaped error and asserts on its classification or on the limiter. The
+script exits with status 1 when a check fails, so it can gate a CI job next to the benchmarks.
+
+Usage:
+    python -m benchmarks.check_rate_limiter
+"""
+import sys
+import traceback
+
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_none
+
+from llms.rate_limiter import (RateLimitConfig, RateLimiter, get_error_status, is_throttle_error,
+                               is_transient_error)
+
+
+def nvidia_error(status: int, reason: str) -> Exception:
+    # ChatNVIDIA raises a bare Exception whose message starts with the status, "from None"
+    try:
+        raise Exception(f"[{status}] {reason}\nMessage: upstream error\nURL: https://integrate.api.nvidia.com/v1")
+    except Exception as e:
+        return e
+
+
+class OpenAIStyleError(Exception):
+    def __init__(self, message: str, http_status: int):
+        super().__init__(message)
+        self.http_status = http_status
+
+
+def check_nvidia_429_is_throttle():
+    error = nvidia_error(429, "Too Many Requests")
+    assert get_error_status(error) == 429
+    assert is_throttle_error(error) and is_transient_error(error)
+
+
+def check_nvidia_5xx_is_transient():
+    error = nvidia_error(503, "Service Unavailable")
+    assert is_transient_error(error) and not is_throttle_error(error)
+
+
+def check_nvidia_4xx_is_not_retried():
+    for status, reason in ((400, "Bad Request"), (401, "Unauthorized"), (422, "Unprocessable Entity")):
+        error = nvidia_error(status, reason)
+        assert not is_transient_error(error), (status, reason)
+
+
+def check_attribute_status():
+    assert is_throttle_error(OpenAIStyleError("Rate limit reached", 429))
+    assert not is_transient_error(OpenAIStyleError("[429] in the text but 400 in the status", 400))
+    assert get_error_status(ValueError("no status here")) is None
+
+
+def check_nvidia_429_is_retried():
+    attempts = []
+
+    @retry(retry=retry_if_exception(is_transient_error), wait=wait_none(), stop=stop_after_attempt(3), reraise=True)
+    def request():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise nvidia_error(429, "Too Many Requests")
+        return "ok"
+
+    assert request() == "ok" and len(attempts) == 2, attempts
+
+
+def check_nvidia_429_decreases_concurrency():
+    limiter = RateLimiter(RateLimitConfig(max_concurrency=8, decrease_factor=0.5))
+    try:
+        with limiter.limit():
+            raise nvidia_error(429, "Too Many Requests")
+    except Exception:
+        pass
+    stats = limiter.stats()
+    assert stats["concurrency"] == 4 and stats["throttled"] == 1, stats
+
+
+CHECKS = [
+    check_nvidia_429_is_throttle,
+    check_nvidia_5xx_is_transient,
+    check_nvidia_4xx_is_not_retried,
+    check_attribute_status,
+    check_nvidia_429_is_retried,
+    check_nvidia_429_decreases_concurrency,
+]
+
+
+def main():
+    failures = 0
+    for check in CHECKS:
+        try:
+            check()
+        except AssertionError:
+            failures += 1
+            print(f"FAIL: {check.__name__}")
+            traceback.print_exc()
+        else:
+            print(f"ok: {check.__name__}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Behaviour checks of the response cache, which serves the responses of identical requests across
+runs and keeps the total size of the cached responses under its budget.
+
+Each check fills a cache in a temporary directory and asserts on its keys, contents or size. The
+script exits with status 1 when a check fails, so it can gate a CI job next to the benchmarks.
+
+Usage:
+    python -m benchmarks.check_response_cache
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import traceback
+
+from chat.response_cache import ResponseCache
+from chat.streaming import CodeFenceTerminator, describe_stop_condition, info_line_terminator
+
+MESSAGES = [{"role": "system", "content": "You are a programmer."}, {"role": "user", "content": "Write main.py"}]
+
+
+def summed_size(cache: ResponseCache) -> int:
+    return cache._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+
+def check_running_total():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ResponseCache(os.path.join(directory, "cache.sqlite"), max_bytes=500)
+        for index in range(50):
+            cache.set(f"key{index % 20}", "x" * (10 + index))
+            assert cache.stats()["bytes"] == summed_size(cache), (index, cache.stats())
+        stats = cache.stats()
+        assert stats["bytes"] <= 500 and stats["entries"] < 20, stats
+        # The most recent responses are kept
+        assert cache.get("key9") == "x" * 59
+        cache.close()
+
+
+def check_total_of_existing_database():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.sqlite")
+        # A database written before the total was kept has no cache_size table
+        connection = sqlite3.connect(path)
+        connection.execute("CREATE TABLE responses ("
+                           "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)")
+        connection.execute("INSERT INTO responses VALUES ('old', 'abc', 3, 0)")
+        connection.commit()
+        connection.close()
+        cache = ResponseCache(path)
+        cache.set("new", "defg")
+        assert cache.stats()["bytes"] == 7 and cache.get("old") == "abc", cache.stats()
+        cache.close()
+
+
+def check_stop_condition_in_key():
+    unbounded = ResponseCache.make_key("openai", "gpt-4", MESSAGES, None)
+    assert unbounded == ResponseCache.make_key("openai", "gpt-4", MESSAGES, None, describe_stop_condition(None))
+    keys = {
+        unbounded,
+        ResponseCache.make_key("openai", "gpt-4", MESSAGES, None, describe_stop_condition(info_line_terminator)),
+        ResponseCache.make_key("openai", "gpt-4", MESSAGES, None, describe_stop_condition(CodeFenceTerminator(1))),
+        ResponseCache.make_key("openai", "gpt-4", MESSAGES, None, describe_stop_condition(CodeFenceTerminator(2))),
+    }
+    assert len(keys) == 4, keys
+
+
+def check_stable_stop_condition_description():
+    assert describe_stop_condition(info_line_terminator) == "chat.streaming.info_line_terminator"
+    assert describe_stop_condition(CodeFenceTerminator(1)) == describe_stop_condition(CodeFenceTerminator(1))
+    assert "'expected_blocks': '1'" in describe_stop_condition(CodeFenceTerminator(1))
+
+
+CHECKS = [
+    check_running_total,
+    check_total_of_existing_database,
+    check_stop_condition_in_key,
+    check_stable_stop_condition_description,
+]
+
+
+def main():
+    failures = 0
+    for check in CHECKS:
+        try:
+            check()
+        except AssertionError:
+            failures += 1
+            print(f"FAIL: {check.__name__}")
+            traceback.print_exc()
+        else:
+            print(f"ok: {check.__name__}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
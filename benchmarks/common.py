@@ -0,0 +1,261 @@
+import asyncio
+import logging
+import re
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+
+CODING_RESPONSE = """main.py
+```python
+'''
+Entry point of the generated app.
+'''
+def main():
+    print("Hello, World!")
+
+
+if __name__ == "__main__":
+    main()
+```
+####
+"""
+
+FILE_PLAN_RESPONSE = "main.py: Entry point of the generated app, defines main()\n"
+
+# Markers of the file plan and per-file requests of parallel coding, see TaskConfig.json
+FILE_PLAN_MARKER = "FILENAME: RESPONSIBILITY"
+FILE_REQUEST_PATTERN = re.compile(r'write the complete code of the file "([^"]+)"')
+
+# Markers of the code review phases, see TaskConfig.json
+REVIEW_COMMENT_MARKER = "propose one comment with the highest priority"
+EDIT_BLOCK_MARKER = "<<<<<<< SEARCH"
+
+REVIEW_COMMENT_RESPONSE = "main() should flush its output so that it is visible when piped."
+
+EDIT_RESPONSE = """main.py
+<<<<<<< SEARCH
+    print("Hello, World!")
+=======
+    print("Hello, World!", flush=True)
+>>>>>>> REPLACE
+"""
+
+
+def canned_response(messages: List[Dict[str, str]]) -> str:
+    """
+    Pick a deterministic response for a conversation based on its phase prompt.
+
+    Args:
+        messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+
+    Returns:
+        str: The canned response.
+    """
+    prompt = "\n".join(message["content"] for message in messages)
+    if EDIT_BLOCK_MARKER in prompt:
+        return EDIT_RESPONSE
+    if REVIEW_COMMENT_MARKER in prompt:
+        return REVIEW_COMMENT_RESPONSE
+    if FILE_PLAN_MARKER in prompt:
+        return FILE_PLAN_RESPONSE
+    if FILE_REQUEST_PATTERN.search(prompt):
+        return CODING_RESPONSE.replace("####\n", "")
+    if "product modality" in prompt:
+        return "<INFO> Application"
+    if "programming language" in prompt and "FILENAME" not in prompt:
+        return "<INFO> Python"
+    return CODING_RESPONSE
+
+
+class StubChatBot:
+    """
+    In-process stand-in for OpenAIChatBot/NVIDIAChatBot that answers after a fixed latency.
+
+    Attributes:
+        latency (float): Seconds to wait before answering each request.
+        calls (int): Number of requests served so far.
+    """
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.calls = 0
+
+    def send_messages_and_get_response(self, messages: List[Dict[str, str]], stop_when=None) -> str:
+        self.calls += 1
+        time.sleep(self.latency)
+        return canned_response(messages)
+
+    async def asend_messages_and_get_response(self, messages: List[Dict[str, str]], stop_when=None) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return canned_response(messages)
+
+
+def get_null_logger(name: str = "benchmark") -> logging.Logger:
+    """
+    Get a logger that discards every record so logging does not skew timings.
+
+    Args:
+        name (str): The name of the logger.
+
+    Returns:
+        logging.Logger: The silent logger.
+    """
+    logger = logging.getLogger(name)
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    logger.setLevel(logging.CRITICAL)
+    return logger
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Compute a percentile of a list of values using linear interpolation.
+
+    Args:
+        values (List[float]): The samples.
+        pct (float): The percentile, between 0 and 100.
+
+    Returns:
+        float: The percentile value, or 0.0 for an empty list.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def synthetic_code_response(num_files: int, lines_per_file: int) -> str:
+    """
+    Build a Coding phase response with the given number of files in the requested block format.
+
+    Args:
+        num_files (int): The number of files in the response.
+        lines_per_file (int): The number of code lines per file.
+
+    Returns:
+        str: The response, with files separated by "####".
+    """
+    return "####\n".join(synthetic_code_file(file_index, lines_per_file) for file_index in range(num_files))
+
+
+def synthetic_edit_response(file_index: int, lines: List[int]) -> str:
+    """
+    Build a response editing lines of a synthetic file, one SEARCH/REPLACE block per line.
+
+    Args:
+        file_index (int): The index of the edited file, see synthetic_code_file.
+        lines (List[int]): The indexes of the edited lines.
+
+    Returns:
+        str: The edit blocks.
+    """
+    return "".join(
+        f"module_{file_index}.py\n<<<<<<< SEARCH\nvalue_{line} = compute({line}, 'module_{file_index}')\n=======\n"
+        f"value_{line} = compute({line}, 'module_{file_index}', cached=True)\n>>>>>>> REPLACE\n"
+        for line in lines
+    )
+
+
+def synthetic_code_file(file_index: int, lines_per_file: int) -> str:
+    """
+    Build the code block of a single synthetic file.
+
+    Args:
+        file_index (int): The index of the file, named module_<index>.py.
+        lines_per_file (int): The number of code lines.
+
+    Returns:
+        str: The file name followed by its code block.
+    """
+    code = "\n".join(f"value_{line} = compute({line}, 'module_{file_index}')" for line in range(lines_per_file))
+    return f"module_{file_index}.py\n```python\n'''\nModule {file_index} of the synthetic app.\n'''\n{code}\n```\n"
+
+
+def synthetic_file_plan(num_files: int) -> str:
+    """
+    Build the file plan of a synthetic app, one "FILENAME: RESPONSIBILITY" line per file.
+    """
+    return "".join(f"module_{file_index}.py: Module {file_index} of the synthetic app\n"
+                   for file_index in range(num_files))
+
+
+class FakeChatBot(StubChatBot):
+    """
+    Zero-latency stub bot whose Coding responses have a configurable size.
+
+    Attributes:
+        code_response (str): The response served to the Coding phase.
+    """
+
+    def __init__(self, num_files: int = 1, lines_per_file: int = 10):
+        super().__init__(latency=0)
+        self.lines_per_file = lines_per_file
+        self.code_response = synthetic_code_response(num_files, lines_per_file)
+        self.file_plan = synthetic_file_plan(num_files)
+
+    def _respond(self, messages: List[Dict[str, str]]) -> str:
+        prompt = messages[-1]["content"]
+        if EDIT_BLOCK_MARKER in prompt:
+            return synthetic_edit_response(0, [0])
+        if FILE_PLAN_MARKER in prompt:
+            return self.file_plan
+        file_request = FILE_REQUEST_PATTERN.search(prompt)
+        if file_request:
+            file_index = int(re.sub(r"\D", "", file_request.group(1)) or 0)
+            return synthetic_code_file(file_index, self.lines_per_file)
+        response = canned_response(messages)
+        return self.code_response if response == CODING_RESPONSE else response
+
+    def send_messages_and_get_response(self, messages: List[Dict[str, str]], stop_when=None) -> str:
+        self.calls += 1
+        return self._respond(messages)
+
+    async def asend_messages_and_get_response(self, messages: List[Dict[str, str]], stop_when=None) -> str:
+        self.calls += 1
+        return self._respond(messages)
+
+
+def measure(func: Callable[[], object], iterations: int, warmup: int = 1) -> Dict[str, float]:
+    """
+    Time a function and report latency percentiles, throughput and peak traced memory.
+
+    The peak memory is measured in a separate traced call so tracing does not skew the timings.
+
+    Args:
+        func (Callable[[], object]): The function to benchmark.
+        iterations (int): The number of timed calls.
+        warmup (int): The number of untimed calls made first.
+
+    Returns:
+        Dict[str, float]: The p50/p90/p99/mean latency in milliseconds, calls per second and
+        peak memory in KiB.
+    """
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = sum(samples)
+    return {
+        "iterations": iterations,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p90_ms": percentile(samples, 90) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "mean_ms": total / iterations * 1000,
+        "throughput_per_s": iterations / total if total else 0.0,
+        "peak_kib": peak / 1024,
+    }
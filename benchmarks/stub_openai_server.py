@@ -0,0 +1,171 @@
+"""
+A local stand-in for the OpenAI chat-completions endpoint.
+
+Point the OpenAI client at it with OPENAI_API_BASE=http://127.0.0.1:8000/v1 and any API key.
+
+Usage:
+    python -m benchmarks.stub_openai_server --port 8000 --latency 0.2 --jitter 0.05 --error_rate 0.01 --tokens_per_sec 50
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from benchmarks.common import canned_response
+
+
+@dataclass
+class StubServerConfig:
+    """
+    Behaviour of the stub backend.
+
+    Attributes:
+        latency (float): Seconds before the first token is sent.
+        jitter (float): Maximum extra seconds added to the latency, drawn uniformly.
+        error_rate (float): Probability of answering a request with error_status.
+        error_status (int): HTTP status of injected errors, 429 by default.
+        tokens_per_sec (float): Generation speed, 0 sends the whole response at once.
+        seed (int, optional): Seed of the random generator for reproducible runs.
+    """
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 429
+    tokens_per_sec: float = 0.0
+    seed: Optional[int] = None
+
+
+def split_tokens(text: str) -> list:
+    """
+    Split a response into pseudo tokens that concatenate back to the response.
+    """
+    return re.findall(r"\s*\S+|\s+$", text)
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        config = self.server.stub_config
+        rng = self.server.rng
+
+        with self.server.rng_lock:
+            delay = config.latency + rng.uniform(0, config.jitter)
+            fail = rng.random() < config.error_rate
+
+        time.sleep(delay)
+        if fail:
+            self._send_json(config.error_status, {
+                "error": {"message": "Injected stub error", "type": "rate_limit_error", "code": config.error_status}
+            })
+            return
+
+        content = canned_response(request.get("messages", []))
+        tokens = split_tokens(content)
+        token_delay = 1 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = request.get("model", "stub")
+
+        if request.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in tokens:
+                time.sleep(token_delay)
+                self._write_event({"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                                   "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]})
+            self._write_event({"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                               "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+            return
+
+        time.sleep(token_delay * len(tokens))
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in request.get("messages", []))
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                      "total_tokens": prompt_tokens + len(tokens)},
+        })
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _write_event(self, payload: dict) -> None:
+        self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+
+def start_stub_server(config: StubServerConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """
+    Start the stub backend on a background thread.
+
+    Args:
+        config (StubServerConfig): The behaviour of the backend.
+        host (str): The interface to bind.
+        port (int): The port to bind, 0 picks a free port.
+
+    Returns:
+        ThreadingHTTPServer: The running server; its base URL is http://host:server.server_port/v1.
+    """
+    server = ThreadingHTTPServer((host, port), StubOpenAIHandler)
+    server.daemon_threads = True
+    server.stub_config = config
+    server.rng = random.Random(config.seed)
+    server.rng_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub backend")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Maximum extra latency in seconds")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Probability of an injected error")
+    parser.add_argument("--error_status", type=int, default=429, help="HTTP status of injected errors")
+    parser.add_argument("--tokens_per_sec", type=float, default=0.0, help="Generation speed, 0 for instant")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubServerConfig(args.latency, args.jitter, args.error_rate, args.error_status,
+                              args.tokens_per_sec, args.seed)
+    server = start_stub_server(config, args.host, args.port)
+    print(f"Stub OpenAI backend listening on http://{args.host}:{server.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import asyncio
+from typing import Iterable
+
+from chains.converse import MAX_EDIT_RETRIES, PATCH_PHASES, AgentConversation, AgentConversationExtended
+from chains.scheduler import TaskchainScheduler
+from chat.streaming import CodeFenceTerminator, info_line_terminator
+from llms.client_registry import get_client_registry
+from utils.config_registry import get_config_registry
+
+
+class AsyncAgentConversation(AgentConversation):
+    """
+    Asynchronous variant of AgentConversation.
+
+    Every assistant/user turn awaits the chat bot's asend_messages_and_get_response,
+    so many conversations can share a single event loop instead of blocking on
+    network latency one round-trip at a time.
+    """
+
+    async def acreate_conversation(self, task_name, task_config, max_turn_step=None, phase_key=None):
+        """
+        Asynchronously run the assistant/user exchange of a single phase.
+
+        Args:
+            task_name (str): The name of the phase.
+            task_config (TaskConfig): The configuration of the phase.
+            max_turn_step (int, optional): The maximum number of exchanges, see get_turn_limit.
+            phase_key (str, optional): The key of the phase in the checkpoint, defaults to task_name.
+        """
+        phase_key = phase_key or task_name
+        if self.is_phase_completed(phase_key):
+            return
+
+        if self.use_parallel_coding(task_name, task_config):
+            last_conv = await self.acreate_parallel_coding(task_name, task_config, phase_key)
+            if last_conv is not None:
+                self.finish_phase(task_name, phase_key, last_conv)
+                return
+
+        user_system_message, assistant_system_message, start_turn, last_conv = self.begin_phase(
+            task_name, task_config, phase_key
+        )
+        user_role_name = task_config.user_role_name
+        assistant_role_name = task_config.assistant_role_name
+
+        cyclenum = self.get_turn_limit(task_name, max_turn_step)
+        assistant_chat_bot = self.get_chat_bot(task_config, "assistant")
+        user_chat_bot = self.get_chat_bot(task_config, "user")
+
+        for count in range(start_turn, cyclenum):
+            # Assistant's turn
+            with self.turn_metrics(phase_key, count, "assistant"):
+                assistant_response = await assistant_chat_bot.asend_messages_and_get_response(
+                    assistant_system_message, stop_when=info_line_terminator
+                )
+            assistant_system_message.assistant(assistant_response)
+            user_system_message.user(assistant_response)
+
+            last_conv = assistant_response
+            self.logger.info(f"Assistant {assistant_role_name}: {assistant_response}",
+                             extra={"phase": phase_key, "turn": count, "role": "assistant"})
+
+            # Check if the assistant's response starts with "<INFO>" to terminate the conversation
+            if assistant_response.strip().startswith("<INFO>"):
+                break
+            # The user's reply to the last assistant response is never used, so skip it
+            elif count == cyclenum-1:
+                break
+
+            # User's turn
+            with self.turn_metrics(phase_key, count, "user"):
+                user_response = await user_chat_bot.asend_messages_and_get_response(
+                    user_system_message, stop_when=info_line_terminator
+                )
+            user_system_message.assistant(user_response)
+            assistant_system_message.user(user_response)
+
+            self.logger.info(f"User {user_role_name}: {user_response}",
+                             extra={"phase": phase_key, "turn": count, "role": "user"})
+
+            # Check if the user's response starts with "<INFO>" to terminate the conversation
+            if user_response.strip().startswith("<INFO>"):
+                break
+
+            self.end_turn(phase_key, count + 1, user_system_message, assistant_system_message, last_conv)
+
+        if task_name in PATCH_PHASES and last_conv:
+            await self.apatch_code(task_config, phase_key, assistant_system_message, last_conv, cyclenum)
+
+        self.finish_phase(task_name, phase_key, last_conv)
+
+    async def apatch_code(self, task_config, phase_key, assistant_system_message, last_conv, turn):
+        """
+        Apply the edits of the last response of a patch phase, re-asking only for the edits that failed.
+        See AgentConversation.patch_code.
+        """
+        result = self.apply_code_edits(last_conv)
+        chat_bot = self.get_chat_bot(task_config, "assistant")
+        for attempt in range(MAX_EDIT_RETRIES):
+            if not result.failed or not task_config.edit_retry_prompt:
+                break
+            self.setup_edit_retry_message(assistant_system_message, task_config, result.failed)
+            with self.turn_metrics(phase_key, turn + attempt, "assistant"):
+                response = await chat_bot.asend_messages_and_get_response(assistant_system_message)
+            assistant_system_message.assistant(response)
+            self.logger.info(f"Assistant {task_config.assistant_role_name}: {response}",
+                             extra={"phase": phase_key, "turn": turn + attempt, "role": "assistant"})
+            result = self.apply_code_edits(response)
+        if result.failed:
+            self.logger.warning(f"{len(result.failed)} edits could not be applied")
+
+    async def acreate_parallel_coding(self, task_name, task_config, phase_key):
+        """
+        Generate the Coding phase file by file: one request for the file plan, then one concurrent
+        request per file, so the phase takes as long as its largest file rather than all of them.
+
+        Args:
+            task_name (str): The name of the phase.
+            task_config (TaskConfig): The configuration of the phase.
+            phase_key (str): The key of the phase in the checkpoint.
+
+        Returns:
+            str: The output of the phase, None if no file plan was obtained.
+        """
+        system_message, plan_message = self.setup_file_plan_messages(task_name, task_config)
+        self.record_messages(phase_key, plan_message, "plan")
+        chat_bot = self.get_chat_bot(task_config, "assistant")
+        with self.turn_metrics(phase_key, 0, "assistant"):
+            plan_response = await chat_bot.asend_messages_and_get_response(plan_message)
+        plan_message.assistant(plan_response)
+        file_plan = self.get_file_plan(plan_response)
+        if not file_plan:
+            return None
+
+        async def generate_file(index, file_message):
+            with self.turn_metrics(phase_key, index, "assistant"):
+                # Each response holds a single code block, nothing after its closing fence is needed
+                response = await chat_bot.asend_messages_and_get_response(file_message,
+                                                                          stop_when=CodeFenceTerminator(1))
+            file_message.assistant(response)
+            return response
+
+        file_messages = self.setup_file_messages(system_message, task_config, file_plan)
+        self.record_file_messages(phase_key, file_messages, file_plan)
+        file_responses = await asyncio.gather(
+            *(generate_file(index, file_message) for index, file_message in enumerate(file_messages, 1))
+        )
+        return self.join_file_responses(file_plan, file_responses)
+
+
+class AsyncAgentConversationExtended(AsyncAgentConversation, AgentConversationExtended):
+    """
+    Asynchronous variant of AgentConversationExtended.
+
+    run_conversations is kept as a synchronous entry point that drives
+    arun_conversations on a fresh event loop.
+    """
+
+    async def arun_conversations(self):
+        """
+        Asynchronously run the phases of TaskchainConfigs.json, overlapping independent phases.
+
+        Falls back to running every task of TaskConfig.json in order when the task chain
+        cannot be loaded.
+        """
+        task_configs = self.get_task_configs()
+        try:
+            scheduler = TaskchainScheduler(self, get_config_registry().taskchain_config_path, task_configs)
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.error(f"Error reading TaskchainConfigs.json, running TaskConfig.json in order: {str(e)}")
+            for task_name, task_config in task_configs.items():
+                await self.acreate_conversation(task_name, task_config)
+            return
+
+        await scheduler.run()
+
+    def run_conversations(self):
+        """
+        Run the conversations of every task in TaskConfig.json, blocking until done.
+        """
+        return asyncio.run(self._arun_conversations_and_close())
+
+    async def _arun_conversations_and_close(self):
+        try:
+            return await self.arun_conversations()
+        finally:
+            # The pooled aiohttp session is bound to the event loop that asyncio.run closes
+            await get_client_registry().aclose_async_session()
+
+
+async def run_conversations_concurrently(conversation_managers: Iterable[AsyncAgentConversationExtended]):
+    """
+    Multiplex the runs of several conversation managers on the current event loop.
+
+    Args:
+        conversation_managers (Iterable[AsyncAgentConversationExtended]): The runs to drive.
+
+    Returns:
+        list: The results of each run, exceptions included, in the order given.
+    """
+    return await asyncio.gather(
+        *(manager.arun_conversations() for manager in conversation_managers),
+        return_exceptions=True,
+    )
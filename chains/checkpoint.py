@@ -0,0 +1,145 @@
+import json
+import os
+from dataclasses import fields
+from typing import Dict, List, Optional
+
+from postprocess.code_repository import CodeRepository
+from prompt_config.task_config_vars import IntermediateVars
+
+
+class RunCheckpoint:
+    """
+    Phase-level checkpoint of a run, stored as JSON in the run's directory.
+
+    The checkpoint holds the run arguments, the IntermediateVars, the phases that
+    completed and, for the phase in progress, both message histories and the number
+    of finished exchanges. It is rewritten atomically after every exchange.
+
+    Attributes:
+        path (str): The path to the checkpoint file.
+        state (Dict): The checkpointed state.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the RunCheckpoint, loading the existing checkpoint file if there is one.
+
+        Args:
+            path (str): The path to the checkpoint file.
+        """
+        self.path = path
+        self.state = {"run": {}, "intermediate_vars": {}, "completed_phases": [], "phases": {}}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as checkpoint_file:
+                self.state.update(json.load(checkpoint_file))
+
+    def exists(self) -> bool:
+        """
+        Check whether the checkpoint has been written to disk.
+
+        Returns:
+            bool: True if the checkpoint file exists.
+        """
+        return os.path.exists(self.path)
+
+    def save(self) -> None:
+        """
+        Atomically write the checkpoint to disk.
+        """
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as checkpoint_file:
+            json.dump(self.state, checkpoint_file)
+        os.replace(temp_path, self.path)
+
+    def set_run_info(self, **run_info) -> None:
+        """
+        Record the arguments of the run, i.e. the app, the model, the backends and the fallback model,
+        so that it can be resumed from its directory alone.
+        """
+        self.state["run"].update(run_info)
+        self.save()
+
+    def get_run_info(self) -> Dict:
+        """
+        Get the arguments the run was started with.
+
+        Returns:
+            Dict: The run arguments, e.g. app_name, app_desc, model, openai, nvidia and fallback_model.
+            Checkpoints written by earlier versions only hold app_name and app_desc.
+        """
+        return dict(self.state["run"])
+
+    def load_intermediate_vars(self) -> IntermediateVars:
+        """
+        Get the IntermediateVars as of the last completed phase.
+
+        Returns:
+            IntermediateVars: The restored intermediate variables.
+        """
+        intermediate_vars = IntermediateVars(**self.state["intermediate_vars"])
+        if isinstance(intermediate_vars.codes, dict):
+            intermediate_vars.codes = CodeRepository.from_dict(intermediate_vars.codes)
+        return intermediate_vars
+
+    def is_completed(self, phase_key: str) -> bool:
+        """
+        Check whether a phase has completed.
+
+        Args:
+            phase_key (str): The key of the phase, unique across cycles of composed phases.
+
+        Returns:
+            bool: True if the phase has completed.
+        """
+        return phase_key in self.state["completed_phases"]
+
+    def get_phase_state(self, phase_key: str) -> Optional[Dict]:
+        """
+        Get the state of a phase in progress.
+
+        Args:
+            phase_key (str): The key of the phase.
+
+        Returns:
+            Optional[Dict]: The finished exchange count, both message histories and the last
+            assistant response, or None if the phase has not checkpointed a turn.
+        """
+        return self.state["phases"].get(phase_key)
+
+    def save_turn(self, phase_key: str, turn: int, user_messages: List[Dict[str, str]],
+                  assistant_messages: List[Dict[str, str]], last_conv: str) -> None:
+        """
+        Checkpoint a phase after a finished exchange.
+
+        Args:
+            phase_key (str): The key of the phase.
+            turn (int): The number of finished exchanges.
+            user_messages (List[Dict[str, str]]): The history of the user agent.
+            assistant_messages (List[Dict[str, str]]): The history of the assistant agent.
+            last_conv (str): The last assistant response.
+        """
+        self.state["phases"][phase_key] = {
+            "turn": turn,
+            "user_messages": user_messages,
+            "assistant_messages": assistant_messages,
+            "last_conv": last_conv,
+        }
+        self.save()
+
+    def complete_phase(self, phase_key: str, intermediate_vars: IntermediateVars) -> None:
+        """
+        Checkpoint a completed phase together with the IntermediateVars it produced.
+
+        Args:
+            phase_key (str): The key of the phase.
+            intermediate_vars (IntermediateVars): The intermediate variables after the phase.
+        """
+        self.state["phases"].pop(phase_key, None)
+        if phase_key not in self.state["completed_phases"]:
+            self.state["completed_phases"].append(phase_key)
+        self.state["intermediate_vars"] = {
+            var.name: getattr(intermediate_vars, var.name) for var in fields(intermediate_vars)
+        }
+        if isinstance(intermediate_vars.codes, CodeRepository):
+            self.state["intermediate_vars"]["codes"] = intermediate_vars.codes.to_dict()
+        self.save()
@@ -1,227 +1,716 @@
-import json
-from prompt_config.promptformatter import SystemMessageFormatter
-from chat.openai_chat_bot import OpenAIChatBot
-from chat.nvidia_chat_bot import NVIDIAChatBot
-from postprocess.code_output_parser import TaskParser
-from postprocess.codefile_creator import CodeFileGenerator
-from prompt_config.taskconfig_formater import DynamicTaskConfigFormatter
-from prompt_config.task_config_vars import IntermediateVars
-from llms.openai_llm import ChatGPTConfig
-from utils.config_utils import get_config_paths
-from dataclasses import dataclass
-
-@dataclass
-class TaskConfig:
-    assistant_role_name: str
-    user_role_name: str
-    phase_prompt: list[str]
-
-
-class AgentConversation:
-    def __init__(self, app_name, model, app_desc, logger, code_file_path, openai, nvidiaai):
-        self.app_name = app_name
-        self.model = model
-        self.app_desc = app_desc
-        self.logger = logger
-        self.system_formatter = self.setup_system_formatter()
-        self.openai = openai
-        self.nvidiaai = nvidiaai
-        self.chat_bot = self.setup_chat_bot()
-        self.company_prompt = "Welcome to SmartAgents"
-        self.intermediate_vars = IntermediateVars()
-        self.code_file_path = code_file_path
-
-
-
-    def setup_system_formatter(self):
-        agents_config_path, _, _, _, _ = get_config_paths()
-        return SystemMessageFormatter(agents_config_path)
-
-    def setup_chat_bot(self):
-        if self.openai:
-            return OpenAIChatBot(
-                model=self.model,
-                chat_config=ChatGPTConfig.load_from_file("llmconfig.json")
-            )
-        if self.nvidiaai:
-            return NVIDIAChatBot(
-                model=self.model,
-                chat_config=ChatGPTConfig.load_from_file("llmconfig.json")
-            )
-
-    def create_conversation(self, task_name, task_config):
-        user_role_name = task_config.user_role_name
-        assistant_role_name = task_config.assistant_role_name
-        phase_prompt = task_config.phase_prompt
-
-        self.logger.info("-" * 5 + task_name + "-" * 5)
-
-        # Generate system messages for the user and assistant based on their roles
-        user_system_message = self.system_formatter.format_message(
-            user_role_name, self.company_prompt, self.app_desc
-        )
-
-        assistant_system_message = self.system_formatter.format_message(
-            assistant_role_name, self.company_prompt, self.app_desc
-        )
-
-        self.logger.debug(f'{user_system_message.messages=}')
-
-        # Add data from the task to the IntermediateVars instance
-        self.intermediate_vars.task = task_name
-
-        # Create a new DynamicTaskConfigFormatter for each task
-        dynamic_formatter = DynamicTaskConfigFormatter(self.intermediate_vars)
-
-        # Use the dynamic formatter to format the task_config
-        phase_prompt_str = dynamic_formatter.format_task_config(assistant_role_name, phase_prompt)
-        self.logger.debug(f'{phase_prompt_str=}')
-
-        # Add the concatenated phase_prompt to assistant_messages
-        assistant_system_message.user(phase_prompt_str)
-        self.logger.debug(f'{assistant_system_message.messages=}')
-
-        self.logger.info(f"User {user_role_name}: {phase_prompt_str}")
-
-        # # Conduct the conversation by alternating between assistant and user messages
-        # conversation = []
-
-        # TODO add way to process the taskchainconfig file an get cyclenum
-        if task_name == "Coding":
-            cyclenum = 2
-        else:
-            cyclenum = 5
-
-        for count in range(cyclenum):  # Maximum of 4 back-and-forth exchanges
-            # Assistant's turn
-            assistant_response = self.chat_bot.send_messages_and_get_response(
-                assistant_system_message.messages
-            )
-            assistant_system_message.assistant(assistant_response)
-            user_system_message.user(assistant_response)
-
-            last_conv = assistant_response
-            self.logger.info(f"Assistant {assistant_role_name}: {assistant_response}")
-
-            # Check if the assistant's response starts with "<INFO>" to terminate the conversation
-            if assistant_response.strip().startswith("<INFO>"):
-                break
-            elif task_name == "Coding" and count == cyclenum-1:
-                break
-
-            # User's turn
-            user_response = self.chat_bot.send_messages_and_get_response(
-                user_system_message.messages
-            )
-            user_system_message.assistant(user_response)
-            assistant_system_message.user(user_response)
-
-            last_conv = assistant_response
-            self.logger.info(f"User {user_role_name}: {user_response}")
-
-            # Check if the user's response starts with "<INFO>" to terminate the conversation
-            if user_response.strip().startswith("<INFO>"):
-                break
-
-        # TODO parse the data output final call and add return it, add some post processing
-
-        if task_name == "DemandAnalysis":
-
-            parser = TaskParser(task_name, last_conv)
-            output = parser.parse_output()
-
-            self.intermediate_vars.modality = output
-        elif task_name == "LanguageChoose":
-
-            parser = TaskParser(task_name, last_conv)
-            output = parser.parse_output()
-
-            self.intermediate_vars.language = output
-        elif task_name == "Coding":
-            # Split the string at "####"
-            split_string = last_conv.split("####")
-
-            # Remove leading and trailing whitespace from each part
-            split_string = [part.strip() for part in split_string]
-
-            # Remove empty strings from the result
-            split_string = [part for part in split_string if part]
-            entire_code = ''
-            for code_string in split_string:
-                try:
-                    parser = TaskParser(task_name, code_string)
-                    filename, extension, language, docstring, code = parser.parse_output()
-
-                    generator = CodeFileGenerator(filename, extension, language, docstring, code, self.code_file_path)
-                    generator.create_code_file()
-
-                    # filename, extension, language, docstring, code = output
-
-                    entire_code = entire_code + filename + '\n\n' + extension + '\n\n' +  language + '\n\n' +  docstring + '\n\n' + code
-
-                except Exception as e:
-                    self.logger.error(f"Parsing the output: {str(e)}")
-            self.intermediate_vars.codes = entire_code
-
-            self.logger.info("Done")
-        else:
-            pass
-        # return conversation
-
-
-def task_config_decorator(func):
-    def wrapper(self, *args, **kwargs):
-        task_configs = self.get_task_configs()
-        for task_name, task_config in task_configs.items():
-            func(self, task_name, task_config)
-    return wrapper
-
-
-class AgentConversationExtended(AgentConversation):
-    def __init__(self, app_name, model, app_desc, logger, task_config_path, code_file_path, openai=None, nvidiaai=None):
-        super().__init__(app_name, model, app_desc, logger, code_file_path, openai=openai, nvidiaai=nvidiaai)
-        self.task_config_path = task_config_path
-
-    def get_task_configs(self):
-        task_configs = {}
-        try:
-            # Use the provided task_config_path to load the TaskConfig.json file
-            with open(self.task_config_path, "r", encoding="utf-8") as config_file:
-                config_data = json.load(config_file)
-
-            # Iterate through the task configurations and create TaskConfig objects
-            for task_name, task_data in config_data.items():
-                if "assistant_role_name" in task_data and "user_role_name" in task_data and "phase_prompt" in task_data:
-                    task_config = TaskConfig(
-                        assistant_role_name=task_data["assistant_role_name"],
-                        user_role_name=task_data["user_role_name"],
-                        phase_prompt=task_data["phase_prompt"]
-                    )
-                    task_configs[task_name] = task_config
-
-        except FileNotFoundError:
-            self.logger.error("TaskConfig.json file not found.")
-        except Exception as e:
-            self.logger.error(f"Error reading TaskConfig.json: {str(e)}")
-
-        return task_configs
-
-    @task_config_decorator
-    def run_conversations(self, task_name, task_config):
-        return self.create_conversation(task_name, task_config)
-
-
-    def print_conversation(self, conversation):
-        # Print the conversation
-        for exchange in conversation:
-            self.logger.info(f"User: {exchange['User']}")
-            self.logger.info(f"Assistant: {exchange['Assistant']}")
-
-
-if __name__ == "__main__":
-    app_name = "YourAppName"
-    model = "YourModelName"
-    app_desc = "YourAppDescription"
-
-    conversation_manager = AgentConversationExtended(app_name, model, app_desc)
-    conversation_manager.run_conversations()
+import json
+from prompt_config.promptformatter import SystemMessageFormatter
+from chat.message import Message
+from chat.router import RoutingChatBot
+from chat.streaming import CodeFenceTerminator, info_line_terminator
+from postprocess.code_output_parser import TaskParser, parse_file_plan
+from postprocess.code_repository import CodeRepository
+from postprocess.codefile_creator import CodeFileGenerator
+from postprocess.patch_engine import apply_edits, parse_edits
+from prompt_config.taskconfig_formater import DynamicTaskConfigFormatter
+from prompt_config.task_config import TaskConfig
+from prompt_config.task_config_vars import IntermediateVars
+from llms.nvidia_model import NvidiaModelType
+from llms.openai_model import ModelType
+from utils.config_registry import get_config_registry
+from utils.metrics import MetricsRecorder, metrics_context
+from dataclasses import replace
+
+# Phases answering with edit blocks or unified diffs that are applied to the CodeRepository
+PATCH_PHASES = ("CodeReviewModification", "TestModification")
+# Re-asks for the edits of a patch phase that could not be applied
+MAX_EDIT_RETRIES = 2
+
+
+class AgentConversation:
+    def __init__(self, app_name, model, app_desc, logger, code_file_path, openai, nvidiaai, response_cache=None,
+                 fallback_model=None, router_config=None, parallel_coding=False):
+        self.app_name = app_name
+        self.model = model
+        self.app_desc = app_desc
+        self.logger = logger
+        self.system_formatter = self.setup_system_formatter()
+        self.openai = openai
+        self.nvidiaai = nvidiaai
+        self.response_cache = response_cache
+        self.fallback_model = fallback_model
+        self.router_config = router_config
+        self.parallel_coding = parallel_coding
+        self.chat_bot = self.setup_chat_bot()
+        # One bot per model and chat config overridden in TaskConfig.json, reused by every phase
+        self.phase_chat_bots = {}
+        # The RoutingChatBots among them, unwrapped, so that their stats are reported and they are closed
+        self.phase_routers = {}
+        self.chat_bot_wrapper = None
+        self.company_prompt = "Welcome to SmartAgents"
+        self.intermediate_vars = IntermediateVars()
+        self.code_file_path = code_file_path
+        self.checkpoint = None
+        self.history_store = None
+        self.metrics = MetricsRecorder()
+
+    def set_checkpoint(self, checkpoint):
+        """
+        Checkpoint the run into the given RunCheckpoint, restoring its IntermediateVars.
+
+        Args:
+            checkpoint (RunCheckpoint): The checkpoint of the run.
+        """
+        self.checkpoint = checkpoint
+        if checkpoint.exists():
+            self.intermediate_vars = checkpoint.load_intermediate_vars()
+
+    def set_history_store(self, history_store):
+        """
+        Stream every message history of the run into the transcripts of a ChatHistoryStore.
+
+        Args:
+            history_store (ChatHistoryStore): The chat_history directory of the run.
+        """
+        self.history_store = history_store
+
+    def record_messages(self, phase_key, message, history, start=0):
+        """
+        Write the entries of a message history, from start on, and every later append to the transcript
+        of the phase, if the run has a ChatHistoryStore.
+
+        Args:
+            phase_key (str): The key of the phase, naming its transcript.
+            message (Message): The history.
+            history (str): The name of the history in the transcript, e.g. "assistant".
+            start (int): The first entry to write.
+        """
+        if self.history_store is not None:
+            self.history_store.attach(phase_key, message, history, start)
+
+    def turn_metrics(self, phase_key, turn, role):
+        """
+        Label the LLM calls of a turn so that they are recorded in self.metrics.
+
+        Args:
+            phase_key (str): The phase key, e.g. "Coding".
+            turn (int): The exchange index within the phase.
+            role (str): "assistant" or "user".
+        """
+        return metrics_context(recorder=self.metrics, phase=phase_key, turn=turn, role=role)
+
+    def setup_system_formatter(self):
+        return SystemMessageFormatter(get_config_registry().agents_config_path)
+
+    def setup_chat_bot(self):
+        """
+        Create the chat bot of the selected backend, or a RoutingChatBot when a fallback model
+        or hedging is configured.
+        """
+        provider = "openai" if self.openai else "nvidia" if self.nvidiaai else None
+        if provider is None:
+            return None
+        return self.make_routed_chat_bot(provider, self.model)
+
+    def make_routed_chat_bot(self, provider, model, chat_config=None):
+        """
+        Create the chat bot of a provider and model, routed with the fallback model of the run
+        and hedged when they are configured.
+
+        Args:
+            provider (str): "openai" or "nvidia".
+            model (str): The model name.
+            chat_config (ChatGPTConfig, optional): The chat config of both bots, llmconfig.json by default.
+
+        Returns:
+            The chat bot, or a RoutingChatBot over it and the fallback model.
+        """
+        primary = f"{provider}/{model}"
+        chat_bots = {primary: self.make_chat_bot(provider, model, chat_config)}
+        if self.fallback_model:
+            # With both backends selected the fallback model is served by NVIDIA
+            fallback_provider = "nvidia" if self.openai and self.nvidiaai else provider
+            fallback = f"{fallback_provider}/{self.fallback_model}"
+            if fallback not in chat_bots:
+                chat_bots[fallback] = self.make_chat_bot(fallback_provider, self.fallback_model, chat_config)
+        if len(chat_bots) == 1 and not (self.router_config and self.router_config.hedge):
+            return chat_bots[primary]
+        return RoutingChatBot(chat_bots, self.router_config)
+
+    def make_chat_bot(self, provider, model, chat_config=None):
+        """
+        Create the chat bot of a provider and model.
+
+        Args:
+            provider (str): "openai" or "nvidia".
+            model (str): The model name.
+            chat_config (ChatGPTConfig, optional): The chat config, llmconfig.json by default.
+        """
+        chat_config = chat_config or get_config_registry().get_chat_config()
+        # Provider modules are only imported for the selected backend, each pulling in its client library
+        if provider == "openai":
+            from chat.openai_chat_bot import OpenAIChatBot
+            return OpenAIChatBot(model=model, chat_config=chat_config, cache=self.response_cache)
+        from chat.nvidia_chat_bot import NVIDIAChatBot
+        return NVIDIAChatBot(model=model, chat_config=chat_config, cache=self.response_cache)
+
+    def wrap_chat_bots(self, wrapper):
+        """
+        Wrap the chat bot of the run and every phase chat bot, including the ones created later.
+
+        Args:
+            wrapper (Callable): Takes a chat bot and returns the wrapping chat bot, e.g. a RecordingChatBot.
+        """
+        self.chat_bot = wrapper(self.chat_bot)
+        self.phase_chat_bots = {key: wrapper(chat_bot) for key, chat_bot in self.phase_chat_bots.items()}
+        self.chat_bot_wrapper = wrapper
+
+    def resolve_phase_model(self, name):
+        """
+        Resolve the model of a phase override to its provider and model name.
+
+        Args:
+            name (str): A ModelType/NvidiaModelType name, e.g. "GPT_3_5_TURBO", or a model name.
+
+        Returns:
+            tuple: The provider and the model name, or None if the model's provider is not selected.
+        """
+        for provider, selected, model_enum in (("openai", self.openai, ModelType),
+                                               ("nvidia", self.nvidiaai, NvidiaModelType)):
+            if name in model_enum.__members__:
+                return (provider, model_enum[name].value) if selected else None
+            if name in {member.value for member in model_enum}:
+                return (provider, name) if selected else None
+        # Unlisted models are served by the backend of the run
+        return ("openai" if self.openai else "nvidia"), name
+
+    def get_chat_bot(self, task_config, role):
+        """
+        Get the chat bot serving a role of a phase: the bot of the run unless TaskConfig.json
+        overrides the model or chat config of the phase.
+
+        Args:
+            task_config (TaskConfig): The configuration of the phase.
+            role (str): "assistant" or "user".
+
+        Returns:
+            The chat bot.
+        """
+        model_name, chat_config = task_config.get_model_override(role)
+        # Replayed runs have no backend to create bots for
+        if not (self.openai or self.nvidiaai) or not (model_name or chat_config):
+            return self.chat_bot
+        resolved = self.resolve_phase_model(model_name) if model_name else (
+            "openai" if self.openai else "nvidia", self.model
+        )
+        if resolved is None:
+            self.logger.debug(f"Ignoring model {model_name} of {role}: its backend is not selected")
+            if not chat_config:
+                return self.chat_bot
+            resolved = ("openai" if self.openai else "nvidia", self.model)
+        provider, model = resolved
+        if model == self.model and not chat_config:
+            return self.chat_bot
+
+        if provider == "nvidia":
+            from chat.nvidia_chat_bot import NVIDIAChatBot
+            ignored_fields = sorted(set(chat_config) - set(NVIDIAChatBot.SUPPORTED_CHAT_CONFIG_FIELDS))
+            if ignored_fields:
+                self.logger.warning(f"Ignoring chat_config fields {', '.join(ignored_fields)} of {role} on {model}: "
+                                    f"the NVIDIA AI Endpoints only support "
+                                    f"{', '.join(NVIDIAChatBot.SUPPORTED_CHAT_CONFIG_FIELDS)}")
+                chat_config = {name: value for name, value in chat_config.items() if name not in ignored_fields}
+                if model == self.model and not chat_config:
+                    return self.chat_bot
+
+        key = (provider, model, json.dumps(chat_config, sort_keys=True))
+        chat_bot = self.phase_chat_bots.get(key)
+        if chat_bot is None:
+            base_config = get_config_registry().get_chat_config()
+            # Tuned phases keep the fallback model and hedging of the run
+            chat_bot = self.make_routed_chat_bot(provider, model, replace(base_config, **chat_config))
+            if isinstance(chat_bot, RoutingChatBot):
+                self.phase_routers[key] = chat_bot
+            if self.chat_bot_wrapper is not None:
+                chat_bot = self.chat_bot_wrapper(chat_bot)
+            self.phase_chat_bots[key] = chat_bot
+        return chat_bot
+
+    def setup_phase_messages(self, task_name, task_config):
+        """
+        Build the user and assistant message histories for a phase.
+
+        Args:
+            task_name (str): The name of the phase.
+            task_config (TaskConfig): The configuration of the phase.
+
+        Returns:
+            tuple: The user and assistant Message instances.
+        """
+        user_role_name = task_config.user_role_name
+        assistant_role_name = task_config.assistant_role_name
+        phase_prompt = task_config.get_template()
+
+        self.logger.info("-" * 5 + task_name + "-" * 5)
+
+        # Generate system messages for the user and assistant based on their roles
+        user_system_message = self.system_formatter.format_message(
+            user_role_name, self.company_prompt, self.app_desc
+        )
+
+        assistant_system_message = self.system_formatter.format_message(
+            assistant_role_name, self.company_prompt, self.app_desc
+        )
+
+        # Lazily formatted, the histories are only rendered when debug logging is enabled
+        self.logger.debug("user_system_message.messages=%r", user_system_message.messages)
+
+        # Add data from the task to the IntermediateVars instance
+        self.intermediate_vars.task = task_name
+
+        # Create a new DynamicTaskConfigFormatter for each task
+        dynamic_formatter = DynamicTaskConfigFormatter(self.intermediate_vars)
+
+        # Use the dynamic formatter to format the task_config
+        phase_prompt_str = dynamic_formatter.format_task_config(assistant_role_name, phase_prompt)
+        self.logger.debug("phase_prompt_str=%r", phase_prompt_str)
+
+        # Add the concatenated phase_prompt to assistant_messages
+        assistant_system_message.user(phase_prompt_str)
+        self.logger.debug("assistant_system_message.messages=%r", assistant_system_message.messages)
+
+        self.logger.info(f"User {user_role_name}: {phase_prompt_str}")
+
+        return user_system_message, assistant_system_message
+
+    def use_parallel_coding(self, task_name, task_config):
+        """
+        Check whether a phase generates its files in parallel: the Coding phase does when parallel
+        coding is enabled and its TaskConfig has a file_plan_prompt and a file_prompt.
+        """
+        return bool(self.parallel_coding and task_name == "Coding"
+                    and task_config.file_plan_prompt and task_config.file_prompt)
+
+    def setup_file_plan_messages(self, task_name, task_config):
+        """
+        Build the assistant system message of the Coding phase and the request for its file plan.
+
+        Args:
+            task_name (str): The name of the phase.
+            task_config (TaskConfig): The configuration of the phase.
+
+        Returns:
+            tuple: The assistant system message and the file plan request, both Message instances.
+        """
+        self.logger.info("-" * 5 + task_name + " (parallel)" + "-" * 5)
+        system_message = self.system_formatter.format_message(
+            task_config.assistant_role_name, self.company_prompt, self.app_desc
+        )
+        self.intermediate_vars.task = task_name
+
+        plan_prompt_str = DynamicTaskConfigFormatter(self.intermediate_vars).format_task_config(
+            task_config.assistant_role_name, task_config.get_template("file_plan_prompt")
+        )
+        plan_message = system_message.copy()
+        plan_message.user(plan_prompt_str)
+        self.logger.info(f"User {task_config.user_role_name}: {plan_prompt_str}")
+        return system_message, plan_message
+
+    def setup_file_messages(self, system_message, task_config, file_plan):
+        """
+        Build one request per planned file, all sharing the system message and the file plan.
+
+        Args:
+            system_message (Message): The assistant system message of the phase.
+            task_config (TaskConfig): The configuration of the phase.
+            file_plan (list): The (filename, responsibility) pairs of the plan.
+
+        Returns:
+            list: One Message per file, in plan order.
+        """
+        dynamic_formatter = DynamicTaskConfigFormatter(self.intermediate_vars)
+        file_template = task_config.get_template("file_prompt")
+        file_plan_str = "\n".join(f"{filename}: {responsibility}" for filename, responsibility in file_plan)
+        file_messages = []
+        for filename, responsibility in file_plan:
+            file_message = system_message.copy()
+            file_message.user(dynamic_formatter.format_task_config(
+                task_config.assistant_role_name, file_template,
+                file_plan=file_plan_str, filename=filename, responsibility=responsibility
+            ))
+            file_messages.append(file_message)
+        return file_messages
+
+    def get_file_plan(self, plan_response):
+        """
+        Parse the file plan of the Coding phase, an empty plan falling back to a single conversation.
+        """
+        file_plan = parse_file_plan(plan_response)
+        if not file_plan:
+            self.logger.warning("No file plan in the response, generating the code in a single conversation")
+        else:
+            self.logger.info(f"File plan: {[filename for filename, _ in file_plan]}")
+        return file_plan
+
+    def record_file_messages(self, phase_key, file_messages, file_plan):
+        """
+        Write the per-file requests of parallel coding to the transcript of the phase, one history per file.
+        """
+        for file_message, (filename, _) in zip(file_messages, file_plan):
+            self.record_messages(phase_key, file_message, filename)
+
+    def join_file_responses(self, file_plan, file_responses):
+        """
+        Join the per-file responses into the "####"-separated output of the Coding phase.
+        """
+        for (filename, _), response in zip(file_plan, file_responses):
+            self.logger.info(f"Assistant {filename}: {response}")
+        return "\n####\n".join(file_responses)
+
+    def create_parallel_coding(self, task_name, task_config, phase_key):
+        """
+        Generate the Coding phase file by file: one request for the file plan, then one request per file.
+        The sync engine sends the file requests one after the other, see AsyncAgentConversation.
+
+        Args:
+            task_name (str): The name of the phase.
+            task_config (TaskConfig): The configuration of the phase.
+            phase_key (str): The key of the phase in the checkpoint.
+
+        Returns:
+            str: The output of the phase, None if no file plan was obtained.
+        """
+        system_message, plan_message = self.setup_file_plan_messages(task_name, task_config)
+        self.record_messages(phase_key, plan_message, "plan")
+        chat_bot = self.get_chat_bot(task_config, "assistant")
+        with self.turn_metrics(phase_key, 0, "assistant"):
+            plan_response = chat_bot.send_messages_and_get_response(plan_message)
+        plan_message.assistant(plan_response)
+        file_plan = self.get_file_plan(plan_response)
+        if not file_plan:
+            return None
+
+        file_messages = self.setup_file_messages(system_message, task_config, file_plan)
+        self.record_file_messages(phase_key, file_messages, file_plan)
+        file_responses = []
+        for index, file_message in enumerate(file_messages, 1):
+            with self.turn_metrics(phase_key, index, "assistant"):
+                file_responses.append(chat_bot.send_messages_and_get_response(
+                    file_message, stop_when=CodeFenceTerminator(1)
+                ))
+            file_message.assistant(file_responses[-1])
+        return self.join_file_responses(file_plan, file_responses)
+
+    def get_turn_limit(self, task_name, max_turn_step=None):
+        """
+        Get the maximum number of assistant/user exchanges for a phase.
+
+        Args:
+            task_name (str): The name of the phase.
+            max_turn_step (int, optional): The max_turn_step of the phase in TaskchainConfigs.json,
+                -1 or None falls back to the default of the phase.
+
+        Returns:
+            int: The maximum number of exchanges.
+        """
+        if max_turn_step is not None and max_turn_step > 0:
+            return max_turn_step
+        if task_name == "Coding":
+            return 2
+        return 5
+
+    def begin_phase(self, task_name, task_config, phase_key):
+        """
+        Set up the message histories of a phase, resuming them from the checkpoint if possible.
+
+        Args:
+            task_name (str): The name of the phase.
+            task_config (TaskConfig): The configuration of the phase.
+            phase_key (str): The key of the phase in the checkpoint.
+
+        Returns:
+            tuple: The user and assistant Message instances, the number of finished exchanges
+            and the last assistant response.
+        """
+        phase_state = self.checkpoint.get_phase_state(phase_key) if self.checkpoint else None
+        if not phase_state:
+            user_system_message, assistant_system_message = self.setup_phase_messages(task_name, task_config)
+            self.record_messages(phase_key, user_system_message, "user")
+            self.record_messages(phase_key, assistant_system_message, "assistant")
+            return user_system_message, assistant_system_message, 0, None
+
+        self.logger.info(f"Resuming {phase_key} after {phase_state['turn']} exchanges")
+        self.intermediate_vars.task = task_name
+        user_system_message = Message()
+        user_system_message.messages = phase_state["user_messages"]
+        assistant_system_message = Message()
+        assistant_system_message.messages = phase_state["assistant_messages"]
+        # The restored entries were written by the previous attempt
+        self.record_messages(phase_key, user_system_message, "user", start=len(user_system_message))
+        self.record_messages(phase_key, assistant_system_message, "assistant", start=len(assistant_system_message))
+        return user_system_message, assistant_system_message, phase_state["turn"], phase_state["last_conv"]
+
+    def end_turn(self, phase_key, turn, user_system_message, assistant_system_message, last_conv):
+        """
+        Checkpoint a phase after a finished exchange.
+        """
+        if self.checkpoint:
+            self.checkpoint.save_turn(
+                phase_key, turn, user_system_message.messages, assistant_system_message.messages, last_conv
+            )
+
+    def is_phase_completed(self, phase_key):
+        """
+        Check whether a phase already completed in a previous attempt of the run.
+        """
+        if self.checkpoint and self.checkpoint.is_completed(phase_key):
+            self.logger.info(f"Skipping {phase_key}: completed in a previous attempt")
+            return True
+        return False
+
+    def finish_phase(self, task_name, phase_key, last_conv):
+        """
+        Parse the output of a phase and checkpoint its completion.
+        """
+        self.process_output(task_name, last_conv)
+        if self.checkpoint:
+            self.checkpoint.complete_phase(phase_key, self.intermediate_vars)
+
+    def create_conversation(self, task_name, task_config, max_turn_step=None, phase_key=None):
+        phase_key = phase_key or task_name
+        if self.is_phase_completed(phase_key):
+            return
+
+        if self.use_parallel_coding(task_name, task_config):
+            last_conv = self.create_parallel_coding(task_name, task_config, phase_key)
+            if last_conv is not None:
+                self.finish_phase(task_name, phase_key, last_conv)
+                return
+
+        user_system_message, assistant_system_message, start_turn, last_conv = self.begin_phase(
+            task_name, task_config, phase_key
+        )
+        user_role_name = task_config.user_role_name
+        assistant_role_name = task_config.assistant_role_name
+
+        cyclenum = self.get_turn_limit(task_name, max_turn_step)
+        assistant_chat_bot = self.get_chat_bot(task_config, "assistant")
+        user_chat_bot = self.get_chat_bot(task_config, "user")
+
+        for count in range(start_turn, cyclenum):  # Maximum of 4 back-and-forth exchanges
+            # Assistant's turn
+            with self.turn_metrics(phase_key, count, "assistant"):
+                assistant_response = assistant_chat_bot.send_messages_and_get_response(
+                    assistant_system_message, stop_when=info_line_terminator
+                )
+            assistant_system_message.assistant(assistant_response)
+            user_system_message.user(assistant_response)
+
+            last_conv = assistant_response
+            self.logger.info(f"Assistant {assistant_role_name}: {assistant_response}",
+                             extra={"phase": phase_key, "turn": count, "role": "assistant"})
+
+            # Check if the assistant's response starts with "<INFO>" to terminate the conversation
+            if assistant_response.strip().startswith("<INFO>"):
+                break
+            # The user's reply to the last assistant response is never used, so skip it
+            elif count == cyclenum-1:
+                break
+
+            # User's turn
+            with self.turn_metrics(phase_key, count, "user"):
+                user_response = user_chat_bot.send_messages_and_get_response(
+                    user_system_message, stop_when=info_line_terminator
+                )
+            user_system_message.assistant(user_response)
+            assistant_system_message.user(user_response)
+
+            self.logger.info(f"User {user_role_name}: {user_response}",
+                             extra={"phase": phase_key, "turn": count, "role": "user"})
+
+            # Check if the user's response starts with "<INFO>" to terminate the conversation
+            if user_response.strip().startswith("<INFO>"):
+                break
+
+            self.end_turn(phase_key, count + 1, user_system_message, assistant_system_message, last_conv)
+
+        if task_name in PATCH_PHASES and last_conv:
+            self.patch_code(task_config, phase_key, assistant_system_message, last_conv, cyclenum)
+
+        self.finish_phase(task_name, phase_key, last_conv)
+
+    def update_code_repository(self, task_name, last_conv):
+        """
+        Store the code blocks of a response in the CodeRepository of the run and write the files that changed.
+
+        Args:
+            task_name (str): The name of the phase.
+            last_conv (str): The last assistant response of the phase.
+        """
+        if not isinstance(self.intermediate_vars.codes, CodeRepository):
+            self.intermediate_vars.codes = CodeRepository()
+        repository = self.intermediate_vars.codes
+
+        # One pass over the response, the "####" separators between files are skipped as header lines
+        code_blocks = TaskParser(task_name, last_conv).extract_code_blocks()
+        if not code_blocks:
+            self.logger.error("Parsing the output: no code block in the response")
+        for code_block in code_blocks:
+            try:
+                code_file = repository.update_from_block(code_block)
+                if code_file is not None:
+                    self.write_code_file(code_file)
+
+            except Exception as e:
+                self.logger.error(f"Parsing the output: {str(e)}")
+
+    def write_code_file(self, code_file):
+        """
+        Write a version of a file into the codes directory.
+
+        Args:
+            code_file (CodeFile): The file; files are only rewritten by the versions that follow the one that created them.
+        """
+        generator = CodeFileGenerator(code_file.filename, code_file.extension, code_file.language,
+                                      code_file.docstring, code_file.content, self.code_file_path,
+                                      overwrite=code_file.version > 1)
+        generator.create_code_file()
+
+    def apply_code_edits(self, response):
+        """
+        Apply the edit blocks and unified diff hunks of a response to the CodeRepository and write the files that changed.
+
+        Args:
+            response (str): The response of a patch phase.
+
+        Returns:
+            PatchResult: The applied and failed edits.
+        """
+        if not isinstance(self.intermediate_vars.codes, CodeRepository):
+            self.intermediate_vars.codes = CodeRepository()
+        result = apply_edits(self.intermediate_vars.codes, parse_edits(response))
+        for code_file in result.updated:
+            self.write_code_file(code_file)
+        self.logger.info(f"Applied {len(result.applied)} edits to {[code_file.path for code_file in result.updated]}, "
+                         f"{len(result.failed)} failed")
+        return result
+
+    def setup_edit_retry_message(self, assistant_system_message, task_config, failed_edits):
+        """
+        Ask the assistant again for the edits that could not be applied, showing it only the files they target.
+
+        Args:
+            assistant_system_message (Message): The assistant history of the phase, the request is appended to it.
+            task_config (TaskConfig): The configuration of the phase.
+            failed_edits (list): The FileEdits that could not be applied.
+        """
+        paths = dict.fromkeys(edit.path for edit in failed_edits)
+        retry_prompt_str = DynamicTaskConfigFormatter(self.intermediate_vars).format_task_config(
+            task_config.assistant_role_name, task_config.get_template("edit_retry_prompt"),
+            failed_edits="\n".join(edit.render() for edit in failed_edits),
+            files=self.intermediate_vars.codes.render(paths),
+        )
+        assistant_system_message.user(retry_prompt_str)
+        self.logger.info(f"User {task_config.user_role_name}: {retry_prompt_str}")
+
+    def patch_code(self, task_config, phase_key, assistant_system_message, last_conv, turn):
+        """
+        Apply the edits of the last response of a patch phase, re-asking only for the edits that failed.
+
+        Args:
+            task_config (TaskConfig): The configuration of the phase.
+            phase_key (str): The key of the phase in the checkpoint.
+            assistant_system_message (Message): The assistant history of the phase.
+            last_conv (str): The last assistant response of the phase.
+            turn (int): The turn index of the first re-ask, after the exchanges of the phase.
+        """
+        result = self.apply_code_edits(last_conv)
+        chat_bot = self.get_chat_bot(task_config, "assistant")
+        for attempt in range(MAX_EDIT_RETRIES):
+            if not result.failed or not task_config.edit_retry_prompt:
+                break
+            self.setup_edit_retry_message(assistant_system_message, task_config, result.failed)
+            with self.turn_metrics(phase_key, turn + attempt, "assistant"):
+                response = chat_bot.send_messages_and_get_response(assistant_system_message)
+            assistant_system_message.assistant(response)
+            self.logger.info(f"Assistant {task_config.assistant_role_name}: {response}",
+                             extra={"phase": phase_key, "turn": turn + attempt, "role": "assistant"})
+            result = self.apply_code_edits(response)
+        if result.failed:
+            self.logger.warning(f"{len(result.failed)} edits could not be applied")
+
+    def process_output(self, task_name, last_conv):
+        """
+        Parse the final response of a phase and store the result in the IntermediateVars.
+
+        Args:
+            task_name (str): The name of the phase.
+            last_conv (str): The last assistant response of the phase.
+        """
+        if task_name == "DemandAnalysis":
+
+            parser = TaskParser(task_name, last_conv)
+            output = parser.parse_output()
+
+            self.intermediate_vars.modality = output
+        elif task_name == "LanguageChoose":
+
+            parser = TaskParser(task_name, last_conv)
+            output = parser.parse_output()
+
+            self.intermediate_vars.language = output
+        elif task_name == "Coding":
+            self.update_code_repository(task_name, last_conv)
+
+            self.logger.info("Done")
+        elif task_name == "CodeReviewComment":
+            self.intermediate_vars.comments = last_conv
+        else:
+            pass
+
+
+def task_config_decorator(func):
+    def wrapper(self, *args, **kwargs):
+        task_configs = self.get_task_configs()
+        for task_name, task_config in task_configs.items():
+            func(self, task_name, task_config)
+    return wrapper
+
+
+class AgentConversationExtended(AgentConversation):
+    def __init__(self, app_name, model, app_desc, logger, task_config_path, code_file_path, openai=None, nvidiaai=None,
+                 response_cache=None, fallback_model=None, router_config=None, parallel_coding=False):
+        super().__init__(app_name, model, app_desc, logger, code_file_path, openai=openai, nvidiaai=nvidiaai,
+                         response_cache=response_cache, fallback_model=fallback_model, router_config=router_config,
+                         parallel_coding=parallel_coding)
+        self.task_config_path = task_config_path
+
+    def get_task_configs(self):
+        task_configs = {}
+        try:
+            # TaskConfig.json is parsed and its prompts validated once per process, see ConfigRegistry
+            task_configs, errors = get_config_registry().get_task_configs(self.task_config_path)
+            for task_name, error in errors.items():
+                self.logger.error(f"Skipping phase {task_name} of TaskConfig.json: {error}")
+
+        except FileNotFoundError:
+            self.logger.error("TaskConfig.json file not found.")
+        except Exception as e:
+            self.logger.error(f"Error reading TaskConfig.json: {str(e)}")
+
+        return task_configs
+
+    @task_config_decorator
+    def run_conversations(self, task_name, task_config):
+        return self.create_conversation(task_name, task_config)
+
+
+    def print_conversation(self, conversation):
+        # Print the conversation
+        for exchange in conversation:
+            self.logger.info(f"User: {exchange['User']}")
+            self.logger.info(f"Assistant: {exchange['Assistant']}")
+
+
+if __name__ == "__main__":
+    app_name = "YourAppName"
+    model = "YourModelName"
+    app_desc = "YourAppDescription"
+
+    conversation_manager = AgentConversationExtended(app_name, model, app_desc)
+    conversation_manager.run_conversations()
@@ -0,0 +1,382 @@
+import json
+import logging
+import os
+import time
+from dataclasses import replace
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, Optional, Tuple
+
+from chains.async_converse import AsyncAgentConversationExtended
+from chains.checkpoint import RunCheckpoint
+from chat.history_store import ChatHistoryStore
+from chat.recorder import RecordingChatBot, ReplayChatBot, TranscriptRecorder
+from chat.response_cache import ResponseCache
+from chat.router import ROUTER_CONFIG_FILE, RouterConfig, RoutingChatBot
+from llms.rate_limiter import set_quota_share
+from setup.directory_structure import DirectoryStructure
+from utils.api_key_check import check_api_key
+from utils.argparse_utils import resolve_model
+from utils.config_registry import get_config_registry
+from utils.load_env import load_env_file
+from utils.logging_utils import CONSOLE_MAX_CHARS, setup_colored_logger, teardown_logger
+from utils.metrics import MetricsRecorder
+
+DEFAULT_CACHE_PATH = os.path.join("outputs", "cache", "llm_responses.sqlite3")
+CONFIG_BUNDLE_PATH = os.path.join("outputs", "cache", "config_bundle.pickle")
+
+
+def run_app(app_name: Optional[str], app_desc: Optional[str], model: Optional[str], openai: bool = False,
+            nvidia: bool = False, debug: bool = False, resume_dir: Optional[str] = None,
+            cache_path: Optional[str] = DEFAULT_CACHE_PATH, record_path: Optional[str] = None,
+            replay_path: Optional[str] = None, fallback_model: Optional[str] = None, hedge: bool = False,
+            parallel_coding: bool = False, console_max_chars: Optional[int] = None) -> str:
+    """
+    Generate a single app end to end, checkpointing after every exchange.
+
+    Args:
+        app_name (str): The name of the app, taken from the checkpoint when resuming and omitted.
+        app_desc (str): The description of the app, taken from the checkpoint when resuming and omitted.
+        model (str): The resolved model name, e.g. "gpt-4", taken from the checkpoint when resuming and omitted.
+        openai (bool): Use the OpenAI backend. When resuming without a backend, the backends of the
+            checkpoint are used.
+        nvidia (bool): Use the NVIDIA backend.
+        debug (bool): Enable debug logging.
+        resume_dir (str, optional): The base directory of an interrupted run to continue.
+        cache_path (str, optional): The path to the shared LLM response cache, None bypasses the cache.
+        record_path (str, optional): The path to a transcript receiving every request/response pair.
+        replay_path (str, optional): The path to a recorded transcript served instead of a live backend.
+        fallback_model (str, optional): The resolved model requests fail over to, served by NVIDIA when
+            both backends are used, taken from the checkpoint when resuming and omitted.
+        hedge (bool): Hedge slow requests with a duplicate request, see RoutingChatBot.
+        parallel_coding (bool): Generate the files of the Coding phase in concurrent requests.
+        console_max_chars (int, optional): The characters of a message shown on the console, CONSOLE_MAX_CHARS
+            by default, 0 for whole messages. The log files always hold whole messages.
+
+    Returns:
+        str: The base directory of the run.
+    """
+    checkpoint = None
+    # Arguments of a resumed run differing from the ones it was started with, logged once the logger is set up
+    resume_mismatches = []
+    if resume_dir:
+        checkpoint = RunCheckpoint(DirectoryStructure(app_name, base_dir=resume_dir).get_checkpoint_path())
+        if not checkpoint.exists():
+            raise FileNotFoundError(f"No checkpoint found in '{resume_dir}'")
+        run_info = checkpoint.get_run_info()
+        app_name = app_name or run_info["app_name"]
+        app_desc = app_desc or run_info["app_desc"]
+        if not (openai or nvidia or replay_path):
+            openai, nvidia = run_info.get("openai", False), run_info.get("nvidia", False)
+        model = model or run_info.get("model")
+        fallback_model = fallback_model or run_info.get("fallback_model")
+        if model is None:
+            raise ValueError(f"The checkpoint in '{resume_dir}' does not record the model, pass --model")
+        if not (openai or nvidia or replay_path):
+            raise ValueError(f"The checkpoint in '{resume_dir}' does not record the backend, pass --openai or --nvidia")
+        resumed_args = {"model": model, "fallback_model": fallback_model}
+        if not replay_path:
+            resumed_args.update(openai=openai, nvidia=nvidia)
+        resume_mismatches = [(key, value, run_info[key]) for key, value in resumed_args.items()
+                             if key in run_info and run_info[key] != value]
+
+    # Create the directory structure
+    directory_structure = DirectoryStructure(app_name, base_dir=resume_dir)
+    directory_structure.create_structure()
+
+    if checkpoint is None:
+        checkpoint = RunCheckpoint(directory_structure.get_checkpoint_path())
+        checkpoint.set_run_info(app_name=app_name, app_desc=app_desc, model=model, openai=openai, nvidia=nvidia,
+                                fallback_model=fallback_model)
+
+    log_file_path = directory_structure.get_logs_directory()
+    code_file_path = directory_structure.get_codes_directory()
+
+    # Determine the log level based on the presence of the --debug flag
+    log_level = logging.DEBUG if debug else logging.INFO
+
+    # Set up the logger with the determined log level and app_name
+    logger = setup_colored_logger(
+        log_file_path, app_name, log_level,
+        console_max_chars=CONSOLE_MAX_CHARS if console_max_chars is None else console_max_chars,
+    )
+    logger.info("Starting your app")
+    for key, value, run_value in resume_mismatches:
+        logger.warning(f"Resuming with {key}={value!r} although the run was started with {key}={run_value!r}: "
+                       f"its phases will mix both")
+
+    try:
+        # Get the paths to the configuration files
+        config_registry = get_config_registry()
+        agents_config_path = config_registry.agents_config_path
+        llm_config_path = config_registry.llm_config_path
+        taskchain_config_path = config_registry.taskchain_config_path
+        task_config_path = config_registry.task_config_path
+        env_path = config_registry.env_path
+
+        logger.info(f"{app_desc=}")
+        logger.info(f"{app_name=}")
+        logger.info(f"{model=}")
+        logger.info(f"{fallback_model=}")
+        logger.info(f"{agents_config_path=}")
+        logger.info(f"{llm_config_path=}")
+        logger.info(f"{taskchain_config_path=}")
+        logger.info(f"{task_config_path=}")
+        logger.info(f"{env_path=}")
+        # Parsed once per process, later runs of a batch worker only check that the files are unchanged
+        for config_name, error in config_registry.preload().items():
+            logger.error(f"Invalid {config_name}: {error}")
+
+        if openai:
+            try:
+                # Try to load the OpenAI API key from the environment file
+                load_env_file(env_path)
+            except Exception as e:
+                # If loading from the environment file fails, use the check_api_key function
+                logger.warning(f"Failed to load OPENAI_API_KEY from environment: {e}")
+                check_api_key('OPENAI_API_KEY')
+
+        if nvidia:
+            logger.info("inside the nvidia")
+            try:
+                # Try to load the NVIDIA API key from the environment file
+                load_env_file(env_path)
+            except Exception as e:
+                # If loading from the environment file fails, use the check_api_key function
+                logger.warning(f"Failed to load NVIDIA_API_KEY from environment: {e}")
+                check_api_key('NVIDIA_API_KEY')
+
+        if replay_path:
+            # The recorded responses stand in for the backend, so no client is set up
+            openai = nvidia = False
+            cache_path = None
+
+        response_cache = ResponseCache(cache_path) if cache_path else None
+        router_config = None
+        if fallback_model or hedge:
+            try:
+                router_config = RouterConfig.load_from_file(ROUTER_CONFIG_FILE)
+            except FileNotFoundError:
+                router_config = RouterConfig()
+            router_config = replace(router_config, hedge=hedge or router_config.hedge)
+
+        # Create an instance of the AsyncAgentConversationExtended class
+        conversation_manager = AsyncAgentConversationExtended(
+            app_name, model, app_desc, logger, task_config_path, code_file_path, openai=openai, nvidiaai=nvidia,
+            response_cache=response_cache, fallback_model=fallback_model, router_config=router_config,
+            parallel_coding=parallel_coding
+        )
+        conversation_manager.set_checkpoint(checkpoint)
+        # Every message of the run is appended to a compressed transcript per phase in chat_history/
+        history_store = ChatHistoryStore(directory_structure.get_chat_history_directory())
+        conversation_manager.set_history_store(history_store)
+        router = conversation_manager.chat_bot if isinstance(conversation_manager.chat_bot, RoutingChatBot) else None
+
+        if replay_path:
+            logger.info(f"Replaying responses from {replay_path}")
+            conversation_manager.chat_bot = ReplayChatBot(replay_path)
+        recorder = None
+        if record_path:
+            logger.info(f"Recording requests and responses to {record_path}")
+            recorder = TranscriptRecorder(record_path)
+            provider = "router" if router else "openai" if openai else "nvidia" if nvidia else "replay"
+            conversation_manager.wrap_chat_bots(lambda chat_bot: RecordingChatBot(chat_bot, recorder, provider))
+
+        # Run conversations for all tasks on the asyncio conversation engine
+        try:
+            conversation_manager.run_conversations()
+        finally:
+            # Export what was measured even when the run fails part way
+            export_metrics(conversation_manager.metrics, log_file_path, logger)
+            history_store.close()
+
+        if response_cache:
+            logger.info(f"Response cache: {response_cache.stats()}")
+            response_cache.close()
+        if recorder:
+            recorder.close()
+        if router:
+            logger.info(f"Routing: {router.stats()}")
+            router.close()
+        for (provider, model, chat_config), phase_router in conversation_manager.phase_routers.items():
+            logger.info(f"Routing {provider}/{model} {chat_config}: {phase_router.stats()}")
+            phase_router.close()
+    finally:
+        # Batch workers run many apps per process, so release the handlers of this run
+        teardown_logger(logger)
+
+    return directory_structure.base_dir
+
+
+def export_metrics(metrics: MetricsRecorder, log_file_path: str, logger: logging.Logger) -> None:
+    """
+    Write the LLM call metrics of a run to metrics.json and metrics.prom in its logs directory.
+
+    Args:
+        metrics (MetricsRecorder): The metrics of the run.
+        log_file_path (str): The logs directory of the run.
+        logger (logging.Logger): The logger of the run.
+    """
+    metrics.export_json(os.path.join(log_file_path, "metrics.json"))
+    metrics.export_prometheus(os.path.join(log_file_path, "metrics.prom"))
+    for phase, summary in metrics.summary().items():
+        logger.info(f"Metrics {phase}: {summary['calls']} calls, {summary['request_tokens']} request tokens, "
+                    f"{summary['response_tokens']} response tokens, {summary['latency_total_s']:.2f}s, "
+                    f"{summary['retries']} retries, {summary['cache_hits']} cache hits")
+
+
+def iter_jobs(batch_path: str) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """
+    Lazily read the jobs of a batch file, one JSON object per line.
+
+    Args:
+        batch_path (str): The path to the batch JSONL file.
+
+    Yields:
+        Tuple[int, Optional[Dict], Optional[str]]: The line number, the job (None if invalid)
+        and an error message (None if valid).
+    """
+    with open(batch_path, "r", encoding="utf-8") as batch_file:
+        for line_number, line in enumerate(batch_file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(job, dict) or "app_name" not in job or "app_desc" not in job:
+                yield line_number, None, "Job must be an object with 'app_name' and 'app_desc'"
+                continue
+            yield line_number, job, None
+
+
+def run_job(line_number: int, job: Dict, defaults: Dict) -> Dict:
+    """
+    Run a single batch job, turning any failure into an error status.
+
+    Args:
+        line_number (int): The line of the job in the batch file.
+        job (Dict): The job, with 'app_name', 'app_desc' and optionally 'model', 'openai', 'nvidia'.
+        defaults (Dict): The values taken from the command line for keys the job omits.
+
+    Returns:
+        Dict: The status/result line of the job.
+    """
+    start = time.perf_counter()
+    result = {"line": line_number, "app_name": job.get("app_name")}
+    try:
+        openai = bool(job.get("openai", defaults["openai"]))
+        nvidia = bool(job.get("nvidia", defaults["nvidia"]))
+        model = resolve_model(job["model"], openai, nvidia) if "model" in job else defaults["model"]
+        output_dir = run_app(job["app_name"], job["app_desc"], model, openai=openai, nvidia=nvidia,
+                             debug=defaults["debug"], cache_path=defaults["cache_path"],
+                             fallback_model=defaults.get("fallback_model"), hedge=defaults.get("hedge", False),
+                             parallel_coding=defaults.get("parallel_coding", False),
+                             console_max_chars=defaults.get("console_max_chars"))
+        result.update(status="ok", output_dir=output_dir)
+    except Exception as e:
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+    result["elapsed_s"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def init_worker(quota_share: float, config_bundle_path: str) -> None:
+    """
+    Initialize a batch worker process.
+
+    Args:
+        quota_share (float): The share of the configured rate limits given to the worker.
+        config_bundle_path (str): The configuration bundle saved by the batch, see ConfigRegistry.save_bundle.
+    """
+    set_quota_share(quota_share)
+    get_config_registry().load_bundle(config_bundle_path)
+
+
+def run_batch(batch_path: str, output_path: str, workers: int, defaults: Dict) -> Dict[str, int]:
+    """
+    Fan the jobs of a batch file out across a process pool.
+
+    Jobs are streamed from the batch file with at most twice as many jobs in flight
+    as there are workers, and each result is appended to the output JSONL as soon as
+    its job finishes. Every worker gets an equal share of the configured rate limits,
+    so the pool as a whole stays within the provider quotas.
+
+    When a worker dies, the jobs that were in flight on the pool are run again one at a
+    time on a fresh pool, so that only a job crashing its worker on its own is reported
+    as an error.
+
+    Args:
+        batch_path (str): The path to the batch JSONL file.
+        output_path (str): The path to the JSONL file receiving one result line per job.
+        workers (int): The number of worker processes.
+        defaults (Dict): The values taken from the command line for keys a job omits.
+
+    Returns:
+        Dict[str, int]: The number of jobs per status.
+    """
+    counts = {"ok": 0, "error": 0}
+    max_in_flight = max(1, workers) * 2
+    quota_share = 1 / max(1, workers)
+    # Workers load the parsed configuration files in a single read instead of parsing each of them
+    get_config_registry().save_bundle(CONFIG_BUNDLE_PATH)
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                   initargs=(quota_share, CONFIG_BUNDLE_PATH))
+    in_flight = {}
+
+    with open(output_path, "a", encoding="utf-8") as output_file:
+        def record(result):
+            counts[result["status"]] += 1
+            output_file.write(json.dumps(result) + "\n")
+            output_file.flush()
+
+        def restart():
+            nonlocal executor
+            executor.shutdown(wait=False)
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                           initargs=(quota_share, CONFIG_BUNDLE_PATH))
+
+        def run_alone(line_number, job):
+            # Nothing else runs on the pool, so a crash can only be caused by this job
+            try:
+                record(executor.submit(run_job, line_number, job, defaults).result())
+            except BrokenProcessPool as e:
+                record({"line": line_number, "app_name": job.get("app_name"), "status": "error",
+                        "error": f"Worker process died: {e}"})
+                restart()
+
+        def collect(futures, suspects):
+            for future in futures:
+                line_number, job = in_flight.pop(future)
+                try:
+                    record(future.result())
+                except BrokenProcessPool:
+                    suspects.append((line_number, job))
+
+        def drain(return_when):
+            done, _ = wait(in_flight, return_when=return_when)
+            suspects = []
+            collect(done, suspects)
+            if suspects:
+                # A crashed worker poisons the whole pool and fails every job in flight, which cannot tell
+                # which job crashed it: each of them is run again alone on a fresh pool
+                collect(wait(in_flight).done, suspects)
+                restart()
+                for line_number, job in sorted(suspects, key=lambda suspect: suspect[0]):
+                    run_alone(line_number, job)
+
+        try:
+            for line_number, job, error in iter_jobs(batch_path):
+                if error:
+                    record({"line": line_number, "status": "error", "error": error})
+                    continue
+                while len(in_flight) >= max_in_flight:
+                    drain(FIRST_COMPLETED)
+                in_flight[executor.submit(run_job, line_number, job, defaults)] = (line_number, job)
+            while in_flight:
+                drain(FIRST_COMPLETED)
+        finally:
+            executor.shutdown(wait=True)
+
+    return counts
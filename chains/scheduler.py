@@ -0,0 +1,151 @@
+import asyncio
+from dataclasses import dataclass, field, fields
+from typing import Dict, List, Set
+
+from prompt_config.task_config import MODEL_OVERRIDE_KEYS
+from prompt_config.task_config_vars import IntermediateVars, PHASE_OUTPUT_VARS
+from utils.config_registry import get_config_registry
+
+# "task" is overwritten with the phase name right before each prompt is rendered,
+# so it never carries data from one phase to another
+DEPENDENCY_VARS = {f.name for f in fields(IntermediateVars)} - {"task"}
+
+
+@dataclass
+class PhaseNode:
+    """
+    A phase of the task chain compiled into a node of the dependency graph.
+
+    Attributes:
+        name (str): The name of the phase.
+        phase_type (str): "SimplePhase" or "ComposedPhase".
+        max_turn_step (int): The maximum number of exchanges of a SimplePhase, -1 for the default.
+        cycle_num (int): The number of times a ComposedPhase runs its composition.
+        composition (List[PhaseNode]): The SimplePhases of a ComposedPhase.
+        reads (Set[str]): The IntermediateVars fields the phase prompts read.
+        writes (Set[str]): The IntermediateVars fields the phase outputs write.
+        depends_on (List[str]): The names of the phases that must finish first.
+        overrides (Dict): The "model", "chat_config" and "roles" of a SimplePhase overriding TaskConfig.json.
+    """
+    name: str
+    phase_type: str
+    max_turn_step: int = -1
+    cycle_num: int = 1
+    composition: List["PhaseNode"] = field(default_factory=list)
+    reads: Set[str] = field(default_factory=set)
+    writes: Set[str] = field(default_factory=set)
+    depends_on: List[str] = field(default_factory=list)
+    overrides: Dict = field(default_factory=dict)
+
+
+class TaskchainScheduler:
+    """
+    Compiles TaskchainConfigs.json into a dependency graph and runs it on an event loop.
+
+    A phase depends on every earlier phase of the chain that writes a field it reads,
+    writes a field it also writes, or reads a field it overwrites. Phases without such
+    a dependency run concurrently.
+    """
+
+    def __init__(self, conversation, taskchain_config_path: str, task_configs: Dict):
+        """
+        Initialize the TaskchainScheduler.
+
+        Args:
+            conversation (AsyncAgentConversation): The conversation manager that runs each phase.
+            taskchain_config_path (str): The path to TaskchainConfigs.json.
+            task_configs (Dict[str, TaskConfig]): The phase prompts loaded from TaskConfig.json.
+        """
+        self.conversation = conversation
+        self.logger = conversation.logger
+        self.task_configs = task_configs
+        # Shared with every run of the process, so the chain is only read
+        self.taskchain_config = get_config_registry().get_taskchain_config(taskchain_config_path)
+        self.nodes = self.compile()
+
+    def _compile_phase(self, phase_config: Dict):
+        """
+        Compile a single entry of the chain, returning None when none of its phases have a prompt.
+        """
+        phase_type = phase_config.get("phaseType", "SimplePhase")
+        name = phase_config["phase"]
+
+        if phase_type == "ComposedPhase":
+            composition = [
+                node for node in (self._compile_phase(child) for child in phase_config.get("Composition", []))
+                if node is not None
+            ]
+            if not composition:
+                self.logger.info(f"Skipping composed phase {name}: none of its phases are in TaskConfig.json")
+                return None
+            return PhaseNode(
+                name=name,
+                phase_type=phase_type,
+                cycle_num=int(phase_config.get("cycleNum", 1)),
+                composition=composition,
+                reads=set().union(*(node.reads for node in composition)),
+                writes=set().union(*(node.writes for node in composition)),
+            )
+
+        if name not in self.task_configs:
+            self.logger.info(f"Skipping phase {name}: no phase prompt in TaskConfig.json")
+            return None
+        return PhaseNode(
+            name=name,
+            phase_type=phase_type,
+            max_turn_step=int(phase_config.get("max_turn_step", -1)),
+            reads=self.task_configs[name].get_template().fields & DEPENDENCY_VARS,
+            writes=set(PHASE_OUTPUT_VARS.get(name, set())),
+            overrides={key: phase_config[key] for key in MODEL_OVERRIDE_KEYS if key in phase_config},
+        )
+
+    def compile(self) -> List[PhaseNode]:
+        """
+        Compile the chain into phase nodes in chain order, each with its dependencies.
+
+        Returns:
+            List[PhaseNode]: The top-level phase nodes.
+        """
+        nodes = []
+        for phase_config in self.taskchain_config.get("chain", []):
+            node = self._compile_phase(phase_config)
+            if node is None:
+                continue
+            for earlier in nodes:
+                if (earlier.writes & node.reads) or (earlier.writes & node.writes) or (earlier.reads & node.writes):
+                    node.depends_on.append(earlier.name)
+            self.logger.debug(f"Phase {node.name}: reads={sorted(node.reads)} writes={sorted(node.writes)} "
+                              f"depends_on={node.depends_on}")
+            nodes.append(node)
+        return nodes
+
+    async def _execute(self, node: PhaseNode, phase_key: str = None):
+        phase_key = phase_key or node.name
+        if node.phase_type == "ComposedPhase":
+            for cycle in range(node.cycle_num):
+                for child in node.composition:
+                    # Each cycle of a composed phase is checkpointed separately
+                    await self._execute(child, f"{phase_key}[{cycle}].{child.name}")
+        else:
+            task_config = self.task_configs[node.name]
+            if node.overrides:
+                task_config = task_config.with_overrides(node.overrides)
+            await self.conversation.acreate_conversation(
+                node.name, task_config, max_turn_step=node.max_turn_step, phase_key=phase_key
+            )
+
+    async def run(self):
+        """
+        Run every phase as soon as the phases it depends on have finished.
+        """
+        scheduled = {}
+
+        async def run_node(node):
+            await asyncio.gather(*(scheduled[name] for name in node.depends_on))
+            await self._execute(node)
+
+        # Nodes are in chain order, so dependencies are always scheduled before their dependents
+        for node in self.nodes:
+            scheduled[node.name] = asyncio.ensure_future(run_node(node))
+
+        await asyncio.gather(*scheduled.values())
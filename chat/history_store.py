@@ -0,0 +1,321 @@
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from chat.message import Message
+
+TRANSCRIPT_SUFFIX = ".jsonl.gz"
+INDEX_SUFFIX = ".idx"
+# Characters kept in the file name of a phase transcript, e.g. "CodeReview[0].CodeReviewComment"
+UNSAFE_FILENAME_PATTERN = re.compile(r'[^\w.\[\]-]')
+
+
+@dataclass(frozen=True)
+class TranscriptEntry:
+    """
+    A message appended to a history of a phase.
+
+    Attributes:
+        seq (int): The position of the entry in the transcript of the phase.
+        history (str): The history the message was appended to, e.g. "assistant" for the messages
+            the assistant agent is sent, or the file name of a parallel coding request.
+        role (str): "system", "user" or "assistant".
+        content (str): The content of the message.
+        time (float): The time the message was appended, in seconds since the epoch.
+    """
+    seq: int
+    history: str
+    role: str
+    content: str
+    time: float
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def _scan_members(data_file, start: int) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    Yield the (offset, length, decompressed payload) of the complete gzip members from start on,
+    stopping at a member cut short, e.g. by a crash while it was written.
+    """
+    data_file.seek(start)
+    data = data_file.read()
+    offset = 0
+    while offset < len(data):
+        decompressor = zlib.decompressobj(wbits=31)
+        try:
+            payload = decompressor.decompress(data[offset:])
+        except zlib.error:
+            return
+        if not decompressor.eof:
+            return
+        length = len(data) - offset - len(decompressor.unused_data)
+        yield start + offset, length, payload
+        offset += length
+
+
+class TranscriptWriter:
+    """
+    Appends the messages of a phase to <phase>.jsonl.gz, one gzip member per message.
+
+    The concatenated members form a regular gzip file of JSON lines, so "zcat" reads the whole
+    transcript, while <phase>.idx holds one [offset, length, history, role] line per member, so that
+    a reader decompresses only the entries it needs. The data is written before its index line; an
+    entry the index misses after a crash is indexed again, or dropped if incomplete, when the
+    transcript is reopened.
+    """
+
+    def __init__(self, path: str, compresslevel: int = 6):
+        """
+        Open a transcript for appending, creating it if needed.
+
+        Args:
+            path (str): The path to the transcript, ending with TRANSCRIPT_SUFFIX.
+            compresslevel (int): The zlib compression level of each entry.
+        """
+        self.path = path
+        self.index_path = path[:-len(TRANSCRIPT_SUFFIX)] + INDEX_SUFFIX
+        self.compresslevel = compresslevel
+        self._lock = threading.Lock()
+        self._index = _read_index(self.index_path)
+        self._repair_index()
+        self._data_file = open(path, "ab")
+        self._index_file = open(self.index_path, "a", encoding="utf-8")
+        self._recover()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _repair_index(self) -> None:
+        # An index line cut short by a crash is rewritten, otherwise the next line would be glued to it
+        try:
+            with open(self.index_path, "rb") as index_file:
+                content = index_file.read()
+        except FileNotFoundError:
+            return
+        if content and not content.endswith(b"\n") or content.count(b"\n") != len(self._index):
+            with open(self.index_path, "w", encoding="utf-8") as index_file:
+                index_file.writelines(json.dumps(index_entry) + "\n" for index_entry in self._index)
+
+    def _recover(self) -> None:
+        end = self._index[-1][0] + self._index[-1][1] if self._index else 0
+        if os.path.getsize(self.path) == end:
+            return
+        with open(self.path, "rb") as data_file:
+            for offset, length, payload in _scan_members(data_file, end):
+                entry = json.loads(payload)
+                self._write_index_line([offset, length, entry["history"], entry["role"]])
+                end = offset + length
+        # Drop an entry cut short, so that the next one starts on a member boundary
+        self._data_file.truncate(end)
+        self._data_file.seek(end)
+
+    def _write_index_line(self, index_entry: List) -> None:
+        self._index.append(index_entry)
+        self._index_file.write(json.dumps(index_entry) + "\n")
+        self._index_file.flush()
+
+    def append(self, history: str, role: str, content: str) -> int:
+        """
+        Append a message.
+
+        Args:
+            history (str): The history the message was appended to.
+            role (str): "system", "user" or "assistant".
+            content (str): The content of the message.
+
+        Returns:
+            int: The seq of the entry.
+        """
+        with self._lock:
+            seq = len(self._index)
+            entry = TranscriptEntry(seq, history, role, content, time.time())
+            compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, 31)
+            member = compressor.compress((json.dumps(entry.to_dict(), ensure_ascii=False) + "\n").encode("utf-8"))
+            member += compressor.flush()
+            offset = self._data_file.tell()
+            self._data_file.write(member)
+            self._data_file.flush()
+            self._write_index_line([offset, len(member), history, role])
+            return seq
+
+    def attach(self, message: Message, history: str, start: int = 0) -> None:
+        """
+        Stream a message history into the transcript: its entries from start on, then every later append.
+
+        Args:
+            message (Message): The history, whose sink is replaced.
+            history (str): The name of the history in the transcript.
+            start (int): The first entry to write, e.g. the number of entries written by an earlier attempt.
+        """
+        for entry in message.messages[start:]:
+            self.append(history, entry["role"], entry["content"])
+        message.sink = lambda entry: self.append(history, entry["role"], entry["content"])
+
+    def close(self) -> None:
+        with self._lock:
+            self._data_file.close()
+            self._index_file.close()
+
+
+def _read_index(index_path: str) -> List[List]:
+    index = []
+    try:
+        with open(index_path, "r", encoding="utf-8") as index_file:
+            for line in index_file:
+                try:
+                    index.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A line cut short by a crash, its entry is indexed again from the data
+                    break
+    except FileNotFoundError:
+        pass
+    return index
+
+
+class TranscriptReader:
+    """
+    Random and lazy access to the entries of a transcript written by TranscriptWriter.
+
+    Only the index is read up front; each entry is read and decompressed when it is accessed. A
+    transcript without an index is indexed by scanning its members once.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a transcript.
+
+        Args:
+            path (str): The path to the transcript, ending with TRANSCRIPT_SUFFIX.
+        """
+        self.path = path
+        self._index = _read_index(path[:-len(TRANSCRIPT_SUFFIX)] + INDEX_SUFFIX)
+        end = self._index[-1][0] + self._index[-1][1] if self._index else 0
+        with open(path, "rb") as data_file:
+            # Entries written after the last index line, e.g. by a writer that crashed
+            for offset, length, payload in _scan_members(data_file, end):
+                entry = json.loads(payload)
+                self._index.append([offset, length, entry["history"], entry["role"]])
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __getitem__(self, seq: int) -> TranscriptEntry:
+        """
+        Read a single entry, decompressing only that entry.
+
+        Args:
+            seq (int): The seq of the entry, negative values counting from the end.
+
+        Raises:
+            IndexError: If there is no such entry.
+        """
+        offset, length, _, _ = self._index[seq]
+        with open(self.path, "rb") as data_file:
+            data_file.seek(offset)
+            return self._decode(data_file.read(length), seq % len(self._index))
+
+    def __iter__(self) -> Iterator[TranscriptEntry]:
+        return self.iter_entries()
+
+    @staticmethod
+    def _decode(member: bytes, seq: int) -> TranscriptEntry:
+        # The position in the index is authoritative, e.g. for entries indexed again after a crash
+        return TranscriptEntry(**{**json.loads(zlib.decompress(member, wbits=31)), "seq": seq})
+
+    def iter_entries(self, history: Optional[str] = None, role: Optional[str] = None) -> Iterator[TranscriptEntry]:
+        """
+        Lazily iterate over the entries in order, decompressing one entry at a time.
+
+        Args:
+            history (str, optional): Only the entries of this history, filtered on the index.
+            role (str, optional): Only the entries of this role, filtered on the index.
+
+        Yields:
+            TranscriptEntry: The entries.
+        """
+        with open(self.path, "rb") as data_file:
+            for seq, (offset, length, entry_history, entry_role) in enumerate(self._index):
+                if (history is not None and entry_history != history) or (role is not None and entry_role != role):
+                    continue
+                data_file.seek(offset)
+                yield self._decode(data_file.read(length), seq)
+
+    def histories(self) -> List[str]:
+        """
+        Get the names of the histories of the transcript, in order of their first entry.
+        """
+        return list(dict.fromkeys(history for _, _, history, _ in self._index))
+
+
+class ChatHistoryStore:
+    """
+    The chat_history/ directory of a run: one append-only compressed transcript per phase, see
+    TranscriptWriter, fed by the message histories attached to it.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Initialize the ChatHistoryStore.
+
+        Args:
+            directory (str): The chat_history directory of the run.
+        """
+        self.directory = directory
+        self._writers: Dict[str, TranscriptWriter] = {}
+        self._lock = threading.Lock()
+
+    def get_path(self, phase_key: str) -> str:
+        """
+        Get the path to the transcript of a phase.
+        """
+        return os.path.join(self.directory, UNSAFE_FILENAME_PATTERN.sub("_", phase_key) + TRANSCRIPT_SUFFIX)
+
+    def get_writer(self, phase_key: str) -> TranscriptWriter:
+        """
+        Get the writer of the transcript of a phase, opened on first use.
+        """
+        with self._lock:
+            writer = self._writers.get(phase_key)
+            if writer is None:
+                os.makedirs(self.directory, exist_ok=True)
+                writer = self._writers[phase_key] = TranscriptWriter(self.get_path(phase_key))
+            return writer
+
+    def attach(self, phase_key: str, message: Message, history: str, start: int = 0) -> None:
+        """
+        Stream a message history into the transcript of a phase, see TranscriptWriter.attach.
+        """
+        self.get_writer(phase_key).attach(message, history, start)
+
+    def phases(self) -> List[str]:
+        """
+        Get the transcript names of the phases in the directory, sorted by name.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-len(TRANSCRIPT_SUFFIX)] for name in os.listdir(self.directory)
+                      if name.endswith(TRANSCRIPT_SUFFIX))
+
+    def open(self, phase_key: str) -> TranscriptReader:
+        """
+        Open the transcript of a phase for reading.
+
+        Raises:
+            FileNotFoundError: If the phase has no transcript.
+        """
+        return TranscriptReader(self.get_path(phase_key))
+
+    def close(self) -> None:
+        """
+        Close the transcripts, the histories attached to them must not be appended to anymore.
+        """
+        with self._lock:
+            for writer in self._writers.values():
+                writer.close()
+            self._writers.clear()
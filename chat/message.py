@@ -1,59 +1,331 @@
-from typing import List, Dict
-
-
-class Message:
-    """
-    A class to create and manage messages for chat conversations.
-
-    Methods:
-        system(content: str) -> None:
-            Adds a system message with the specified content.
-
-        user(content: str) -> None:
-            Adds a user message with the specified content.
-
-        assistant(content: str) -> None:
-            Adds an assistant message with the specified content.
-
-    Attributes:
-        messages (List[Dict[str, str]]): A list of message dictionaries.
-    """
-
-    def __init__(self):
-        self.messages = []
-
-    def system(self, content: str) -> None:
-        """
-        Adds a system message with the specified content.
-
-        Args:
-            content (str): The content of the system message.
-
-        Returns:
-            None
-        """
-        self.messages.append({"role": "system", "content": f"""{str(content)}"""})
-
-    def user(self, content: str) -> None:
-        """
-        Adds a user message with the specified content.
-
-        Args:
-            content (str): The content of the user message.
-
-        Returns:
-            None
-        """
-        self.messages.append({"role": "user", "content": f"""{str(content)}"""})
-
-    def assistant(self, content: str) -> None:
-        """
-        Adds an assistant message with the specified content.
-
-        Args:
-            content (str): The content of the assistant message.
-
-        Returns:
-            None
-        """
-        self.messages.append({"role": "assistant", "content": f"""{str(content)}"""})
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from chat.token_counter import count_message_tokens
+
+
+class Message:
+    """
+    A class to create and manage messages for chat conversations.
+
+    Methods:
+        system(content: str) -> None:
+            Adds a system message with the specified content.
+
+        user(content: str) -> None:
+            Adds a user message with the specified content.
+
+        assistant(content: str) -> None:
+            Adds an assistant message with the specified content.
+
+        count_tokens(model: str) -> int:
+            Returns the number of tokens of the messages, counting each entry only once.
+
+    Attributes:
+        messages (List[Dict[str, str]]): A list of message dictionaries.
+        token_model (str): The model whose encoding the cached token counts use.
+        sink (Callable[[Dict[str, str]], None], optional): Receives every entry as it is appended,
+            e.g. a TranscriptWriter of chat_history/.
+    """
+
+    def __init__(self, token_model: Optional[str] = None):
+        """
+        Initialize the Message.
+
+        Args:
+            token_model (str, optional): The model whose encoding count_tokens uses by default.
+                Entries are counted lazily, by the first count_tokens call after they are
+                appended, so a failing tokenizer never fails appending a message.
+        """
+        self.messages = []
+        self.token_model = token_model
+        self._token_counts = []
+        self._token_total = 0
+        self._counted_messages = self.messages
+        self.sink: Optional[Callable[[Dict[str, str]], None]] = None
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        return iter(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
+
+    def copy(self) -> "Message":
+        """
+        Get a copy sharing the entries, and their cached token counts, with this message.
+
+        Entries are never modified in place, so the copy only gets its own list: appending to
+        either message, or replacing its messages, does not affect the other. The copy has no sink.
+
+        Returns:
+            Message: The copy.
+        """
+        message = Message()
+        message.messages = list(self.messages)
+        message.token_model = self.token_model
+        if self._counted_messages is self.messages:
+            message._token_counts = list(self._token_counts)
+            message._token_total = self._token_total
+        message._counted_messages = message.messages
+        return message
+
+    def _append(self, role: str, content: str) -> None:
+        entry = {"role": role, "content": content}
+        self.messages.append(entry)
+        if self.sink is not None:
+            self.sink(entry)
+
+    def count_tokens(self, model: Optional[str] = None) -> int:
+        """
+        Returns the number of tokens of the messages, excluding the priming of the reply.
+
+        Token counts are cached per entry with a running total, so only the entries appended
+        since the last call are encoded. The cache is rebuilt when the model changes or the
+        messages list is replaced, e.g. when a checkpoint is restored.
+
+        Args:
+            model (str, optional): The model whose encoding is used, token_model by default.
+
+        Returns:
+            int: The number of tokens.
+        """
+        model = model or self.token_model
+        if (model != self.token_model or self._counted_messages is not self.messages
+                or len(self._token_counts) > len(self.messages)):
+            self.token_model = model
+            self._token_counts = []
+            self._token_total = 0
+            self._counted_messages = self.messages
+        for message in self.messages[len(self._token_counts):]:
+            num_tokens = count_message_tokens(message, model)
+            self._token_counts.append(num_tokens)
+            self._token_total += num_tokens
+        return self._token_total
+
+    def get_token_counts(self, model: Optional[str] = None) -> List[int]:
+        """
+        Returns the cached token count of every entry.
+
+        Args:
+            model (str, optional): The model whose encoding is used, token_model by default.
+
+        Returns:
+            List[int]: The number of tokens of each message, in order.
+        """
+        self.count_tokens(model)
+        return list(self._token_counts)
+
+    def system(self, content: str) -> None:
+        """
+        Adds a system message with the specified content.
+
+        Args:
+            content (str): The content of the system message.
+
+        Returns:
+            None
+        """
+        self._append("system", f"""{str(content)}""")
+
+    def user(self, content: str) -> None:
+        """
+        Adds a user message with the specified content.
+
+        Args:
+            content (str): The content of the user message.
+
+        Returns:
+            None
+        """
+        self._append("user", f"""{str(content)}""")
+
+    def assistant(self, content: str) -> None:
+        """
+        Adds an assistant message with the specified content.
+
+        Args:
+            content (str): The content of the assistant message.
+
+        Returns:
+            None
+        """
+        self._append("assistant", f"""{str(content)}""")
+
+
+# Tokens reserved for the model's reply when fitting a conversation into the context window
+DEFAULT_CONTEXT_HEADROOM = 1024
+
+
+class ContextPolicy:
+    """
+    Base class of the policies that shrink a conversation to fit the model's context window.
+
+    The chat bots apply their policy before sending whenever the messages exceed the
+    model's maximum token length minus the configured headroom.
+    """
+
+    def fit(self, messages: List[Dict[str, str]], count_tokens: Callable[[Dict[str, str]], int],
+            budget: int) -> List[Dict[str, str]]:
+        """
+        Select the messages to send.
+
+        Args:
+            messages (List[Dict[str, str]]): The full conversation.
+            count_tokens (Callable[[Dict[str, str]], int]): Counts the tokens of a single message.
+            budget (int): The maximum number of tokens of the returned messages.
+
+        Returns:
+            List[Dict[str, str]]: The messages to send, in conversation order.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def split_pinned(messages: List[Dict[str, str]],
+                     pin_first_user: bool = False) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+        """
+        Split the leading system messages, and optionally the user message that follows them,
+        from the rest of the conversation.
+        """
+        index = 0
+        while index < len(messages) and messages[index]["role"] == "system":
+            index += 1
+        if pin_first_user and index < len(messages) and messages[index]["role"] == "user":
+            index += 1
+        return messages[:index], messages[index:]
+
+    @staticmethod
+    def keep_latest(pinned: List[Dict[str, str]], history: List[Dict[str, str]],
+                    count_tokens: Callable[[Dict[str, str]], int], budget: int) -> List[Dict[str, str]]:
+        """
+        Keep the pinned messages and the longest suffix of the history that fits the budget.
+        The last message is always kept, even if it does not fit on its own.
+        """
+        used = sum(count_tokens(message) for message in pinned)
+        kept = []
+        for message in reversed(history):
+            tokens = count_tokens(message)
+            if kept and used + tokens > budget:
+                break
+            kept.append(message)
+            used += tokens
+        return pinned + kept[::-1]
+
+
+class SlidingWindowPolicy(ContextPolicy):
+    """
+    Drops the oldest messages, system prompt included, until the conversation fits.
+    """
+
+    def fit(self, messages, count_tokens, budget):
+        return self.keep_latest([], messages, count_tokens, budget)
+
+
+class PinnedSystemPolicy(ContextPolicy):
+    """
+    Keeps the leading system messages, the first user message and at most the last max_messages
+    other messages, dropping the oldest exchanges in between until the conversation fits.
+
+    The first user message is the phase prompt, with the task and the code to work on, so
+    the conversation still states what it is about after its middle was dropped.
+    """
+
+    def __init__(self, max_messages: Optional[int] = None):
+        """
+        Initialize the PinnedSystemPolicy.
+
+        Args:
+            max_messages (int, optional): The maximum number of messages kept besides the
+                system messages and the first user message.
+        """
+        self.max_messages = max_messages
+
+    def fit(self, messages, count_tokens, budget):
+        pinned, history = self.split_pinned(messages, pin_first_user=True)
+        if self.max_messages is not None:
+            history = history[-self.max_messages:] if self.max_messages > 0 else []
+        return self.keep_latest(pinned, history, count_tokens, budget)
+
+
+def summarize_heuristically(messages: List[Dict[str, str]], max_tokens: int) -> str:
+    """
+    Summarize messages by the first line of each, without calling a model.
+
+    Args:
+        messages (List[Dict[str, str]]): The messages to summarize.
+        max_tokens (int): The approximate maximum length of the summary in tokens.
+
+    Returns:
+        str: One line per message, truncated to about max_tokens.
+    """
+    lines = []
+    for message in messages:
+        content = message["content"].strip()
+        first_line = content.splitlines()[0] if content else ""
+        lines.append(f"{message['role']}: {first_line[:200]}")
+    # Roughly four characters per token
+    return "\n".join(lines)[:max(0, max_tokens) * 4]
+
+
+class ChatBotSummarizer:
+    """
+    Summarizes messages by asking a chat bot, falling back to summarize_heuristically on errors.
+    """
+
+    def __init__(self, chat_bot, max_input_chars: int = 12000):
+        """
+        Initialize the ChatBotSummarizer.
+
+        Args:
+            chat_bot: An OpenAIChatBot or NVIDIAChatBot.
+            max_input_chars (int): The maximum length of the transcript sent to the chat bot.
+        """
+        self.chat_bot = chat_bot
+        self.max_input_chars = max_input_chars
+
+    def __call__(self, messages: List[Dict[str, str]], max_tokens: int) -> str:
+        transcript = "\n\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        request = Message()
+        request.system(f"Summarize the following conversation in at most {max_tokens} tokens. "
+                       "Keep every decision, requirement and file name.")
+        request.user(transcript[-self.max_input_chars:])
+        summary = self.chat_bot.send_messages_and_get_response(request.messages)
+        if not isinstance(summary, str) or summary.startswith("Error:"):
+            return summarize_heuristically(messages, max_tokens)
+        return summary
+
+
+class SummarizingPolicy(ContextPolicy):
+    """
+    Keeps the leading system messages and the latest messages that fit, and replaces the
+    dropped prefix with a summary.
+    """
+
+    def __init__(self, summarizer: Optional[Callable[[List[Dict[str, str]], int], str]] = None,
+                 summary_ratio: float = 0.25):
+        """
+        Initialize the SummarizingPolicy.
+
+        Args:
+            summarizer (Callable, optional): Turns the dropped messages and a token limit into a
+                summary, summarize_heuristically by default. ChatBotSummarizer uses an LLM.
+            summary_ratio (float): The share of the budget reserved for the summary.
+        """
+        self.summarizer = summarizer or summarize_heuristically
+        self.summary_ratio = summary_ratio
+
+    def fit(self, messages, count_tokens, budget):
+        pinned, history = self.split_pinned(messages)
+        summary_budget = int(budget * self.summary_ratio)
+        fitted = self.keep_latest(pinned, history, count_tokens, budget - summary_budget)
+        dropped = history[:len(history) - (len(fitted) - len(pinned))]
+        if not dropped:
+            return fitted
+
+        summary = {"role": "system",
+                   "content": "Summary of the earlier conversation:\n" + self.summarizer(dropped, summary_budget)}
+        with_summary = pinned + [summary] + fitted[len(pinned):]
+        if sum(count_tokens(message) for message in with_summary) > budget:
+            return fitted
+        return with_summary
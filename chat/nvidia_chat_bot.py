@@ -1,8 +1,21 @@
 from langchain_nvidia_ai_endpoints import ChatNVIDIA
-from typing import List, Dict, Union, Optional
+from typing import AsyncIterator, Callable, Iterator, List, Dict, Union, Optional
 import sys
 import os
-import tiktoken  # Import tiktoken for token counting
+from llms.client_registry import ClientRegistry, get_client_registry
+from llms.rate_limiter import Permit, RateLimiter, get_rate_limiter, is_transient_error
+from chat.message import DEFAULT_CONTEXT_HEADROOM, ContextPolicy, Message, PinnedSystemPolicy
+from chat.response_cache import ResponseCache
+from chat.streaming import StopCondition, StreamCollector, describe_stop_condition
+from chat.token_counter import TOKENS_PER_REPLY, count_message_tokens, get_encoding
+from utils.metrics import count_retry, get_current_call, track_call
+
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)  # for exponential backoff
 
 # Get the absolute path to the project's root directory
 root_dir = os.path.dirname(os.path.abspath(__file__))
@@ -14,52 +27,226 @@ class NVIDIAChatBot:
         "mistralai/mixtral-8x22b-instruct-v0.1": 32768,
         "meta/llama3-70b-instruct": 8000,  # Adjust the token limit as per your model
     }
+    # Fields of the chat config the NVIDIA AI Endpoints support, sent with every request
+    SUPPORTED_CHAT_CONFIG_FIELDS = ("temperature", "top_p", "max_tokens", "stop")
 
-    def __init__(self, model: str, api_key: str = None, chat_config: Optional[Dict] = None):
+    def __init__(self, model: str, api_key: str = None, chat_config: Optional[Dict] = None,
+                 cache: Optional[ResponseCache] = None, context_policy: Optional[ContextPolicy] = None,
+                 context_headroom: int = DEFAULT_CONTEXT_HEADROOM,
+                 client_registry: Optional[ClientRegistry] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
         """
         Initialize the NVIDIAChatBot instance.
 
         Args:
             model (str): The name of the Mistral model to use.
             api_key (str, optional): Your NVIDIA API key for authentication.
-            chat_config (Dict, optional): Configuration for the chat bot.
+            chat_config (Dict, optional): Configuration for the chat bot, of which the fields of
+                SUPPORTED_CHAT_CONFIG_FIELDS are sent with every request.
+            cache (ResponseCache, optional): Cache of responses to identical requests.
+            context_policy (ContextPolicy, optional): Shrinks conversations that do not fit the
+                model's context window, PinnedSystemPolicy by default.
+            context_headroom (int): Tokens of the context window reserved for the reply.
+            client_registry (ClientRegistry, optional): Shares the ChatNVIDIA clients, the process-wide
+                registry by default.
+            rate_limiter (RateLimiter, optional): Keeps the requests within the quota of the model,
+                the limiter shared by the process by default.
 
         Attributes:
             model (str): The name of the Mistral model.
             api_key (str): Your NVIDIA API key.
             chat_config (Dict): Configuration for the chat bot.
+            request_kwargs (Dict): The supported fields of the chat config that are set.
+            cache (ResponseCache): Cache of responses to identical requests.
+            context_policy (ContextPolicy): Shrinks conversations that do not fit the context window.
+            context_headroom (int): Tokens of the context window reserved for the reply.
+            client_registry (ClientRegistry): Shares the ChatNVIDIA clients.
+            rate_limiter (RateLimiter): Keeps the requests within the quota of the model.
             token_counter (int): Token counter for tracking token usage.
 
         """
         self.model = model
         self.api_key = api_key
         self.chat_config = chat_config
-        self.llm = ChatNVIDIA(model=self.model, api_key=self.api_key)
+        self.request_kwargs = self._get_request_kwargs(chat_config)
+        self.cache = cache
+        self.context_policy = context_policy if context_policy is not None else PinnedSystemPolicy()
+        self.context_headroom = context_headroom
+        self.client_registry = client_registry or get_client_registry()
+        # One client, and its connection pool, per model and key for the whole process
+        self.client_registry.get_client("nvidia", self.model, self.api_key, self._make_client)
+        self.rate_limiter = rate_limiter or get_rate_limiter("nvidia", model)
+
+    @property
+    def llm(self) -> ChatNVIDIA:
+        """
+        The ChatNVIDIA client shared by the bots of the model, looked up on every request so that the
+        registry does not evict a client in use as idle.
+        """
+        return self.client_registry.get_client("nvidia", self.model, self.api_key, self._make_client)
+
+    def _make_client(self) -> ChatNVIDIA:
+        return ChatNVIDIA(model=self.model, api_key=self.api_key)
+
+    def _get_request_kwargs(self, chat_config) -> Dict:
+        """
+        Gets the fields of the chat config the NVIDIA AI Endpoints support, leaving out the unset ones.
+        The client is shared by every bot of the model, so they are passed with each request.
+        """
+        config = chat_config.to_dict() if hasattr(chat_config, "to_dict") else dict(chat_config or {})
+        request_kwargs = {name: config[name] for name in self.SUPPORTED_CHAT_CONFIG_FIELDS
+                          if config.get(name) is not None}
+        if isinstance(request_kwargs.get("stop"), str):
+            request_kwargs["stop"] = [request_kwargs["stop"]]
+        return request_kwargs
 
-    def send_messages_and_get_response(self, messages: List[Dict[str, str]]) -> Union[str, Dict]:
+    def send_messages_and_get_response(self, messages: List[Dict[str, str]],
+                                       stop_when: Optional[StopCondition] = None) -> Union[str, Dict]:
         """
         Sends a list of messages to the NVIDIA AI Endpoints and returns the response.
 
         Args:
-            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys,
+                or a Message, whose cached token counts avoid re-encoding the history.
+            stop_when (StopCondition, optional): Streams the response and stops reading it as soon
+                as the condition holds, e.g. info_line_terminator.
 
         Returns:
             Union[str, Dict]: The response from the NVIDIA AI Endpoints.
         """
-        try:
-            # # Calculate the token count
-            # num_tokens = self._calculate_token_count(messages)
+        with track_call("nvidia", self.model) as call:
+            try:
+                cache_key = self._get_cache_key(messages, stop_when)
+                cached_response = self._get_cached_response(cache_key)
+                if cached_response is not None:
+                    call.cache_hit = True
+                    return cached_response
 
-            # # Check if the messages fit within the allowed context length
-            # max_tokens = self._get_max_token_length()
-            # if not self._check_message_length(num_tokens, max_tokens):
-            #     raise ValueError(f"Error: Messages exceed the allowed context length for model '{self.model}'. "
-            #                      f"Allowed: {max_tokens} tokens, Present: {num_tokens} tokens.")
+                # Shrink the conversation if it does not leave the headroom for the reply
+                messages = self._fit_context(messages)
+                # Set before the request: streamed responses report no usage, and the permit is reconciled
+                # with the prompt and the reply
+                num_tokens = self._count_prompt_tokens(messages)
+                call.request_tokens = num_tokens
 
-            response = self._get_assistant_response(messages)
-            return response
-        except Exception as e:
-            return f"Error: {str(e)}"
+                if self._use_stream(stop_when):
+                    response = self._get_streamed_response(messages, num_tokens, stop_when)
+                else:
+                    response = self._get_assistant_response(messages, num_tokens)
+                call.error = isinstance(response, str) and response.startswith("Error:")
+                self._cache_response(cache_key, response)
+                return response
+            except Exception as e:
+                call.error = True
+                return f"Error: {str(e)}"
+
+    async def asend_messages_and_get_response(self, messages: List[Dict[str, str]],
+                                              stop_when: Optional[StopCondition] = None) -> Union[str, Dict]:
+        """
+        Asynchronously sends a list of messages to the NVIDIA AI Endpoints and returns the response.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys,
+                or a Message, whose cached token counts avoid re-encoding the history.
+            stop_when (StopCondition, optional): Streams the response and stops reading it as soon
+                as the condition holds, e.g. info_line_terminator.
+
+        Returns:
+            Union[str, Dict]: The response from the NVIDIA AI Endpoints.
+        """
+        with track_call("nvidia", self.model) as call:
+            try:
+                cache_key = self._get_cache_key(messages, stop_when)
+                cached_response = self._get_cached_response(cache_key)
+                if cached_response is not None:
+                    call.cache_hit = True
+                    return cached_response
+
+                # Shrink the conversation if it does not leave the headroom for the reply
+                messages = self._fit_context(messages)
+                # Set before the request: streamed responses report no usage, and the permit is reconciled
+                # with the prompt and the reply
+                num_tokens = self._count_prompt_tokens(messages)
+                call.request_tokens = num_tokens
+
+                if self._use_stream(stop_when):
+                    response = await self._aget_streamed_response(messages, num_tokens, stop_when)
+                else:
+                    response = await self._aget_assistant_response(messages, num_tokens)
+                call.error = isinstance(response, str) and response.startswith("Error:")
+                self._cache_response(cache_key, response)
+                return response
+            except Exception as e:
+                call.error = True
+                return f"Error: {str(e)}"
+
+    def _get_cache_key(self, messages: List[Dict[str, str]],
+                       stop_when: Optional[StopCondition] = None) -> Optional[str]:
+        """
+        Computes the response cache key of a request, or None when caching is disabled.
+
+        The stop condition is part of the key, as it may have cut the cached response short.
+        """
+        if self.cache is None:
+            return None
+        chat_config = self.chat_config.to_dict() if hasattr(self.chat_config, "to_dict") else self.chat_config
+        return self.cache.make_key("nvidia", self.model, messages, chat_config,
+                                   describe_stop_condition(stop_when))
+
+    def _get_cached_response(self, cache_key: Optional[str]) -> Optional[str]:
+        """
+        Looks up a response in the response cache.
+        """
+        if cache_key is None:
+            return None
+        return self.cache.get(cache_key)
+
+    def _cache_response(self, cache_key: Optional[str], response: str) -> None:
+        """
+        Stores a successful response in the response cache, errors are never cached.
+        """
+        if cache_key is not None and isinstance(response, str) and not response.startswith("Error:"):
+            self.cache.set(cache_key, response)
+
+    def _fit_context(self, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Applies the context policy when the messages exceed the maximum token length minus the headroom.
+        Models without a known context length are sent as is.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+
+        Returns:
+            List[Dict[str, str]]: The messages to send.
+        """
+        if self.context_policy is None or self.model not in self.num_max_token_map:
+            return messages
+        budget = self._get_max_token_length() - self.context_headroom
+        if self._calculate_token_count(messages) <= budget:
+            return messages
+        return self.context_policy.fit(messages, self._get_message_token_counter(messages),
+                                       budget - TOKENS_PER_REPLY)
+
+    def _get_message_token_counter(self, messages: List[Dict[str, str]]) -> Callable[[Dict[str, str]], int]:
+        """
+        Returns a per-message token counter that reuses the cached counts of a Message.
+
+        Args:
+            messages (List[Dict[str, str]]): A Message or a list of message dictionaries.
+
+        Returns:
+            Callable[[Dict[str, str]], int]: Counts the tokens of a single message.
+        """
+        if not isinstance(messages, Message):
+            return self._count_message_tokens
+        cached_counts = {id(message): num_tokens
+                         for message, num_tokens in zip(messages, messages.get_token_counts("gpt-4"))}
+
+        def count_tokens(message: Dict[str, str]) -> int:
+            num_tokens = cached_counts.get(id(message))
+            return num_tokens if num_tokens is not None else self._count_message_tokens(message)
+
+        return count_tokens
 
     def _calculate_token_count(self, messages: List[Dict[str, str]]) -> int:
         """
@@ -72,19 +259,13 @@ class NVIDIAChatBot:
             int: The number of tokens used.
         """
         try:
-            # TODO replace with the model name
-            # model_name = self.model
-            model_name = "gpt-4"
+            model_name = self.model
             if model_name in self.num_max_token_map:
-                encoding = tiktoken.encoding_for_model(model_name)
-                num_tokens = 0
-                for message in messages:
-                    num_tokens += 4  # Every message follows <im_start>{role/name}\n{content}<im_end>\n
-                    for key, value in message.items():
-                        num_tokens += len(encoding.encode(value))
-                        if key == "name":
-                            num_tokens += -1  # Role is always required and always 1 token
-                num_tokens += 2  # Every reply is primed with <im_start>assistant
+                if isinstance(messages, Message):
+                    # Only the entries appended since the last request are encoded
+                    return messages.count_tokens("gpt-4") + TOKENS_PER_REPLY
+                num_tokens = sum(self._count_message_tokens(message) for message in messages)
+                num_tokens += TOKENS_PER_REPLY  # Every reply is primed with <im_start>assistant
                 return num_tokens
             else:
                 raise ValueError(f"Model '{model_name}' is not supported.")
@@ -93,6 +274,19 @@ class NVIDIAChatBot:
         except Exception as e:
             raise ValueError(f"Error calculating token count: {str(e)}")
 
+    def _count_message_tokens(self, message: Dict[str, str]) -> int:
+        """
+        Approximates the number of tokens used by a single message with the GPT-4 encoding,
+        as the NVIDIA models' own tokenizers are not available locally.
+
+        Args:
+            message (Dict[str, str]): A message dictionary with 'role' and 'content' keys.
+
+        Returns:
+            int: The number of tokens used.
+        """
+        return count_message_tokens(message, "gpt-4")
+
     def _check_message_length(self, num_tokens: int, max_tokens: int) -> bool:
         """
         Checks if the provided number of tokens fit within the allowed context length for the model.
@@ -124,24 +318,201 @@ class NVIDIAChatBot:
         except Exception as e:
             raise ValueError(f"Error getting maximum token length: {str(e)}")
 
-    def _get_assistant_response(self, messages: List[Dict[str, str]]) -> Union[str, Dict]:
+    @retry(retry=retry_if_exception(is_transient_error), wait=wait_random_exponential(min=1, max=60),
+           stop=stop_after_attempt(6), before_sleep=count_retry, reraise=True)
+    def _get_assistant_response(self, messages: List[Dict[str, str]],
+                                num_tokens: Optional[int] = None) -> Union[str, Dict]:
         """
-        Sends messages to the NVIDIA AI Endpoints and retrieves the response.
+        Sends messages to the NVIDIA AI Endpoints and retrieves the response. Transient errors
+        are retried, the others are raised.
 
         Args:
             messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+            num_tokens (int, optional): The estimated tokens of the prompt, reserved on the rate limiter with the
+                headroom of the reply.
 
         Returns:
             Union[str, Dict]: The response from the NVIDIA AI Endpoints.
         """
-        try:
-            # Combine messages into a single string
-            message_text = " ".join([message['content'] for message in messages])
-
+        # Combine messages into a single string
+        message_text = " ".join([message['content'] for message in messages])
 
+        with self.rate_limiter.limit(self._estimate_request_tokens(num_tokens)) as permit:
             # Invoke the NVIDIA AI Endpoints
-            response = self.llm.invoke(message_text)
+            response = self.llm.invoke(message_text, **self.request_kwargs)
+            self._record_usage(response)
+            self._reconcile_permit(permit)
 
-            return response.content
-        except Exception as e:
-            return f"Error: {str(e)}"
+        return response.content
+
+    @retry(retry=retry_if_exception(is_transient_error), wait=wait_random_exponential(min=1, max=60),
+           stop=stop_after_attempt(6), before_sleep=count_retry, reraise=True)
+    async def _aget_assistant_response(self, messages: List[Dict[str, str]],
+                                       num_tokens: Optional[int] = None) -> Union[str, Dict]:
+        """
+        Asynchronously sends messages to the NVIDIA AI Endpoints and retrieves the response.
+        Transient errors are retried, the others are raised.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+            num_tokens (int, optional): The estimated tokens of the prompt, reserved on the rate limiter with the
+                headroom of the reply.
+
+        Returns:
+            Union[str, Dict]: The response from the NVIDIA AI Endpoints.
+        """
+        # Combine messages into a single string
+        message_text = " ".join([message['content'] for message in messages])
+
+        async with self.rate_limiter.alimit(self._estimate_request_tokens(num_tokens)) as permit:
+            # Invoke the NVIDIA AI Endpoints without blocking the event loop
+            response = await self.llm.ainvoke(message_text, **self.request_kwargs)
+            self._record_usage(response)
+            self._reconcile_permit(permit)
+
+        return response.content
+
+    def stream_response(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """
+        Sends messages to the NVIDIA AI Endpoints with streaming enabled and yields the content as it
+        is generated. Unlike send_messages_and_get_response, the response cache is bypassed and errors
+        are raised.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+
+        Yields:
+            str: The content of each streamed chunk.
+        """
+        # Combine messages into a single string
+        message_text = " ".join([message['content'] for message in messages])
+        for chunk in self.llm.stream(message_text, **self.request_kwargs):
+            if chunk.content:
+                yield chunk.content
+
+    async def astream_response(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """
+        Asynchronously sends messages to the NVIDIA AI Endpoints with streaming enabled and yields the
+        content as it is generated. Errors are raised.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+
+        Yields:
+            str: The content of each streamed chunk.
+        """
+        # Combine messages into a single string
+        message_text = " ".join([message['content'] for message in messages])
+        async for chunk in self.llm.astream(message_text, **self.request_kwargs):
+            if chunk.content:
+                yield chunk.content
+
+    def _use_stream(self, stop_when: Optional[StopCondition]) -> bool:
+        """
+        Decides whether a request is streamed, either to stop early or because the config asks for it.
+        """
+        return stop_when is not None or bool(getattr(self.chat_config, "stream", False))
+
+    @retry(retry=retry_if_exception(is_transient_error), wait=wait_random_exponential(min=1, max=60),
+           stop=stop_after_attempt(6), before_sleep=count_retry, reraise=True)
+    def _get_streamed_response(self, messages: List[Dict[str, str]], num_tokens: Optional[int] = None,
+                               stop_when: Optional[StopCondition] = None) -> str:
+        """
+        Streams the response from the NVIDIA AI Endpoints, closing the stream once stop_when holds.
+        Transient errors are retried, the others are raised.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+            num_tokens (int, optional): The estimated tokens of the prompt, reserved on the rate limiter with the
+                headroom of the reply.
+            stop_when (StopCondition, optional): Ends the stream early when it returns True.
+
+        Returns:
+            str: The response received.
+        """
+        with self.rate_limiter.limit(self._estimate_request_tokens(num_tokens)) as permit:
+            collector = StreamCollector(stop_when)
+            stream = self.stream_response(messages)
+            for token in stream:
+                if collector.feed(token):
+                    stream.close()
+                    break
+            response = self._finish_stream(collector)
+            self._reconcile_permit(permit)
+        return response
+
+    @retry(retry=retry_if_exception(is_transient_error), wait=wait_random_exponential(min=1, max=60),
+           stop=stop_after_attempt(6), before_sleep=count_retry, reraise=True)
+    async def _aget_streamed_response(self, messages: List[Dict[str, str]], num_tokens: Optional[int] = None,
+                                      stop_when: Optional[StopCondition] = None) -> str:
+        """
+        Asynchronously streams the response from the NVIDIA AI Endpoints, closing the stream once
+        stop_when holds. Transient errors are retried, the others are raised.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+            num_tokens (int, optional): The estimated tokens of the prompt, reserved on the rate limiter with the
+                headroom of the reply.
+            stop_when (StopCondition, optional): Ends the stream early when it returns True.
+
+        Returns:
+            str: The response received.
+        """
+        async with self.rate_limiter.alimit(self._estimate_request_tokens(num_tokens)) as permit:
+            collector = StreamCollector(stop_when)
+            stream = self.astream_response(messages)
+            async for token in stream:
+                if collector.feed(token):
+                    await stream.aclose()
+                    break
+            response = self._finish_stream(collector)
+            self._reconcile_permit(permit)
+        return response
+
+    def _count_prompt_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """
+        Approximates the tokens of the prompt with the GPT-4 encoding, see _count_message_tokens.
+        """
+        if isinstance(messages, Message):
+            return messages.count_tokens("gpt-4") + TOKENS_PER_REPLY
+        return sum(self._count_message_tokens(message) for message in messages) + TOKENS_PER_REPLY
+
+    def _estimate_request_tokens(self, num_tokens: Optional[int]) -> int:
+        """
+        Estimates the tokens a request counts against the tokens-per-minute quota: the prompt
+        plus the headroom of the reply. Requests to models without a known context length only
+        count against the requests-per-minute quota.
+        """
+        if num_tokens is None or self.model not in self.num_max_token_map:
+            return 0
+        return num_tokens + self.context_headroom
+
+    def _reconcile_permit(self, permit: Permit) -> None:
+        """
+        Replaces the estimate reserved on the rate limiter with the tokens the request actually used.
+        """
+        call = get_current_call()
+        if call is not None and call.response_tokens is not None:
+            permit.actual_tokens = (call.request_tokens or 0) + call.response_tokens
+
+    def _finish_stream(self, collector: StreamCollector) -> str:
+        """
+        Returns the streamed response, approximating its token count as streamed chunks report no usage.
+        """
+        response = collector.get_text()
+        call = get_current_call()
+        if call is not None:
+            call.response_tokens = len(get_encoding("gpt-4").encode(response))
+        return response
+
+    def _record_usage(self, response) -> None:
+        """
+        Records the token usage reported by the NVIDIA AI Endpoints on the call being measured.
+        """
+        call = get_current_call()
+        metadata = getattr(response, "response_metadata", None) or {}
+        usage = metadata.get("token_usage") or {}
+        if call is not None and usage:
+            # The prompt estimate set before the request stays when no prompt tokens are reported
+            call.request_tokens = usage.get("prompt_tokens", call.request_tokens)
+            call.response_tokens = usage.get("completion_tokens")
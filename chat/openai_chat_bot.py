@@ -1,170 +1,567 @@
-from llms.openai_llm import ChatGPTConfig
-from typing import List, Dict, Union, Optional
-import sys
-import os
-import openai
-import tiktoken  # Import tiktoken for token counting
-
-from tenacity import (
-    retry,
-    stop_after_attempt,
-    wait_random_exponential,
-)  # for exponential backoff
-
-# Get the absolute path to the project's root directory
-root_dir = os.path.dirname(os.path.abspath(__file__))
-sys.path.append(root_dir)
-
-
-
-
-class OpenAIChatBot:
-    # TODO change this to the config and read from there
-    num_max_token_map = {
-        "gpt-3.5-turbo": 4096,
-        "gpt-3.5-turbo-16k": 16384,
-        "gpt-3.5-turbo-0613": 4096,
-        "gpt-3.5-turbo-16k-0613": 16384,
-        "gpt-4": 8192,
-        "gpt-4-0613": 8192,
-        "gpt-4-32k": 32768,
-    }
-
-    def __init__(self, model: str, api_key: str = None, chat_config: Optional[ChatGPTConfig] = None):
-        """
-        Initialize the OpenAIChatBot instance.
-
-        Args:
-            model (str): The name of the GPT-3.5 model to use.
-            api_key (str, optional): Your OpenAI API key for authentication.
-            chat_config (ChatGPTConfig, optional): Configuration for the chat bot.
-
-        Attributes:
-            model (str): The name of the GPT-3.5 model.
-            api_key (str): Your OpenAI API key.
-            chat_config (ChatGPTConfig): Configuration for the chat bot.
-            token_counter (int): Token counter for tracking token usage.
-
-        """
-        self.model = model
-        self.api_key = api_key
-        self.chat_config = chat_config
-
-    def send_messages_and_get_response(self, messages: List[Dict[str, str]]) -> Union[str, Dict]:
-        """
-        Sends a list of messages to the OpenAI API and returns the response.
-
-        Args:
-            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
-
-        Returns:
-            Union[str, Dict]: The response from the OpenAI API.
-        """
-        try:
-            # Calculate the token count
-            num_tokens = self._calculate_token_count(messages)
-
-            # Check if the messages fit within the allowed context length
-            max_tokens = self._get_max_token_length()
-            if not self._check_message_length(num_tokens, max_tokens):
-                raise ValueError(f"Error: Messages exceed the allowed context length for model '{self.model}'. "
-                                 f"Allowed: {max_tokens} tokens, Present: {num_tokens} tokens.")
-
-            response = self._get_assistant_response(messages)
-            return response
-        except Exception as e:
-            return f"Error: {str(e)}"
-
-    def _calculate_token_count(self, messages: List[Dict[str, str]]) -> int:
-        """
-        Calculates the number of tokens used by a list of messages.
-
-        Args:
-            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
-
-        Returns:
-            int: The number of tokens used.
-        """
-        try:
-            model_name = self.model
-            if model_name in self.num_max_token_map:
-                encoding = tiktoken.encoding_for_model(model_name)
-                num_tokens = 0
-                for message in messages:
-                    num_tokens += 4  # Every message follows <im_start>{role/name}\n{content}<im_end>\n
-                    for key, value in message.items():
-                        num_tokens += len(encoding.encode(value))
-                        if key == "name":
-                            num_tokens += -1  # Role is always required and always 1 token
-                num_tokens += 2  # Every reply is primed with <im_start>assistant
-                return num_tokens
-            else:
-                raise ValueError(f"Model '{model_name}' is not supported.")
-        except KeyError:
-            raise ValueError(f"Model '{model_name}' is not supported for token counting.")
-        except Exception as e:
-            raise ValueError(f"Error calculating token count: {str(e)}")
-
-
-    def _check_message_length(self, num_tokens: int, max_tokens: int) -> bool:
-        """
-        Checks if the provided number of tokens fit within the allowed context length for the model.
-
-        Args:
-            num_tokens (int): The number of tokens used by the messages.
-            max_tokens (int): The maximum allowed token length for the model.
-
-        Returns:
-            bool: True if the messages fit within the allowed context length, False otherwise.
-        """
-        return num_tokens <= max_tokens
-
-    def _get_max_token_length(self) -> int:
-        """
-        Gets the maximum allowed token length for the model.
-
-        Returns:
-            int: The maximum allowed token length.
-        """
-        try:
-            model_name = self.model
-            if model_name in self.num_max_token_map:
-                return self.num_max_token_map[model_name]
-            else:
-                raise ValueError(f"Model '{model_name}' is not supported.")
-        except KeyError:
-            raise ValueError(f"Model '{model_name}' is not supported for token counting.")
-        except Exception as e:
-            raise ValueError(f"Error getting maximum token length: {str(e)}")
-
-    @retry(wait=wait_random_exponential(min=1, max=60), stop=stop_after_attempt(6))  # Apply the decorator here
-    def _get_assistant_response(self, messages: List[Dict[str, str]]) -> Union[str, Dict]:
-        """
-        Sends messages to the OpenAI API and retrieves the response.
-
-        Args:
-            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
-
-        Returns:
-            Union[str, Dict]: The response from the OpenAI API.
-        """
-        try:
-            openai.api_key = self.api_key
-            response = openai.ChatCompletion.create(
-                model=self.model,
-                messages=messages,
-                **self.chat_config.to_dict()
-            )
-            finish_reason = response['choices'][0]['finish_reason']
-            if finish_reason == 'stop':
-                return response['choices'][0]['message']['content']
-            elif finish_reason == 'length':
-                return "Error: Incomplete response due to token limit"
-            elif finish_reason == 'function_call':
-                return "Error: Function call detected"
-            elif finish_reason == 'content_filter':
-                return "Error: Content filtered"
-            else:
-                return "Error: Unknown response finish reason"
-        except Exception as e:
-            return f"Error: {str(e)}"
\ No newline at end of file
+from llms.openai_llm import ChatGPTConfig
+from llms.client_registry import ClientRegistry, get_client_registry
+from llms.rate_limiter import Permit, RateLimiter, get_rate_limiter, is_transient_error
+from chat.message import DEFAULT_CONTEXT_HEADROOM, ContextPolicy, Message, PinnedSystemPolicy
+from chat.response_cache import ResponseCache
+from chat.streaming import StopCondition, StreamCollector, describe_stop_condition
+from chat.token_counter import TOKENS_PER_REPLY, count_message_tokens, get_encoding
+from utils.metrics import count_retry, get_current_call, track_call
+from contextlib import contextmanager
+from typing import AsyncIterator, Callable, Iterator, List, Dict, Union, Optional, Tuple
+import sys
+import os
+import openai
+
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)  # for exponential backoff
+
+# Get the absolute path to the project's root directory
+root_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(root_dir)
+
+
+
+
+class OpenAIChatBot:
+    # TODO change this to the config and read from there
+    num_max_token_map = {
+        "gpt-3.5-turbo": 4096,
+        "gpt-3.5-turbo-16k": 16384,
+        "gpt-3.5-turbo-0613": 4096,
+        "gpt-3.5-turbo-16k-0613": 16384,
+        "gpt-4": 8192,
+        "gpt-4-0613": 8192,
+        "gpt-4-32k": 32768,
+    }
+
+    def __init__(self, model: str, api_key: str = None, chat_config: Optional[ChatGPTConfig] = None,
+                 cache: Optional[ResponseCache] = None, context_policy: Optional[ContextPolicy] = None,
+                 context_headroom: int = DEFAULT_CONTEXT_HEADROOM,
+                 client_registry: Optional[ClientRegistry] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
+        """
+        Initialize the OpenAIChatBot instance.
+
+        Args:
+            model (str): The name of the GPT-3.5 model to use.
+            api_key (str, optional): Your OpenAI API key for authentication.
+            chat_config (ChatGPTConfig, optional): Configuration for the chat bot.
+            cache (ResponseCache, optional): Cache of responses to identical requests.
+            context_policy (ContextPolicy, optional): Shrinks conversations that do not fit the
+                model's context window, PinnedSystemPolicy by default.
+            context_headroom (int): Tokens of the context window reserved for the reply.
+            client_registry (ClientRegistry, optional): Pools the HTTP connections, the process-wide
+                registry by default.
+            rate_limiter (RateLimiter, optional): Keeps the requests within the quota of the model,
+                the limiter shared by the process by default.
+
+        Attributes:
+            model (str): The name of the GPT-3.5 model.
+            api_key (str): Your OpenAI API key, OPENAI_API_KEY by default.
+            chat_config (ChatGPTConfig): Configuration for the chat bot.
+            cache (ResponseCache): Cache of responses to identical requests.
+            context_policy (ContextPolicy): Shrinks conversations that do not fit the context window.
+            context_headroom (int): Tokens of the context window reserved for the reply.
+            client_registry (ClientRegistry): Pools the HTTP connections.
+            rate_limiter (RateLimiter): Keeps the requests within the quota of the model.
+            token_counter (int): Token counter for tracking token usage.
+
+        """
+        self.model = model
+        # Sent with every request instead of setting the module-wide openai.api_key
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        self.chat_config = chat_config
+        self.cache = cache
+        self.context_policy = context_policy if context_policy is not None else PinnedSystemPolicy()
+        self.context_headroom = context_headroom
+        self.client_registry = client_registry or get_client_registry()
+        self.client_registry.configure_openai()
+        self.rate_limiter = rate_limiter or get_rate_limiter("openai", model)
+
+    def send_messages_and_get_response(self, messages: List[Dict[str, str]],
+                                       stop_when: Optional[StopCondition] = None) -> Union[str, Dict]:
+        """
+        Sends a list of messages to the OpenAI API and returns the response.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys,
+                or a Message, whose cached token counts avoid re-encoding the history.
+            stop_when (StopCondition, optional): Streams the response and stops reading it as soon
+                as the condition holds, e.g. info_line_terminator.
+
+        Returns:
+            Union[str, Dict]: The response from the OpenAI API.
+        """
+        with track_call("openai", self.model) as call:
+            try:
+                cache_key = self._get_cache_key(messages, stop_when)
+                cached_response = self._get_cached_response(cache_key)
+                if cached_response is not None:
+                    call.cache_hit = True
+                    return cached_response
+
+                # Calculate the token count
+                num_tokens = self._calculate_token_count(messages)
+
+                # Shrink the conversation if it does not leave the headroom for the reply
+                max_tokens = self._get_max_token_length()
+                messages, num_tokens = self._fit_context(messages, num_tokens, max_tokens)
+                call.request_tokens = num_tokens
+
+                # Check if the messages fit within the allowed context length
+                if not self._check_message_length(num_tokens, max_tokens):
+                    raise ValueError(f"Error: Messages exceed the allowed context length for model '{self.model}'. "
+                                     f"Allowed: {max_tokens} tokens, Present: {num_tokens} tokens.")
+
+                if self._use_stream(stop_when):
+                    response = self._get_streamed_response(messages, num_tokens, stop_when)
+                else:
+                    response = self._get_assistant_response(messages, num_tokens)
+                call.error = isinstance(response, str) and response.startswith("Error:")
+                self._cache_response(cache_key, response)
+                return response
+            except Exception as e:
+                call.error = True
+                return f"Error: {str(e)}"
+
+    async def asend_messages_and_get_response(self, messages: List[Dict[str, str]],
+                                              stop_when: Optional[StopCondition] = None) -> Union[str, Dict]:
+        """
+        Asynchronously sends a list of messages to the OpenAI API and returns the response.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys,
+                or a Message, whose cached token counts avoid re-encoding the history.
+            stop_when (StopCondition, optional): Streams the response and stops reading it as soon
+                as the condition holds, e.g. info_line_terminator.
+
+        Returns:
+            Union[str, Dict]: The response from the OpenAI API.
+        """
+        with track_call("openai", self.model) as call:
+            try:
+                cache_key = self._get_cache_key(messages, stop_when)
+                cached_response = self._get_cached_response(cache_key)
+                if cached_response is not None:
+                    call.cache_hit = True
+                    return cached_response
+
+                # Calculate the token count
+                num_tokens = self._calculate_token_count(messages)
+
+                # Shrink the conversation if it does not leave the headroom for the reply
+                max_tokens = self._get_max_token_length()
+                messages, num_tokens = self._fit_context(messages, num_tokens, max_tokens)
+                call.request_tokens = num_tokens
+
+                # Check if the messages fit within the allowed context length
+                if not self._check_message_length(num_tokens, max_tokens):
+                    raise ValueError(f"Error: Messages exceed the allowed context length for model '{self.model}'. "
+                                     f"Allowed: {max_tokens} tokens, Present: {num_tokens} tokens.")
+
+                if self._use_stream(stop_when):
+                    response = await self._aget_streamed_response(messages, num_tokens, stop_when)
+                else:
+                    response = await self._aget_assistant_response(messages, num_tokens)
+                call.error = isinstance(response, str) and response.startswith("Error:")
+                self._cache_response(cache_key, response)
+                return response
+            except Exception as e:
+                call.error = True
+                return f"Error: {str(e)}"
+
+    def _get_cache_key(self, messages: List[Dict[str, str]],
+                       stop_when: Optional[StopCondition] = None) -> Optional[str]:
+        """
+        Computes the response cache key of a request, or None when caching is disabled.
+
+        The stop condition is part of the key, as it may have cut the cached response short.
+        """
+        if self.cache is None:
+            return None
+        chat_config = self.chat_config.to_dict() if self.chat_config else None
+        return self.cache.make_key("openai", self.model, messages, chat_config,
+                                   describe_stop_condition(stop_when))
+
+    def _get_cached_response(self, cache_key: Optional[str]) -> Optional[str]:
+        """
+        Looks up a response in the response cache.
+        """
+        if cache_key is None:
+            return None
+        return self.cache.get(cache_key)
+
+    def _cache_response(self, cache_key: Optional[str], response: str) -> None:
+        """
+        Stores a successful response in the response cache, errors are never cached.
+        """
+        if cache_key is not None and isinstance(response, str) and not response.startswith("Error:"):
+            self.cache.set(cache_key, response)
+
+    def _fit_context(self, messages: List[Dict[str, str]], num_tokens: int,
+                     max_tokens: int) -> Tuple[List[Dict[str, str]], int]:
+        """
+        Applies the context policy when the messages exceed the maximum token length minus the headroom.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+            num_tokens (int): The number of tokens used by the messages.
+            max_tokens (int): The maximum allowed token length for the model.
+
+        Returns:
+            Tuple[List[Dict[str, str]], int]: The messages to send and their number of tokens.
+        """
+        budget = max_tokens - self.context_headroom
+        if num_tokens <= budget or self.context_policy is None:
+            return messages, num_tokens
+        count_tokens = self._get_message_token_counter(messages)
+        fitted = self.context_policy.fit(messages, count_tokens, budget - TOKENS_PER_REPLY)
+        return fitted, sum(count_tokens(message) for message in fitted) + TOKENS_PER_REPLY
+
+    def _get_message_token_counter(self, messages: List[Dict[str, str]]) -> Callable[[Dict[str, str]], int]:
+        """
+        Returns a per-message token counter that reuses the cached counts of a Message.
+
+        Args:
+            messages (List[Dict[str, str]]): A Message or a list of message dictionaries.
+
+        Returns:
+            Callable[[Dict[str, str]], int]: Counts the tokens of a single message.
+        """
+        if not isinstance(messages, Message):
+            return self._count_message_tokens
+        cached_counts = {id(message): num_tokens
+                         for message, num_tokens in zip(messages, messages.get_token_counts(self.model))}
+
+        def count_tokens(message: Dict[str, str]) -> int:
+            num_tokens = cached_counts.get(id(message))
+            return num_tokens if num_tokens is not None else self._count_message_tokens(message)
+
+        return count_tokens
+
+    def _calculate_token_count(self, messages: List[Dict[str, str]]) -> int:
+        """
+        Calculates the number of tokens used by a list of messages.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+
+        Returns:
+            int: The number of tokens used.
+        """
+        try:
+            model_name = self.model
+            if model_name in self.num_max_token_map:
+                if isinstance(messages, Message):
+                    # Only the entries appended since the last request are encoded
+                    return messages.count_tokens(self.model) + TOKENS_PER_REPLY
+                num_tokens = sum(self._count_message_tokens(message) for message in messages)
+                num_tokens += TOKENS_PER_REPLY  # Every reply is primed with <im_start>assistant
+                return num_tokens
+            else:
+                raise ValueError(f"Model '{model_name}' is not supported.")
+        except KeyError:
+            raise ValueError(f"Model '{model_name}' is not supported for token counting.")
+        except Exception as e:
+            raise ValueError(f"Error calculating token count: {str(e)}")
+
+
+    def _count_message_tokens(self, message: Dict[str, str]) -> int:
+        """
+        Calculates the number of tokens used by a single message.
+
+        Args:
+            message (Dict[str, str]): A message dictionary with 'role' and 'content' keys.
+
+        Returns:
+            int: The number of tokens used.
+        """
+        return count_message_tokens(message, self.model)
+
+    def _check_message_length(self, num_tokens: int, max_tokens: int) -> bool:
+        """
+        Checks if the provided number of tokens fit within the allowed context length for the model.
+
+        Args:
+            num_tokens (int): The number of tokens used by the messages.
+            max_tokens (int): The maximum allowed token length for the model.
+
+        Returns:
+            bool: True if the messages fit within the allowed context length, False otherwise.
+        """
+        return num_tokens <= max_tokens
+
+    def _get_max_token_length(self) -> int:
+        """
+        Gets the maximum allowed token length for the model.
+
+        Returns:
+            int: The maximum allowed token length.
+        """
+        try:
+            model_name = self.model
+            if model_name in self.num_max_token_map:
+                return self.num_max_token_map[model_name]
+            else:
+                raise ValueError(f"Model '{model_name}' is not supported.")
+        except KeyError:
+            raise ValueError(f"Model '{model_name}' is not supported for token counting.")
+        except Exception as e:
+            raise ValueError(f"Error getting maximum token length: {str(e)}")
+
+    @retry(retry=retry_if_exception(is_transient_error), wait=wait_random_exponential(min=1, max=60),
+           stop=stop_after_attempt(6), before_sleep=count_retry, reraise=True)
+    def _get_assistant_response(self, messages: List[Dict[str, str]], num_tokens: int = 0) -> Union[str, Dict]:
+        """
+        Sends messages to the OpenAI API and retrieves the response. Transient errors are
+        retried, the others are raised.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+            num_tokens (int): The number of tokens used by the messages, reserved on the rate limiter.
+
+        Returns:
+            Union[str, Dict]: The response from the OpenAI API.
+        """
+        with self.rate_limiter.limit(self._estimate_request_tokens(num_tokens)) as permit:
+            response = openai.ChatCompletion.create(
+                model=self.model,
+                messages=list(messages),
+                api_key=self.api_key,
+                **self.chat_config.to_dict()
+            )
+            response = self._parse_completion(response)
+            self._reconcile_permit(permit)
+        return response
+
+    @retry(retry=retry_if_exception(is_transient_error), wait=wait_random_exponential(min=1, max=60),
+           stop=stop_after_attempt(6), before_sleep=count_retry, reraise=True)
+    async def _aget_assistant_response(self, messages: List[Dict[str, str]],
+                                       num_tokens: int = 0) -> Union[str, Dict]:
+        """
+        Asynchronously sends messages to the OpenAI API and retrieves the response. Transient
+        errors are retried, the others are raised.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+            num_tokens (int): The number of tokens used by the messages, reserved on the rate limiter.
+
+        Returns:
+            Union[str, Dict]: The response from the OpenAI API.
+        """
+        async with self.rate_limiter.alimit(self._estimate_request_tokens(num_tokens)) as permit:
+            with self._use_async_session():
+                response = await openai.ChatCompletion.acreate(
+                    model=self.model,
+                    messages=list(messages),
+                    api_key=self.api_key,
+                    **self.chat_config.to_dict()
+                )
+            response = self._parse_completion(response)
+            self._reconcile_permit(permit)
+        return response
+
+    def stream_response(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """
+        Sends messages to the OpenAI API with streaming enabled and yields the content as it is generated.
+        Unlike send_messages_and_get_response, the response cache and the context length check are
+        bypassed and errors are raised.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+
+        Yields:
+            str: The content of each streamed chunk.
+        """
+        chunks = openai.ChatCompletion.create(
+            model=self.model,
+            messages=list(messages),
+            api_key=self.api_key,
+            **self._get_stream_config()
+        )
+        for chunk in chunks:
+            content = self._parse_chunk(chunk)
+            if content:
+                yield content
+
+    async def astream_response(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """
+        Asynchronously sends messages to the OpenAI API with streaming enabled and yields the content
+        as it is generated. Errors are raised.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+
+        Yields:
+            str: The content of each streamed chunk.
+        """
+        with self._use_async_session():
+            chunks = await openai.ChatCompletion.acreate(
+                model=self.model,
+                messages=list(messages),
+                api_key=self.api_key,
+                **self._get_stream_config()
+            )
+            async for chunk in chunks:
+                content = self._parse_chunk(chunk)
+                if content:
+                    yield content
+
+    @contextmanager
+    def _use_async_session(self):
+        """
+        Sends the async requests of the block through the pooled aiohttp session of the running loop,
+        instead of a new session per request.
+        """
+        token = openai.aiosession.set(self.client_registry.get_aiohttp_session())
+        try:
+            yield
+        finally:
+            openai.aiosession.reset(token)
+
+    def _use_stream(self, stop_when: Optional[StopCondition]) -> bool:
+        """
+        Decides whether a request is streamed, either to stop early or because the config asks for it.
+        """
+        return stop_when is not None or bool(self.chat_config and self.chat_config.stream)
+
+    def _get_stream_config(self) -> Dict:
+        """
+        Returns the chat config of a streamed request.
+        """
+        config = self.chat_config.to_dict() if self.chat_config else {}
+        config["stream"] = True
+        return config
+
+    def _parse_chunk(self, chunk) -> str:
+        """
+        Extracts the content of a streamed chunk, raising on a finish reason other than 'stop'.
+        """
+        choice = chunk['choices'][0]
+        finish_reason = choice.get('finish_reason')
+        if finish_reason not in (None, 'stop'):
+            raise ValueError(self._describe_finish_reason(finish_reason))
+        return choice.get('delta', {}).get('content') or ""
+
+    @retry(retry=retry_if_exception(is_transient_error), wait=wait_random_exponential(min=1, max=60),
+           stop=stop_after_attempt(6), before_sleep=count_retry, reraise=True)
+    def _get_streamed_response(self, messages: List[Dict[str, str]], num_tokens: int = 0,
+                               stop_when: Optional[StopCondition] = None) -> str:
+        """
+        Streams the response from the OpenAI API, closing the stream once stop_when holds.
+        Transient errors are retried, the others are raised.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+            num_tokens (int): The number of tokens used by the messages, reserved on the rate limiter.
+            stop_when (StopCondition, optional): Ends the stream early when it returns True.
+
+        Returns:
+            str: The response received.
+        """
+        with self.rate_limiter.limit(self._estimate_request_tokens(num_tokens)) as permit:
+            collector = StreamCollector(stop_when)
+            stream = self.stream_response(messages)
+            for token in stream:
+                if collector.feed(token):
+                    stream.close()
+                    break
+            response = self._finish_stream(collector)
+            self._reconcile_permit(permit)
+        return response
+
+    @retry(retry=retry_if_exception(is_transient_error), wait=wait_random_exponential(min=1, max=60),
+           stop=stop_after_attempt(6), before_sleep=count_retry, reraise=True)
+    async def _aget_streamed_response(self, messages: List[Dict[str, str]], num_tokens: int = 0,
+                                      stop_when: Optional[StopCondition] = None) -> str:
+        """
+        Asynchronously streams the response from the OpenAI API, closing the stream once stop_when holds.
+        Transient errors are retried, the others are raised.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+            num_tokens (int): The number of tokens used by the messages, reserved on the rate limiter.
+            stop_when (StopCondition, optional): Ends the stream early when it returns True.
+
+        Returns:
+            str: The response received.
+        """
+        async with self.rate_limiter.alimit(self._estimate_request_tokens(num_tokens)) as permit:
+            collector = StreamCollector(stop_when)
+            stream = self.astream_response(messages)
+            async for token in stream:
+                if collector.feed(token):
+                    await stream.aclose()
+                    break
+            response = self._finish_stream(collector)
+            self._reconcile_permit(permit)
+        return response
+
+    def _estimate_request_tokens(self, num_tokens: int) -> int:
+        """
+        Estimates the tokens a request counts against the tokens-per-minute quota: the prompt
+        plus the longest reply it may get.
+        """
+        max_reply_tokens = self.chat_config.max_tokens if self.chat_config else None
+        return num_tokens + (max_reply_tokens or self.context_headroom)
+
+    def _reconcile_permit(self, permit: Permit) -> None:
+        """
+        Replaces the estimate reserved on the rate limiter with the tokens the request actually used.
+        """
+        call = get_current_call()
+        if call is not None and call.response_tokens is not None:
+            permit.actual_tokens = (call.request_tokens or 0) + call.response_tokens
+
+    def _finish_stream(self, collector: StreamCollector) -> str:
+        """
+        Returns the streamed response, recording its token count as streamed chunks report no usage.
+        """
+        response = collector.get_text()
+        call = get_current_call()
+        if call is not None:
+            call.response_tokens = len(get_encoding(self.model).encode(response))
+        return response
+
+    def _parse_completion(self, response) -> str:
+        """
+        Extracts the assistant message from a chat completion based on its finish reason.
+
+        Args:
+            response: The chat completion returned by the OpenAI API.
+
+        Returns:
+            str: The content of the assistant message or an error string.
+        """
+        self._record_usage(response)
+        finish_reason = response['choices'][0]['finish_reason']
+        if finish_reason == 'stop':
+            return response['choices'][0]['message']['content']
+        return f"Error: {self._describe_finish_reason(finish_reason)}"
+
+    def _describe_finish_reason(self, finish_reason: str) -> str:
+        """
+        Describes why a completion stopped before its natural end.
+        """
+        if finish_reason == 'length':
+            return "Incomplete response due to token limit"
+        elif finish_reason == 'function_call':
+            return "Function call detected"
+        elif finish_reason == 'content_filter':
+            return "Content filtered"
+        else:
+            return "Unknown response finish reason"
+
+    def _record_usage(self, response) -> None:
+        """
+        Records the token usage reported by the OpenAI API on the call being measured.
+        """
+        call = get_current_call()
+        usage = response.get('usage') if hasattr(response, 'get') else None
+        if call is not None and usage:
+            call.request_tokens = usage.get('prompt_tokens', call.request_tokens)
+            call.response_tokens = usage.get('completion_tokens')
@@ -0,0 +1,166 @@
+import json
+import threading
+from collections import defaultdict, deque
+from typing import Dict, List, Optional
+
+from chat.response_cache import ResponseCache
+from chat.streaming import StopCondition
+from utils.metrics import track_call
+
+
+def get_messages_key(messages: List[Dict[str, str]]) -> str:
+    """
+    Compute the key used to match a replayed request, independent of provider, model and config.
+
+    Args:
+        messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+
+    Returns:
+        str: The SHA-256 hex digest of the normalized messages.
+    """
+    return ResponseCache.make_key("", "", messages, None)
+
+
+class TranscriptRecorder:
+    """
+    Appends every request/response pair of a run to a JSONL transcript file.
+
+    Attributes:
+        path (str): The path to the transcript file.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the TranscriptRecorder.
+
+        Args:
+            path (str): The path to the transcript file, appended to if it exists.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, provider: str, model: str, messages: List[Dict[str, str]], response: str) -> None:
+        """
+        Append a request/response pair to the transcript.
+
+        Args:
+            provider (str): The provider name, e.g. "openai".
+            model (str): The model name.
+            messages (List[Dict[str, str]]): The messages sent.
+            response (str): The response received.
+        """
+        entry = {
+            "key": get_messages_key(messages),
+            "provider": provider,
+            "model": model,
+            "messages": messages,
+            "response": response,
+        }
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        """
+        Close the transcript file.
+        """
+        with self._lock:
+            self._file.close()
+
+
+class RecordingChatBot:
+    """
+    Wraps a chat bot and records every request/response pair it serves.
+    """
+
+    def __init__(self, chat_bot, recorder: TranscriptRecorder, provider: str):
+        """
+        Initialize the RecordingChatBot.
+
+        Args:
+            chat_bot: The OpenAIChatBot or NVIDIAChatBot to wrap.
+            recorder (TranscriptRecorder): The recorder receiving the pairs.
+            provider (str): The provider name of the wrapped bot.
+        """
+        self.chat_bot = chat_bot
+        self.recorder = recorder
+        self.provider = provider
+        self.model = chat_bot.model
+
+    def send_messages_and_get_response(self, messages: List[Dict[str, str]],
+                                       stop_when: Optional[StopCondition] = None) -> str:
+        response = self.chat_bot.send_messages_and_get_response(messages, stop_when=stop_when)
+        self.recorder.record(self.provider, self.model, list(messages), response)
+        return response
+
+    async def asend_messages_and_get_response(self, messages: List[Dict[str, str]],
+                                              stop_when: Optional[StopCondition] = None) -> str:
+        response = await self.chat_bot.asend_messages_and_get_response(messages, stop_when=stop_when)
+        self.recorder.record(self.provider, self.model, list(messages), response)
+        return response
+
+
+class ReplayChatBot:
+    """
+    Serves the responses of a recorded transcript through the chat bot interface.
+
+    Requests are matched by their messages. When the same messages were sent several
+    times the responses are served in recorded order. Requests that were never recorded
+    fall back to the next unserved response of the transcript unless strict is set.
+    """
+
+    def __init__(self, path: str, strict: bool = False):
+        """
+        Initialize the ReplayChatBot.
+
+        Args:
+            path (str): The path to a transcript written by TranscriptRecorder.
+            strict (bool): Answer unrecorded requests with an error instead of falling back.
+        """
+        self.path = path
+        self.strict = strict
+        self.model = None
+        self._lock = threading.Lock()
+        self._responses = []
+        self._responses_by_key = defaultdict(deque)
+        self._served = set()
+
+        with open(path, "r", encoding="utf-8") as transcript_file:
+            for line in transcript_file:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self.model = self.model or entry.get("model")
+                self._responses_by_key[entry["key"]].append(len(self._responses))
+                self._responses.append(entry["response"])
+        self._pending = deque(range(len(self._responses)))
+
+    def _take(self, indices: deque) -> Optional[str]:
+        while indices:
+            index = indices.popleft()
+            if index not in self._served:
+                self._served.add(index)
+                return self._responses[index]
+        return None
+
+    def _next_response(self, messages: List[Dict[str, str]]) -> Optional[str]:
+        with self._lock:
+            response = self._take(self._responses_by_key.get(get_messages_key(messages), deque()))
+            if response is None and not self.strict:
+                response = self._take(self._pending)
+            return response
+
+    def send_messages_and_get_response(self, messages: List[Dict[str, str]],
+                                       stop_when: Optional[StopCondition] = None) -> str:
+        # Recorded responses were already cut by the stop condition of the recorded run
+        with track_call("replay", self.model) as call:
+            response = self._next_response(messages)
+            if response is None:
+                call.error = True
+                return "Error: No recorded response for this request"
+            return response
+
+    async def asend_messages_and_get_response(self, messages: List[Dict[str, str]],
+                                              stop_when: Optional[StopCondition] = None) -> str:
+        return self.send_messages_and_get_response(messages, stop_when=stop_when)
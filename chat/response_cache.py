@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class ResponseCache:
+    """
+    A persistent, content-addressed cache of LLM responses backed by SQLite.
+
+    Responses are keyed by a hash of the provider, the model, the normalized messages,
+    the generation config and the condition that ended a streamed response early. The cache
+    is bounded in bytes and evicts the least recently used responses first; the total size is
+    kept in a single-row table updated in the transaction of every insert and eviction.
+    SQLite's WAL mode makes the cache safe to share between threads and between the worker
+    processes of a batch.
+
+    Attributes:
+        path (str): The path to the SQLite database.
+        max_bytes (int): The maximum total size of the cached responses.
+        hits (int): Number of lookups served from the cache by this instance.
+        misses (int): Number of lookups not found in the cache by this instance.
+    """
+
+    DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initialize the ResponseCache, creating the database if needed.
+
+        Args:
+            path (str): The path to the SQLite database.
+            max_bytes (int): The maximum total size of the cached responses.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)"
+        )
+        # Databases created before the running total was kept are summed up once
+        self._connection.execute(
+            "INSERT OR IGNORE INTO cache_size (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM responses"
+        )
+
+    @staticmethod
+    def make_key(provider: str, model: str, messages: List[Dict[str, str]], chat_config: Optional[Dict],
+                 stop_condition: Optional[str] = None) -> str:
+        """
+        Compute the content address of a request.
+
+        Args:
+            provider (str): The provider name, e.g. "openai".
+            model (str): The model name.
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+            chat_config (Dict, optional): The generation config, e.g. ChatGPTConfig.to_dict().
+            stop_condition (str, optional): The description of the condition that may end the
+                response early, see describe_stop_condition, so that a truncated response is never
+                served to a request that needs the full one.
+
+        Returns:
+            str: The SHA-256 hex digest of the canonical request.
+        """
+        normalized_messages = [
+            {key: str(value) for key, value in message.items() if key in ("role", "name", "content")}
+            for message in messages
+        ]
+        request = {
+            "provider": provider,
+            "model": model,
+            "messages": normalized_messages,
+            "config": chat_config or {},
+        }
+        if stop_condition is not None:
+            request["stop_condition"] = stop_condition
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a response, marking it as recently used.
+
+        Args:
+            key (str): The key returned by make_key.
+
+        Returns:
+            Optional[str]: The cached response, or None on a miss.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def set(self, key: str, response: str) -> None:
+        """
+        Store a response, evicting the least recently used responses if the cache is full.
+
+        Args:
+            key (str): The key returned by make_key.
+            response (str): The response to store.
+        """
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            # The write lock is taken up front, so the size read below is still current at the commit
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                replaced = row[0] if row is not None else 0
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, response, size, time.time()),
+                )
+                self._connection.execute("UPDATE cache_size SET bytes = bytes + ? WHERE id = 0", (size - replaced,))
+                total = self._connection.execute("SELECT bytes FROM cache_size WHERE id = 0").fetchone()[0]
+                self._evict(total)
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def _evict(self, total: int) -> None:
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% of the budget so that the next few inserts do not evict again
+        target = total - int(self.max_bytes * 0.9)
+        evicted_keys = []
+        evicted_bytes = 0
+        for key, size in self._connection.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+            if evicted_bytes >= target:
+                break
+            evicted_keys.append((key,))
+            evicted_bytes += size
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", evicted_keys)
+        self._connection.execute("UPDATE cache_size SET bytes = bytes - ? WHERE id = 0", (evicted_bytes,))
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the hit/miss counters of this instance and the size of the cache.
+
+        Returns:
+            Dict[str, int]: The hits, misses, number of entries and total bytes.
+        """
+        with self._lock:
+            entries, total = self._connection.execute(
+                "SELECT (SELECT COUNT(*) FROM responses), bytes FROM cache_size WHERE id = 0"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": total}
+
+    def close(self) -> None:
+        """
+        Close the database connection.
+        """
+        with self._lock:
+            self._connection.close()
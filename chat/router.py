@@ -0,0 +1,364 @@
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+from chat.streaming import StopCondition
+from llms.openai_llm import CONFIGS_DIR
+from utils.metrics import get_metrics_labels
+
+ROUTER_CONFIG_FILE = "RouterConfig.json"
+
+
+@dataclass(frozen=True)
+class RouterConfig:
+    """
+    Defines when RoutingChatBot hedges a request and when it fails over to another backend.
+
+    Attributes:
+        hedge (bool): Send a duplicate request when the first one is slower than usual.
+        hedge_percentile (float): Latency percentile of the backend, in the phase of the request,
+            after which the duplicate is sent.
+        hedge_min_delay_s (float): Lower bound of the hedge delay, so fast backends are not doubled.
+        min_samples (int): Requests observed on a backend, or on a backend in a phase, before its
+            latency and error rate are trusted.
+        window (int): Number of recent requests of a backend, and of a backend in a phase, kept
+            for its statistics.
+        max_error_rate (float): Rolling error rate above which a backend is taken out of rotation.
+        max_latency_s (float, optional): Rolling p95 latency above which a backend is taken out of rotation.
+        cooldown_s (float): Seconds a backend stays out of rotation before it is tried again.
+    """
+
+    hedge: bool = False
+    hedge_percentile: float = 0.95
+    hedge_min_delay_s: float = 1.0
+    min_samples: int = 10
+    window: int = 50
+    max_error_rate: float = 0.5
+    max_latency_s: Optional[float] = None
+    cooldown_s: float = 60.0
+
+    def to_dict(self):
+        """
+        Convert the configuration to a dictionary.
+        """
+        return asdict(self)
+
+    @classmethod
+    def load_from_file(cls, filename):
+        """
+        Load the configuration from a JSON file in the 'configs' directory.
+        """
+        config_path = os.path.join(CONFIGS_DIR, filename)
+        with open(config_path, "r") as config_file:
+            config_dict = json.load(config_file)
+        return cls(**config_dict)
+
+
+def is_error_response(response) -> bool:
+    """
+    Whether a chat bot response is the error string the bots return instead of raising.
+    """
+    return isinstance(response, str) and response.startswith("Error:")
+
+
+class BackendHealth:
+    """
+    Rolling latency and error statistics of a backend, and whether it is in rotation.
+
+    The latencies are also kept per phase, as the phases ask for replies of very different
+    lengths: a Coding reply takes several times as long as a LanguageChoose one.
+    """
+
+    def __init__(self, config: RouterConfig):
+        """
+        Initialize the BackendHealth.
+
+        Args:
+            config (RouterConfig): The window, thresholds and cooldown.
+        """
+        self.config = config
+        self.unhealthy_until = 0.0
+        self._samples = deque(maxlen=config.window)
+        self._phase_latencies: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, latency_s: float, error: bool, phase: Optional[str] = None) -> bool:
+        """
+        Record the outcome of a request, taking the backend out of rotation when it crosses a threshold.
+
+        Args:
+            latency_s (float): The latency of the request.
+            error (bool): Whether the request failed.
+            phase (str, optional): The phase of the request.
+
+        Returns:
+            bool: True if the backend was just taken out of rotation.
+        """
+        with self._lock:
+            self._samples.append((latency_s, error))
+            if phase is not None and not error:
+                self._phase_latencies.setdefault(phase, deque(maxlen=self.config.window)).append(latency_s)
+            if len(self._samples) < self.config.min_samples:
+                return False
+            error_rate = sum(error for _, error in self._samples) / len(self._samples)
+            p95 = self._latency_percentile(0.95)
+            if error_rate > self.config.max_error_rate or (
+                    self.config.max_latency_s is not None and p95 > self.config.max_latency_s):
+                self.unhealthy_until = time.monotonic() + self.config.cooldown_s
+                # Judge the backend afresh once the cooldown is over
+                self._samples.clear()
+                self._phase_latencies.clear()
+                return True
+            return False
+
+    def is_healthy(self) -> bool:
+        """
+        Whether the backend is in rotation.
+        """
+        return time.monotonic() >= self.unhealthy_until
+
+    def latency_percentile(self, percentile: float, phase: Optional[str] = None) -> Optional[float]:
+        """
+        Get a percentile of the latency of the successful recent requests.
+
+        Args:
+            percentile (float): The percentile, between 0 and 1.
+            phase (str, optional): Only consider the requests of this phase, all requests by default.
+
+        Returns:
+            float: The latency, None until min_samples requests succeeded.
+        """
+        with self._lock:
+            return self._latency_percentile(percentile, phase)
+
+    def _latency_percentile(self, percentile: float, phase: Optional[str] = None) -> Optional[float]:
+        if phase is None:
+            latencies = sorted(latency for latency, error in self._samples if not error)
+        else:
+            latencies = sorted(self._phase_latencies.get(phase, ()))
+        if not latencies or len(latencies) < self.config.min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(percentile * len(latencies)))]
+
+
+class RoutingChatBot:
+    """
+    Routes requests over several chat bots, e.g. an OpenAIChatBot and an NVIDIAChatBot.
+
+    Requests go to the first backend in rotation. With hedging enabled, a duplicate request
+    is sent to the next backend once the first one is slower than the configured latency
+    percentile of its backend in the same phase, so that the long replies of the Coding and
+    modification phases are not compared with the short ones of the other phases. Requests made
+    outside a phase use the percentile of all requests. The first successful response wins and
+    the other request is cancelled. A failed request is retried once on the next backend, and
+    backends whose rolling error rate or latency crosses its threshold are taken out of rotation
+    for a cooldown.
+
+    Only async requests can be cancelled, the losing request of a sync hedge runs to
+    completion in the background.
+    """
+
+    def __init__(self, chat_bots: Dict[str, object], config: Optional[RouterConfig] = None):
+        """
+        Initialize the RoutingChatBot.
+
+        Args:
+            chat_bots (Dict[str, object]): The chat bots by name, e.g. "openai/gpt-4", in order of preference.
+            config (RouterConfig, optional): The hedging and failover thresholds, RouterConfig() by default.
+        """
+        if not chat_bots:
+            raise ValueError("RoutingChatBot needs at least one chat bot")
+        self.chat_bots = dict(chat_bots)
+        self.config = config or RouterConfig()
+        self.health = {name: BackendHealth(self.config) for name in self.chat_bots}
+        self.counts = {"requests": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0, "ejections": 0}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> Optional[str]:
+        """
+        The model of the preferred backend in rotation.
+        """
+        return getattr(self.chat_bots[self._rank_backends()[0]], "model", None)
+
+    def _rank_backends(self) -> List[str]:
+        # Backends out of rotation are kept as a last resort
+        names = list(self.chat_bots)
+        return [name for name in names if self.health[name].is_healthy()] + \
+               [name for name in names if not self.health[name].is_healthy()]
+
+    def _pick_backends(self):
+        """
+        Get the backend a request is sent to and the one its hedge or failover goes to.
+        """
+        ranked = self._rank_backends()
+        # A single backend hedges against itself, the duplicate usually lands on another replica
+        return ranked[0], ranked[1] if len(ranked) > 1 else ranked[0]
+
+    @staticmethod
+    def _get_phase() -> Optional[str]:
+        """
+        Get the phase of the current request from its metrics labels, without the cycle of its
+        composed phase, e.g. "CodeReviewComment" for "CodeReview[1].CodeReviewComment".
+        """
+        phase = get_metrics_labels().get("phase")
+        return phase.rsplit(".", 1)[-1] if phase else None
+
+    def _get_hedge_delay(self, name: str, phase: Optional[str]) -> Optional[float]:
+        """
+        Get the seconds after which a request of a phase to a backend is hedged, None to not hedge.
+        """
+        if not self.config.hedge:
+            return None
+        latency = self.health[name].latency_percentile(self.config.hedge_percentile, phase)
+        if latency is None:
+            return None
+        return max(self.config.hedge_min_delay_s, latency)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] += 1
+
+    def _record(self, name: str, start: float, response, phase: Optional[str]) -> None:
+        if self.health[name].record(time.perf_counter() - start, is_error_response(response), phase):
+            self._count("ejections")
+
+    def _send(self, name: str, messages: List[Dict[str, str]], stop_when: Optional[StopCondition],
+              phase: Optional[str] = None):
+        start = time.perf_counter()
+        response = self.chat_bots[name].send_messages_and_get_response(messages, stop_when=stop_when)
+        self._record(name, start, response, phase)
+        return response
+
+    async def _asend(self, name: str, messages: List[Dict[str, str]], stop_when: Optional[StopCondition],
+                     phase: Optional[str] = None):
+        start = time.perf_counter()
+        response = await self.chat_bots[name].asend_messages_and_get_response(messages, stop_when=stop_when)
+        self._record(name, start, response, phase)
+        return response
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(thread_name_prefix="hedge")
+            return self._executor
+
+    def send_messages_and_get_response(self, messages: List[Dict[str, str]],
+                                       stop_when: Optional[StopCondition] = None) -> str:
+        """
+        Sends a list of messages to the preferred backend, hedging and failing over as configured.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+            stop_when (StopCondition, optional): Ends streamed responses early, see OpenAIChatBot.
+
+        Returns:
+            str: The first successful response, or the last error.
+        """
+        self._count("requests")
+        primary, alternate = self._pick_backends()
+        phase = self._get_phase()
+        hedge_delay = self._get_hedge_delay(primary, phase)
+        if hedge_delay is None:
+            response = self._send(primary, messages, stop_when, phase)
+            if is_error_response(response) and alternate != primary:
+                self._count("failovers")
+                response = self._send(alternate, messages, stop_when, phase)
+            return response
+
+        executor = self._get_executor()
+        # The metrics context of the turn is carried over to the worker threads
+        primary_future = executor.submit(contextvars.copy_context().run, self._send, primary, messages,
+                                         stop_when, phase)
+        pending = {primary_future}
+        hedge_future = None
+        if not wait(pending, timeout=hedge_delay).done:
+            self._count("hedged")
+            # The threads share no Message, whose token count cache is not thread-safe
+            hedge_future = executor.submit(contextvars.copy_context().run, self._send, alternate,
+                                           list(messages), stop_when, phase)
+            pending.add(hedge_future)
+        response = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                response = future.result()
+                if not is_error_response(response):
+                    if future is hedge_future:
+                        self._count("hedge_wins")
+                    return response
+        if hedge_future is None and alternate != primary:
+            self._count("failovers")
+            response = self._send(alternate, messages, stop_when, phase)
+        return response
+
+    async def asend_messages_and_get_response(self, messages: List[Dict[str, str]],
+                                              stop_when: Optional[StopCondition] = None) -> str:
+        """
+        Asynchronously sends a list of messages to the preferred backend, hedging and failing over
+        as configured. The slower request of a hedge is cancelled.
+
+        Args:
+            messages (List[Dict[str, str]]): A list of message dictionaries with 'role' and 'content' keys.
+            stop_when (StopCondition, optional): Ends streamed responses early, see OpenAIChatBot.
+
+        Returns:
+            str: The first successful response, or the last error.
+        """
+        self._count("requests")
+        primary, alternate = self._pick_backends()
+        phase = self._get_phase()
+        hedge_delay = self._get_hedge_delay(primary, phase)
+        pending = {asyncio.ensure_future(self._asend(primary, messages, stop_when, phase))}
+        hedge_task = None
+        failed_over = False
+        response = None
+        try:
+            if hedge_delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+                if not done:
+                    self._count("hedged")
+                    hedge_task = asyncio.ensure_future(self._asend(alternate, messages, stop_when, phase))
+                    pending.add(hedge_task)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    response = task.result()
+                    if not is_error_response(response):
+                        if task is hedge_task:
+                            self._count("hedge_wins")
+                        return response
+                if not pending and hedge_task is None and not failed_over and alternate != primary:
+                    self._count("failovers")
+                    failed_over = True
+                    pending = {asyncio.ensure_future(self._asend(alternate, messages, stop_when, phase))}
+            return response
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Get the number of requests, hedges, hedge wins, failovers and ejections, and the backends in rotation.
+        """
+        with self._lock:
+            stats = dict(self.counts)
+        stats["healthy"] = [name for name in self.chat_bots if self.health[name].is_healthy()]
+        return stats
+
+    def close(self) -> None:
+        """
+        Stop the threads of the sync hedges, without waiting for the requests they still run.
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
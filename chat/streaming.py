@@ -0,0 +1,120 @@
+import re
+from typing import Callable, List, Optional
+
+from utils.metrics import mark_first_token
+
+# Decides from the text received so far whether the rest of a streamed response can be skipped
+StopCondition = Callable[[str], bool]
+
+
+def info_line_terminator(text: str) -> bool:
+    """
+    Stop once the response starts with a complete "<INFO>" line, which ends a phase in
+    create_conversation.
+
+    Args:
+        text (str): The text received so far.
+
+    Returns:
+        bool: True if the rest of the response is not needed.
+    """
+    stripped = text.lstrip()
+    return stripped.startswith("<INFO>") and "\n" in stripped
+
+
+class CodeFenceTerminator:
+    """
+    Stop once the closing fence of the last expected markdown code block is received.
+
+    Only usable when the number of files in the response is known in advance.
+    """
+
+    FENCE_PATTERN = re.compile(r"^\s*```", re.MULTILINE)
+
+    def __init__(self, expected_blocks: int):
+        """
+        Initialize the CodeFenceTerminator.
+
+        Args:
+            expected_blocks (int): The number of code blocks in the response.
+        """
+        self.expected_blocks = expected_blocks
+
+    def __call__(self, text: str) -> bool:
+        # Every block has an opening and a closing fence
+        return len(self.FENCE_PATTERN.findall(text)) // 2 >= self.expected_blocks
+
+
+def describe_stop_condition(stop_when: Optional[StopCondition]) -> Optional[str]:
+    """
+    Describe a stop condition by its qualified name, and the attributes of a callable object,
+    e.g. "chat.streaming.CodeFenceTerminator{'expected_blocks': 1}". The description is stable
+    across processes, unlike the repr of a function.
+
+    Args:
+        stop_when (StopCondition, optional): The stop condition.
+
+    Returns:
+        Optional[str]: The description, None without a stop condition.
+    """
+    if stop_when is None:
+        return None
+    if hasattr(stop_when, "__qualname__"):
+        return f"{stop_when.__module__}.{stop_when.__qualname__}"
+    condition_type = type(stop_when)
+    attributes = {key: repr(value) for key, value in sorted(getattr(stop_when, "__dict__", {}).items())}
+    return f"{condition_type.__module__}.{condition_type.__qualname__}{attributes}"
+
+
+class StreamCollector:
+    """
+    Accumulates the tokens of a streamed response, records the time to first token and
+    evaluates the stop condition whenever a line is completed.
+    """
+
+    def __init__(self, stop_when: Optional[StopCondition] = None):
+        """
+        Initialize the StreamCollector.
+
+        Args:
+            stop_when (StopCondition, optional): Ends the stream early when it returns True.
+        """
+        self.stop_when = stop_when
+        self.stopped = False
+        self._parts: List[str] = []
+
+    def feed(self, token: str) -> bool:
+        """
+        Add a token of the response.
+
+        Args:
+            token (str): The content of a streamed chunk.
+
+        Returns:
+            bool: True if the stream should stop.
+        """
+        if not token:
+            return False
+        if not self._parts:
+            mark_first_token()
+        self._parts.append(token)
+        if self.stop_when is None or "\n" not in token:
+            return False
+        text = "".join(self._parts)
+        self._parts = [text]
+        # Only complete lines are checked, so a line is never cut by the condition it satisfies
+        complete_text = text[:text.rfind("\n") + 1]
+        if self.stop_when(complete_text):
+            # Drop whatever follows the line that satisfied the stop condition
+            self._parts = [complete_text]
+            self.stopped = True
+        return self.stopped
+
+    def get_text(self) -> str:
+        """
+        Get the response received so far.
+
+        Returns:
+            str: The concatenated tokens.
+        """
+        return "".join(self._parts)
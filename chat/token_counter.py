@@ -0,0 +1,61 @@
+from functools import lru_cache
+from typing import Dict, Iterable
+
+# Every message follows <im_start>{role/name}\n{content}<im_end>\n
+TOKENS_PER_MESSAGE = 4
+# Every reply is primed with <im_start>assistant
+TOKENS_PER_REPLY = 2
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str):
+    """
+    Get the tiktoken encoding of a model, loaded once per process.
+
+    Args:
+        model (str): The model name, e.g. "gpt-4".
+
+    Returns:
+        tiktoken.Encoding: The encoding of the model, cl100k_base for unknown models.
+    """
+    # tiktoken is only imported once tokens are counted, so that starting the app does not load it
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_message_tokens(message: Dict[str, str], model: str) -> int:
+    """
+    Count the tokens used by a single message.
+
+    Args:
+        message (Dict[str, str]): A message dictionary with 'role' and 'content' keys.
+        model (str): The model whose encoding is used.
+
+    Returns:
+        int: The number of tokens used.
+    """
+    encoding = get_encoding(model)
+    num_tokens = TOKENS_PER_MESSAGE
+    for key, value in message.items():
+        num_tokens += len(encoding.encode(value))
+        if key == "name":
+            num_tokens += -1  # Role is always required and always 1 token
+    return num_tokens
+
+
+def count_tokens(messages: Iterable[Dict[str, str]], model: str) -> int:
+    """
+    Count the tokens used by a request, including the priming of the reply.
+
+    Args:
+        messages (Iterable[Dict[str, str]]): Message dictionaries with 'role' and 'content' keys.
+        model (str): The model whose encoding is used.
+
+    Returns:
+        int: The number of tokens used.
+    """
+    return sum(count_message_tokens(message, model) for message in messages) + TOKENS_PER_REPLY
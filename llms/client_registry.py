@@ -0,0 +1,239 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+from llms.openai_llm import CONFIGS_DIR
+
+
+@dataclass(frozen=True)
+class PoolLimits:
+    """
+    Defines the connection pooling of the LLM clients shared by a process.
+
+    Attributes:
+        max_connections (int): Maximum open connections of an async HTTP session.
+        max_connections_per_host (int): Maximum keep-alive connections kept per host.
+        keepalive_timeout (float): Seconds an unused keep-alive connection stays open.
+        idle_timeout (float): Seconds after which an unused client is evicted from the registry.
+    """
+
+    max_connections: int = 100
+    max_connections_per_host: int = 20
+    keepalive_timeout: float = 30.0
+    idle_timeout: float = 300.0
+
+    def to_dict(self):
+        """
+        Convert the limits to a dictionary.
+        """
+        return asdict(self)
+
+    @classmethod
+    def load_from_file(cls, filename):
+        """
+        Load the limits from a JSON file in the 'configs' directory.
+        """
+        config_path = os.path.join(CONFIGS_DIR, filename)
+        with open(config_path, "r") as config_file:
+            config_dict = json.load(config_file)
+        return cls(**config_dict)
+
+
+@dataclass
+class _ClientEntry:
+    client: object
+    last_used: float
+
+
+class ClientRegistry:
+    """
+    Process-wide registry of LLM clients and pooled HTTP sessions.
+
+    Clients are keyed by (provider, model, credentials) and reused by every conversation of
+    the process; the ones unused for longer than the idle timeout are closed and evicted.
+    OpenAI requests carry their credentials in headers, so the OpenAI library is given one
+    pooled requests session per thread and one aiohttp session per event loop, shared by
+    every model and key.
+    """
+
+    def __init__(self, limits: Optional[PoolLimits] = None):
+        """
+        Initialize the ClientRegistry.
+
+        Args:
+            limits (PoolLimits, optional): The pooling limits, PoolLimits() by default.
+        """
+        self.limits = limits or PoolLimits()
+        self._clients: Dict[Tuple[str, str, str], _ClientEntry] = {}
+        self._async_sessions: Dict[int, Tuple[asyncio.AbstractEventLoop, object]] = {}
+        self._lock = threading.Lock()
+        self._last_eviction = time.monotonic()
+
+    @staticmethod
+    def _fingerprint(api_key: Optional[str]) -> str:
+        # Keep the credentials out of the keys, which show up in stats and logs
+        return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+    def get_client(self, provider: str, model: str, api_key: Optional[str], factory: Callable[[], object]):
+        """
+        Get the client of a provider, model and credentials, creating it on first use.
+
+        Callers look the client up for every request instead of keeping it, so that a client in use
+        is never evicted as idle.
+
+        Args:
+            provider (str): The provider name, e.g. "nvidia".
+            model (str): The model name.
+            api_key (str, optional): The credentials of the client.
+            factory (Callable[[], object]): Creates the client.
+
+        Returns:
+            object: The shared client.
+        """
+        key = (provider, model, self._fingerprint(api_key))
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._clients.get(key)
+            if entry is None:
+                entry = self._clients[key] = _ClientEntry(factory(), now)
+            entry.last_used = now
+            return entry.client
+
+    def evict_idle(self) -> int:
+        """
+        Close and remove the clients unused for longer than the idle timeout.
+
+        Returns:
+            int: The number of evicted clients.
+        """
+        with self._lock:
+            return self._evict_idle(time.monotonic(), force=True)
+
+    def _evict_idle(self, now: float, force: bool = False) -> int:
+        # Scanning on every lookup is wasteful, once per tenth of the idle timeout is enough
+        if not force and now - self._last_eviction < self.limits.idle_timeout / 10:
+            return 0
+        self._last_eviction = now
+        idle_keys = [key for key, entry in self._clients.items()
+                     if now - entry.last_used > self.limits.idle_timeout]
+        for key in idle_keys:
+            self._close_client(self._clients.pop(key).client)
+        return len(idle_keys)
+
+    @staticmethod
+    def _close_client(client) -> None:
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
+    def make_requests_session(self):
+        """
+        Create a requests session pooling keep-alive connections up to the configured limits.
+
+        The OpenAI library calls it once per thread through openai.requestssession.
+
+        Returns:
+            requests.Session: The pooled session.
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.limits.max_connections,
+                              pool_maxsize=self.limits.max_connections_per_host)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def get_aiohttp_session(self):
+        """
+        Get the pooled aiohttp session of the running event loop, creating it on first use.
+
+        Returns:
+            aiohttp.ClientSession: The session bound to the running loop.
+        """
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            # Sessions of loops closed without aclose_async_session cannot be closed anymore
+            for loop_id, (session_loop, _) in list(self._async_sessions.items()):
+                if session_loop.is_closed():
+                    del self._async_sessions[loop_id]
+            entry = self._async_sessions.get(id(loop))
+            if entry is None or entry[1].closed:
+                connector = aiohttp.TCPConnector(limit=self.limits.max_connections,
+                                                 limit_per_host=self.limits.max_connections_per_host,
+                                                 keepalive_timeout=self.limits.keepalive_timeout)
+                entry = self._async_sessions[id(loop)] = (loop, aiohttp.ClientSession(connector=connector))
+            return entry[1]
+
+    async def aclose_async_session(self) -> None:
+        """
+        Close the aiohttp session of the running event loop, to be awaited before the loop ends.
+        """
+        with self._lock:
+            entry = self._async_sessions.pop(id(asyncio.get_running_loop()), None)
+        if entry is not None:
+            await entry[1].close()
+
+    def configure_openai(self) -> None:
+        """
+        Make the OpenAI library create its per-thread requests sessions through this registry.
+        """
+        import openai
+
+        openai.requestssession = self.make_requests_session
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the number of clients and async sessions held by the registry.
+
+        Returns:
+            Dict[str, int]: The number of clients and of async sessions.
+        """
+        with self._lock:
+            return {"clients": len(self._clients), "async_sessions": len(self._async_sessions)}
+
+    def close(self) -> None:
+        """
+        Close every client. Async sessions are closed by aclose_async_session on their own loop.
+        """
+        with self._lock:
+            for entry in self._clients.values():
+                self._close_client(entry.client)
+            self._clients.clear()
+
+
+_registry: Optional[ClientRegistry] = None
+_registry_lock = threading.Lock()
+
+POOL_CONFIG_FILE = "ClientPoolConfig.json"
+
+
+def get_client_registry() -> ClientRegistry:
+    """
+    Get the client registry of the process, created on first use with the limits of
+    configs/ClientPoolConfig.json.
+
+    Returns:
+        ClientRegistry: The shared registry.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            try:
+                limits = PoolLimits.load_from_file(POOL_CONFIG_FILE)
+            except FileNotFoundError:
+                limits = PoolLimits()
+            _registry = ClientRegistry(limits)
+        return _registry
@@ -0,0 +1,351 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, Optional
+
+from llms.openai_llm import CONFIGS_DIR
+
+RATE_LIMIT_CONFIG_FILE = "RateLimitConfig.json"
+
+# HTTP statuses worth retrying: throttling, timeouts and transient server errors
+TRANSIENT_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {408, 429}
+# Exception class names of the OpenAI library that are worth retrying
+TRANSIENT_ERROR_NAMES = {"RateLimitError", "Timeout", "APIConnectionError", "ServiceUnavailableError", "TryAgain"}
+THROTTLE_ERROR_NAMES = {"RateLimitError", "Timeout"}
+# Status leading the message of the bare exceptions raised by ChatNVIDIA, e.g. "[429] Too Many Requests"
+MESSAGE_STATUS_PATTERN = re.compile(r'^\s*\[(\d{3})\]')
+
+
+@dataclass(frozen=True)
+class RateLimitConfig:
+    """
+    Defines the quota of a provider/model and the bounds of its adaptive concurrency.
+
+    Attributes:
+        rpm (float, optional): Requests per minute, None for unlimited.
+        tpm (float, optional): Tokens per minute, prompt and completion, None for unlimited.
+        max_concurrency (int): Upper bound of the requests in flight.
+        min_concurrency (int): Lower bound of the requests in flight.
+        increase_step (float): Additive increase of the concurrency per window of successful requests.
+        decrease_factor (float): Multiplicative decrease of the concurrency on a 429 or timeout.
+    """
+
+    rpm: Optional[float] = None
+    tpm: Optional[float] = None
+    max_concurrency: int = 16
+    min_concurrency: int = 1
+    increase_step: float = 1.0
+    decrease_factor: float = 0.5
+
+    def to_dict(self):
+        """
+        Convert the configuration to a dictionary.
+        """
+        return asdict(self)
+
+    def scaled(self, share: float) -> "RateLimitConfig":
+        """
+        Get the configuration of a process that owns a share of the quota.
+
+        Args:
+            share (float): The share of the quota, e.g. 1 / workers.
+
+        Returns:
+            RateLimitConfig: The configuration with rpm, tpm and max_concurrency scaled.
+        """
+        return replace(
+            self,
+            rpm=self.rpm * share if self.rpm else self.rpm,
+            tpm=self.tpm * share if self.tpm else self.tpm,
+            max_concurrency=max(self.min_concurrency, int(self.max_concurrency * share)),
+        )
+
+    @classmethod
+    def load_all(cls, filename: str) -> Dict[str, "RateLimitConfig"]:
+        """
+        Load the configurations of a JSON file in the 'configs' directory.
+
+        The file maps "provider/model" keys, and a "default" key, to configurations.
+
+        Returns:
+            Dict[str, RateLimitConfig]: The configurations by key.
+        """
+        config_path = os.path.join(CONFIGS_DIR, filename)
+        with open(config_path, "r") as config_file:
+            config_dicts = json.load(config_file)
+        return {key: cls(**config_dict) for key, config_dict in config_dicts.items()}
+
+
+def get_error_status(error: BaseException) -> Optional[int]:
+    """
+    Get the HTTP status of a provider error, if it carries one, either as an attribute of the error
+    or its response, or leading its message like the errors of ChatNVIDIA.
+    """
+    status = getattr(error, "http_status", None) or getattr(error, "status_code", None)
+    response = getattr(error, "response", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None) or getattr(response, "status", None)
+    if isinstance(status, int):
+        return status
+    match = MESSAGE_STATUS_PATTERN.match(str(error))
+    return int(match.group(1)) if match else None
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    """
+    Whether an error means the provider is over capacity: a 429 or a timeout.
+    """
+    if type(error).__name__ in THROTTLE_ERROR_NAMES or isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    return get_error_status(error) in THROTTLE_STATUSES
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    Whether a request that failed with an error is worth retrying. Invalid requests,
+    authentication errors and context length errors are not.
+    """
+    if is_throttle_error(error) or type(error).__name__ in TRANSIENT_ERROR_NAMES:
+        return True
+    if isinstance(error, ConnectionError):
+        return True
+    return get_error_status(error) in TRANSIENT_STATUSES
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket refilled continuously up to its capacity.
+    """
+
+    def __init__(self, capacity: float, refill_per_sec: float):
+        """
+        Initialize the TokenBucket, full.
+
+        Args:
+            capacity (float): The maximum number of tokens.
+            refill_per_sec (float): The tokens added per second.
+        """
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_sec)
+        self._updated = now
+
+    def try_acquire(self, amount: float) -> float:
+        """
+        Take tokens if available.
+
+        Args:
+            amount (float): The tokens to take, capped at the capacity.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds until they are available.
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.refill_per_sec
+
+    def adjust(self, amount: float) -> None:
+        """
+        Give back (positive) or take (negative) tokens once the actual usage is known.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class Permit:
+    """
+    The right to send one request, released by RateLimiter.limit/alimit.
+
+    Attributes:
+        tokens (int): The tokens reserved for the request.
+        actual_tokens (int): The tokens actually used, when reported.
+        error (BaseException): The error the request failed with, if any.
+    """
+
+    def __init__(self, tokens: int):
+        self.tokens = tokens
+        self.actual_tokens: Optional[int] = None
+        self.error: Optional[BaseException] = None
+
+
+class RateLimiter:
+    """
+    Shared limiter of a provider/model: requests-per-minute and tokens-per-minute buckets
+    plus an AIMD limit on the requests in flight.
+
+    The concurrency limit grows by increase_step per window of successful requests and is
+    multiplied by decrease_factor when a 429 or a timeout comes back, so that throughput
+    settles just under the quota instead of oscillating around it.
+    """
+
+    def __init__(self, config: RateLimitConfig):
+        """
+        Initialize the RateLimiter.
+
+        Args:
+            config (RateLimitConfig): The quota and concurrency bounds.
+        """
+        self.config = config
+        self.concurrency = float(config.max_concurrency)
+        self.in_flight = 0
+        self.throttled = 0
+        self._request_bucket = TokenBucket(config.rpm, config.rpm / 60) if config.rpm else None
+        self._token_bucket = TokenBucket(config.tpm, config.tpm / 60) if config.tpm else None
+        self._condition = threading.Condition()
+
+    def _try_acquire(self, tokens: int) -> float:
+        """
+        Take a concurrency slot and the quota of a request.
+
+        Returns:
+            float: 0 if acquired, otherwise the seconds to wait before trying again.
+        """
+        with self._condition:
+            if self.in_flight >= int(self.concurrency):
+                # Woken up by _release, the timeout only guards against missed notifications
+                return 0.05
+            if self._request_bucket is not None:
+                wait_time = self._request_bucket.try_acquire(1)
+                if wait_time:
+                    return wait_time
+            if self._token_bucket is not None:
+                wait_time = self._token_bucket.try_acquire(tokens)
+                if wait_time:
+                    self._request_bucket and self._request_bucket.adjust(1)
+                    return wait_time
+            self.in_flight += 1
+            return 0.0
+
+    def _release(self, permit: Permit) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            if permit.error is not None and is_throttle_error(permit.error):
+                self.throttled += 1
+                self.concurrency = max(self.config.min_concurrency, self.concurrency * self.config.decrease_factor)
+            elif permit.error is None:
+                self.concurrency = min(self.config.max_concurrency,
+                                       self.concurrency + self.config.increase_step / max(1.0, self.concurrency))
+            if self._token_bucket is not None and permit.actual_tokens is not None:
+                self._token_bucket.adjust(permit.tokens - permit.actual_tokens)
+            self._condition.notify_all()
+
+    @contextmanager
+    def limit(self, tokens: int = 0):
+        """
+        Block until a request of the given size may be sent.
+
+        Args:
+            tokens (int): The tokens the request is expected to use, prompt and completion.
+
+        Yields:
+            Permit: Set actual_tokens on it once known; errors raised in the block are recorded.
+        """
+        while True:
+            wait_time = self._try_acquire(tokens)
+            if not wait_time:
+                break
+            with self._condition:
+                self._condition.wait(wait_time)
+        permit = Permit(tokens)
+        try:
+            yield permit
+        except BaseException as e:
+            permit.error = e
+            raise
+        finally:
+            self._release(permit)
+
+    @asynccontextmanager
+    async def alimit(self, tokens: int = 0):
+        """
+        Wait, without blocking the event loop, until a request of the given size may be sent.
+
+        Args:
+            tokens (int): The tokens the request is expected to use, prompt and completion.
+
+        Yields:
+            Permit: Set actual_tokens on it once known; errors raised in the block are recorded.
+        """
+        while True:
+            wait_time = self._try_acquire(tokens)
+            if not wait_time:
+                break
+            await asyncio.sleep(wait_time)
+        permit = Permit(tokens)
+        try:
+            yield permit
+        except BaseException as e:
+            permit.error = e
+            raise
+        finally:
+            self._release(permit)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get the current concurrency limit, requests in flight and number of throttled requests.
+        """
+        with self._condition:
+            return {"concurrency": self.concurrency, "in_flight": self.in_flight, "throttled": self.throttled}
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+_configs: Optional[Dict[str, RateLimitConfig]] = None
+_quota_share = 1.0
+
+
+def set_quota_share(share: float) -> None:
+    """
+    Set the share of the configured quotas owned by this process, e.g. 1 / workers in a
+    batch worker. Only limiters created afterwards are affected.
+
+    Args:
+        share (float): The share of the quotas, between 0 and 1.
+    """
+    global _quota_share
+    _quota_share = share
+
+
+def get_rate_limiter(provider: str, model: str) -> RateLimiter:
+    """
+    Get the limiter shared by every request of a provider/model in this process.
+
+    The configuration is the "provider/model" entry of configs/RateLimitConfig.json, or
+    its "default" entry.
+
+    Args:
+        provider (str): The provider name, e.g. "openai".
+        model (str): The model name.
+
+    Returns:
+        RateLimiter: The shared limiter.
+    """
+    global _configs
+    key = f"{provider}/{model}"
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            if _configs is None:
+                try:
+                    _configs = RateLimitConfig.load_all(RATE_LIMIT_CONFIG_FILE)
+                except FileNotFoundError:
+                    _configs = {}
+            config = _configs.get(key) or _configs.get("default") or RateLimitConfig()
+            limiter = _limiters[key] = RateLimiter(config.scaled(_quota_share))
+        return limiter
@@ -0,0 +1,147 @@
+import re
+from dataclasses import astuple, dataclass
+from typing import Iterable, List, Optional
+
+# "```python" opens a block, a line holding only "```" closes it
+OPENING_FENCE_PATTERN = re.compile(r'^\s*```(\w+)\s*$')
+CLOSING_FENCE_PATTERN = re.compile(r'^\s*```\s*$')
+# A file name in the line before a block, e.g. "main.py" or "**`utils/helpers.py`**"
+FILENAME_PATTERN = re.compile(r'([^\s`*"\']+)\.(\w+)')
+DOCSTRING_DELIMITERS = ("'''", '"""')
+
+
+@dataclass
+class CodeBlock:
+    """
+    A file of a Coding phase response in the FILENAME/LANGUAGE/DOCSTRING/CODE format.
+
+    Attributes:
+        filename (str): The file name without its extension, or the whole header if it holds no file name.
+        extension (str, optional): The file extension, None if the header holds no file name.
+        language (str): The language of the opening fence.
+        docstring (str): The docstring opening the block, empty if there is none.
+        code (str): The code following the docstring.
+    """
+    filename: str
+    extension: Optional[str]
+    language: str
+    docstring: str
+    code: str
+
+    def as_tuple(self):
+        """
+        Get the block as the (filename, extension, language, docstring, code) tuple of TaskParser.
+        """
+        return astuple(self)
+
+
+class CodeBlockStreamParser:
+    """
+    Single-pass, line-oriented parser of the code blocks of a response.
+
+    Every line is looked at once, so parsing is linear in the size of the response whether it is
+    fed whole or chunk by chunk as it is streamed.
+    """
+
+    def __init__(self):
+        self._partial_line = ""
+        # Last non-empty line outside of a block, and the last one holding a file name
+        self._header = ""
+        self._filename_line = None
+        self._language = None
+        self._block_lines: List[str] = []
+
+    def feed(self, chunk: str) -> List[CodeBlock]:
+        """
+        Add a chunk of the response.
+
+        Args:
+            chunk (str): The next part of the response, not necessarily ending at a line break.
+
+        Returns:
+            List[CodeBlock]: The blocks closed by this chunk.
+        """
+        lines = (self._partial_line + chunk).split("\n")
+        self._partial_line = lines.pop()
+        blocks = []
+        for line in lines:
+            block = self._feed_line(line)
+            if block is not None:
+                blocks.append(block)
+        return blocks
+
+    def close(self) -> List[CodeBlock]:
+        """
+        End the response, a block that is still open is dropped.
+
+        Returns:
+            List[CodeBlock]: The block closed by the last, unterminated line, if any.
+        """
+        line, self._partial_line = self._partial_line, ""
+        block = self._feed_line(line) if line else None
+        return [block] if block is not None else []
+
+    def _feed_line(self, line: str) -> Optional[CodeBlock]:
+        if self._language is None:
+            match = OPENING_FENCE_PATTERN.match(line) if "```" in line else None
+            if match:
+                self._language = match.group(1)
+                self._block_lines = []
+            elif line.strip():
+                self._header = line.strip()
+                if FILENAME_PATTERN.search(self._header):
+                    self._filename_line = self._header
+            return None
+
+        # Code lines are the bulk of a response, a substring test rules most of them out cheaply
+        if "```" not in line or not CLOSING_FENCE_PATTERN.match(line):
+            self._block_lines.append(line)
+            return None
+
+        block = self._build_block()
+        self._language = None
+        self._block_lines = []
+        self._header = ""
+        self._filename_line = None
+        return block
+
+    def _build_block(self) -> CodeBlock:
+        header = self._filename_line or self._header
+        filename_match = FILENAME_PATTERN.search(header)
+        if filename_match:
+            filename, extension = filename_match.group(1), filename_match.group(2)
+        else:
+            filename, extension = header, None
+
+        lines = self._block_lines
+        docstring = ""
+        code_start = 0
+        first = next((index for index, line in enumerate(lines) if line.strip()), None)
+        if first is not None and lines[first].strip() in DOCSTRING_DELIMITERS:
+            delimiter = lines[first].strip()
+            end = next((index for index in range(first + 1, len(lines)) if lines[index].strip() == delimiter), None)
+            if end is not None:
+                docstring = "\n".join(lines[first + 1:end]).strip()
+                code_start = end + 1
+
+        return CodeBlock(filename, extension, self._language, docstring, "\n".join(lines[code_start:]).strip())
+
+
+def parse_code_blocks(chunks: Iterable[str]) -> List[CodeBlock]:
+    """
+    Parse every code block of a response.
+
+    Args:
+        chunks (Iterable[str]): The response, or the chunks of a streamed response.
+
+    Returns:
+        List[CodeBlock]: The blocks in order of appearance.
+    """
+    if isinstance(chunks, str):
+        chunks = (chunks,)
+    parser = CodeBlockStreamParser()
+    blocks = []
+    for chunk in chunks:
+        blocks.extend(parser.feed(chunk))
+    blocks.extend(parser.close())
+    return blocks
@@ -0,0 +1,231 @@
+import difflib
+import hashlib
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from postprocess.code_block_parser import CodeBlock
+
+
+@dataclass(frozen=True)
+class CodeFile:
+    """
+    A version of a generated file.
+
+    Attributes:
+        path (str): The file name with its extension, e.g. "main.py".
+        language (str): The language of the code block the file came from.
+        docstring (str): The docstring of the file.
+        content (str): The code of the file, without its docstring.
+        version (int): 1 for the first version of the file, incremented by every change.
+        content_hash (str): The SHA-256 of the docstring and content.
+    """
+    path: str
+    language: str
+    docstring: str
+    content: str
+    version: int = 1
+    content_hash: str = field(init=False)
+
+    def __post_init__(self):
+        digest = hashlib.sha256(f"{self.docstring}\0{self.content}".encode("utf-8")).hexdigest()
+        object.__setattr__(self, "content_hash", digest)
+
+    @property
+    def filename(self) -> str:
+        return os.path.splitext(self.path)[0]
+
+    @property
+    def extension(self) -> str:
+        return os.path.splitext(self.path)[1].lstrip(".")
+
+    @property
+    def summary(self) -> str:
+        """
+        The path followed by the first line of the docstring, e.g. "main.py: Entry point of the app.".
+        """
+        docstring_lines = self.docstring.strip().splitlines()
+        return f"{self.path}: {docstring_lines[0]}" if docstring_lines else self.path
+
+    def render(self) -> str:
+        """
+        Render the file in the FILENAME/LANGUAGE/DOCSTRING/CODE format of the Coding phase.
+
+        Returns:
+            str: The file as a code block, which parses back to the same file.
+        """
+        return f"{self.path}\n```{self.language}\n'''\n{self.docstring}\n'''\n{self.content}\n```\n"
+
+    def to_dict(self) -> Dict:
+        state = asdict(self)
+        state.pop("content_hash")
+        return state
+
+
+class CodeRepository:
+    """
+    In-memory store of the files generated by a run, holding every version of each file.
+
+    The repository is stored in IntermediateVars.codes and renders itself when a prompt is formatted,
+    a format spec selecting what is rendered:
+
+    - "{codes}": every file as a code block.
+    - "{codes:index}": one summary line per file, see CodeFile.summary.
+    - "{codes:main.py,utils.py}": only the listed files. The spec may itself be a field, e.g.
+      "{codes:{unimplemented_file}}" renders the file named by IntermediateVars.unimplemented_file.
+    """
+
+    INDEX_SPEC = "index"
+
+    def __init__(self, files: Optional[Iterable[CodeFile]] = None):
+        """
+        Initialize the CodeRepository.
+
+        Args:
+            files (Iterable[CodeFile], optional): Versions of files in increasing version order.
+        """
+        self._history: Dict[str, List[CodeFile]] = {}
+        self._revision = 0
+        for code_file in files or ():
+            self._history.setdefault(code_file.path, []).append(code_file)
+            self._revision += 1
+
+    def __len__(self) -> int:
+        return len(self._history)
+
+    def __iter__(self) -> Iterator[CodeFile]:
+        return (versions[-1] for versions in self._history.values())
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._history
+
+    def __str__(self) -> str:
+        return self.render()
+
+    def __format__(self, format_spec: str) -> str:
+        if not format_spec:
+            return self.render()
+        if format_spec == self.INDEX_SPEC:
+            return "\n".join(code_file.summary for code_file in self)
+        return self.render(path.strip() for path in format_spec.split(","))
+
+    @property
+    def revision(self) -> int:
+        """
+        The number of file versions added so far, which changes whenever the repository does.
+        """
+        return self._revision
+
+    def paths(self) -> List[str]:
+        """
+        Get the paths of the files in order of creation.
+        """
+        return list(self._history)
+
+    def get(self, path: str, version: Optional[int] = None) -> Optional[CodeFile]:
+        """
+        Get a file.
+
+        Args:
+            path (str): The path of the file.
+            version (int, optional): The version of the file, the latest by default.
+
+        Returns:
+            Optional[CodeFile]: The file, None if the path or the version does not exist.
+        """
+        versions = self._history.get(path)
+        if not versions:
+            return None
+        if version is None:
+            return versions[-1]
+        return versions[version - 1] if 0 < version <= len(versions) else None
+
+    def update(self, path: str, language: str, docstring: str, content: str) -> Optional[CodeFile]:
+        """
+        Add a file, or a new version of it when its docstring or content changed.
+
+        Args:
+            path (str): The path of the file.
+            language (str): The language of the file.
+            docstring (str): The docstring of the file.
+            content (str): The code of the file.
+
+        Returns:
+            Optional[CodeFile]: The new version, None if the file is unchanged.
+        """
+        current = self.get(path)
+        code_file = CodeFile(path, language, docstring, content, current.version + 1 if current else 1)
+        if current is not None and current.content_hash == code_file.content_hash:
+            return None
+        self._history.setdefault(path, []).append(code_file)
+        self._revision += 1
+        return code_file
+
+    def update_from_block(self, code_block: CodeBlock) -> Optional[CodeFile]:
+        """
+        Add a code block parsed from a response, see update.
+
+        Args:
+            code_block (CodeBlock): The block, whose header must name a file with an extension.
+
+        Returns:
+            Optional[CodeFile]: The new version, None if the file is unchanged.
+
+        Raises:
+            ValueError: If the header of the block holds no file name.
+        """
+        if code_block.extension is None:
+            raise ValueError(f"No file name in the header '{code_block.filename}'")
+        return self.update(f"{code_block.filename}.{code_block.extension}", code_block.language,
+                           code_block.docstring, code_block.code)
+
+    def diff(self, path: str, from_version: Optional[int] = None, to_version: Optional[int] = None) -> str:
+        """
+        Get the unified diff between two versions of a file.
+
+        Args:
+            path (str): The path of the file.
+            from_version (int, optional): The older version, the one before to_version by default.
+            to_version (int, optional): The newer version, the latest by default.
+
+        Returns:
+            str: The diff of the code, empty if the versions are identical or do not exist.
+        """
+        new = self.get(path, to_version)
+        if new is None:
+            return ""
+        old = self.get(path, from_version if from_version is not None else new.version - 1)
+        diff_lines = list(difflib.unified_diff(
+            old.content.splitlines() if old else [], new.content.splitlines(),
+            fromfile=f"a/{path}" if old else "/dev/null", tofile=f"b/{path}", lineterm="",
+        ))
+        return "\n".join(diff_lines) + "\n" if diff_lines else ""
+
+    def render(self, paths: Optional[Iterable[str]] = None) -> str:
+        """
+        Render the latest version of files as code blocks.
+
+        Args:
+            paths (Iterable[str], optional): The files to render, every file by default. Unknown paths are skipped.
+
+        Returns:
+            str: The code blocks of the files.
+        """
+        if paths is None:
+            code_files = list(self)
+        else:
+            code_files = [code_file for code_file in map(self.get, paths) if code_file is not None]
+        return "\n".join(code_file.render() for code_file in code_files)
+
+    def to_dict(self) -> Dict:
+        """
+        Serialize every version of every file, e.g. for the checkpoint.
+        """
+        return {"files": [code_file.to_dict() for versions in self._history.values() for code_file in versions]}
+
+    @classmethod
+    def from_dict(cls, state: Dict) -> "CodeRepository":
+        """
+        Restore a repository serialized by to_dict.
+        """
+        return cls(CodeFile(**file_state) for file_state in state.get("files", []))
@@ -0,0 +1,249 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from postprocess.code_block_parser import FILENAME_PATTERN
+from postprocess.code_repository import CodeFile, CodeRepository
+
+# Aider-style edit block:
+#   main.py
+#   <<<<<<< SEARCH
+#   lines to find
+#   =======
+#   lines to put instead
+#   >>>>>>> REPLACE
+SEARCH_MARKER_PATTERN = re.compile(r'^\s*<{5,}\s*SEARCH\s*$')
+DIVIDER_PATTERN = re.compile(r'^\s*={5,}\s*$')
+REPLACE_MARKER_PATTERN = re.compile(r'^\s*>{5,}\s*REPLACE\s*$')
+# Unified diff headers and hunks, e.g. "--- a/main.py", "+++ b/main.py", "@@ -3,4 +3,5 @@"
+OLD_FILE_PATTERN = re.compile(r'^--- (?:a/)?(\S+)')
+NEW_FILE_PATTERN = re.compile(r'^\+\+\+ (?:b/)?(\S+)')
+HUNK_HEADER_PATTERN = re.compile(r'^@@ -\d+(?:,(\d+))? \+\d+(?:,(\d+))? @@')
+NEW_FILE_PATH = "/dev/null"
+HEADER_DECORATION = "`*\"'#: "
+
+
+@dataclass
+class FileEdit:
+    """
+    A replacement of lines of a generated file, parsed from an edit block or a unified diff hunk.
+
+    Attributes:
+        path (str): The path of the file, e.g. "main.py".
+        search (str): The lines to find, empty to create the file.
+        replace (str): The lines to put instead.
+    """
+    path: str
+    search: str
+    replace: str
+
+    def render(self) -> str:
+        """
+        Render the edit as a SEARCH/REPLACE block, e.g. to quote it in a prompt.
+        """
+        return f"{self.path}\n<<<<<<< SEARCH\n{self.search}\n=======\n{self.replace}\n>>>>>>> REPLACE"
+
+
+@dataclass
+class PatchResult:
+    """
+    The outcome of applying edits to a CodeRepository.
+
+    Attributes:
+        applied (List[FileEdit]): The edits that were applied, or were already applied.
+        failed (List[FileEdit]): The edits whose search lines were not found.
+        updated (List[CodeFile]): The new versions of the files that changed.
+    """
+    applied: List[FileEdit] = field(default_factory=list)
+    failed: List[FileEdit] = field(default_factory=list)
+    updated: List[CodeFile] = field(default_factory=list)
+
+
+def parse_edits(response: str) -> List[FileEdit]:
+    """
+    Parse the SEARCH/REPLACE edit blocks and unified diff hunks of a response.
+
+    Args:
+        response (str): The response of a modification phase.
+
+    Returns:
+        List[FileEdit]: The edits in order of appearance.
+    """
+    edits = []
+    lines = response.splitlines()
+    path = None
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        if SEARCH_MARKER_PATTERN.match(line):
+            index, edit = _parse_edit_block(lines, index + 1, path)
+            if edit is not None:
+                edits.append(edit)
+            continue
+        if _is_file_header(lines, index):
+            old_path = OLD_FILE_PATTERN.match(line).group(1)
+            path = NEW_FILE_PATTERN.match(lines[index + 1]).group(1)
+            index += 2
+            while index < len(lines) and HUNK_HEADER_PATTERN.match(lines[index]):
+                old_count, new_count = HUNK_HEADER_PATTERN.match(lines[index]).groups()
+                index, edit = _parse_hunk(lines, index + 1, path, old_path == NEW_FILE_PATH,
+                                          int(old_count or 1), int(new_count or 1))
+                edits.append(edit)
+            continue
+        # A line naming only a file, e.g. "main.py" or "### `main.py`", precedes the edits of that file
+        header = line.strip().strip(HEADER_DECORATION)
+        if FILENAME_PATTERN.fullmatch(header):
+            path = header
+        index += 1
+    return edits
+
+
+def _parse_edit_block(lines: List[str], index: int, path: Optional[str]):
+    search, replace = [], []
+    target = search
+    while index < len(lines):
+        line = lines[index]
+        index += 1
+        if DIVIDER_PATTERN.match(line) and target is search:
+            target = replace
+        elif REPLACE_MARKER_PATTERN.match(line):
+            if path is None:
+                return index, None
+            return index, FileEdit(path, "\n".join(search), "\n".join(replace))
+        else:
+            target.append(line)
+    # An edit block cut short is not applied
+    return index, None
+
+
+def _is_file_header(lines: List[str], index: int) -> bool:
+    return bool(OLD_FILE_PATTERN.match(lines[index]) and index + 1 < len(lines)
+                and NEW_FILE_PATTERN.match(lines[index + 1]))
+
+
+def _parse_hunk(lines: List[str], index: int, path: str, new_file: bool, old_count: int, new_count: int):
+    # The counts of the "@@ -a,b +c,d @@" header delimit the hunk, so a removed "-- comment" line,
+    # which reads "--- comment", is content rather than the header of the next file
+    search, replace = [], []
+    while index < len(lines) and (len(search) < old_count or len(replace) < new_count):
+        line = lines[index]
+        if line.startswith("-") and len(search) < old_count:
+            search.append(line[1:])
+        elif line.startswith("+") and len(replace) < new_count:
+            replace.append(line[1:])
+        elif (line.startswith(" ") or line == "") and len(search) < old_count and len(replace) < new_count:
+            search.append(line[1:])
+            replace.append(line[1:])
+        elif not line.startswith("\\"):
+            # "\ No newline at end of file" is skipped, anything else ends a hunk cut short
+            break
+        index += 1
+    # Models undercount their hunks, the removed and added lines right after the counted ones belong to it
+    while index < len(lines) and not _is_file_header(lines, index):
+        line = lines[index]
+        if line.startswith("-"):
+            search.append(line[1:])
+        elif line.startswith("+"):
+            replace.append(line[1:])
+        elif not line.startswith("\\"):
+            break
+        index += 1
+    return index, FileEdit(path, "" if new_file else "\n".join(search), "\n".join(replace))
+
+
+def _replace_lines(content: str, search: str, replace: str) -> Optional[str]:
+    """
+    Replace the first occurrence of the search lines, first exactly, then ignoring the whitespace
+    around each line, which models often get wrong.
+    """
+    # Padding the content makes the exact match line-aligned
+    padded = f"\n{content}\n"
+    position = padded.find(f"\n{search}\n")
+    if position != -1:
+        return (padded[:position + 1] + replace + padded[position + 1 + len(search):])[1:-1]
+
+    content_lines = content.split("\n")
+    search_lines = [line.strip() for line in search.strip("\n").split("\n")]
+    stripped_lines = [line.strip() for line in content_lines]
+    for start in range(len(content_lines) - len(search_lines) + 1):
+        if stripped_lines[start:start + len(search_lines)] == search_lines:
+            return "\n".join(content_lines[:start] + replace.strip("\n").split("\n")
+                             + content_lines[start + len(search_lines):])
+    return None
+
+
+def _earlier_contents(repository: CodeRepository, path: str, contents: Dict[str, str]) -> Iterator[str]:
+    """
+    Yield the contents of a file before the latest, newest first, including the latest version of
+    the repository when the file was already edited by apply_edits.
+    """
+    code_file = repository.get(path)
+    if code_file is None:
+        return
+    if path in contents:
+        yield code_file.content
+    for version in range(code_file.version - 1, 0, -1):
+        earlier = repository.get(path, version)
+        if earlier is not None:
+            yield earlier.content
+
+
+def _is_applied(edit: FileEdit, content: str, earlier_contents: Iterable[str]) -> bool:
+    # The replacement must have appeared since the search lines were last seen, a replacement already in
+    # the file before, e.g. a common line like "return None", does not show the edit was applied
+    if edit.replace.strip() and _replace_lines(content, edit.replace, edit.replace) is None:
+        return False
+    for earlier in earlier_contents:
+        if _replace_lines(earlier, edit.search, edit.search) is not None:
+            return not edit.replace.strip() or _replace_lines(earlier, edit.replace, edit.replace) is None
+    return False
+
+
+def apply_edits(repository: CodeRepository, edits: List[FileEdit]) -> PatchResult:
+    """
+    Apply edits to the latest version of the files of a repository, each changed file getting a new version.
+
+    An edit whose search lines are missing counts as already applied when an earlier version of the
+    file held its search lines but not its replacement, and the latest holds its replacement, so
+    re-applying a response does nothing. Any other edit whose search lines are missing fails.
+
+    Args:
+        repository (CodeRepository): The files to edit.
+        edits (List[FileEdit]): The edits, applied in order.
+
+    Returns:
+        PatchResult: The applied and failed edits and the updated files.
+    """
+    result = PatchResult()
+    contents = {}
+    for edit in edits:
+        code_file = repository.get(edit.path)
+        if code_file is None and edit.path not in contents:
+            if edit.search.strip():
+                result.failed.append(edit)
+                continue
+            contents[edit.path] = edit.replace
+            result.applied.append(edit)
+            continue
+
+        content = contents[edit.path] if edit.path in contents else code_file.content
+        new_content = _replace_lines(content, edit.search, edit.replace) if edit.search.strip() else None
+        if new_content is not None:
+            contents[edit.path] = new_content
+            result.applied.append(edit)
+        elif edit.search.strip() and _is_applied(edit, content, _earlier_contents(repository, edit.path, contents)):
+            result.applied.append(edit)
+        else:
+            result.failed.append(edit)
+
+    for path, content in contents.items():
+        code_file = repository.get(path)
+        if code_file is not None:
+            updated = repository.update(path, code_file.language, code_file.docstring, content)
+        else:
+            # A file created by an edit is written in the language of the other files
+            language = next(iter(repository)).language if len(repository) else path.rsplit(".", 1)[-1]
+            updated = repository.update(path, language, "", content)
+        if updated is not None:
+            result.updated.append(updated)
+    return result
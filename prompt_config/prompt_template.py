@@ -0,0 +1,141 @@
+import string
+from functools import lru_cache
+from typing import FrozenSet, Iterable, Mapping, Optional, Sequence
+
+_FORMATTER = string.Formatter()
+_CONVERSIONS = {"r": repr, "s": str, "a": ascii}
+
+
+class PromptTemplate:
+    """
+    The lines of a TaskConfig.json prompt compiled once into literal text and replacement fields.
+
+    Rendering joins the pieces in a single pass instead of calling str.format on every line, and
+    the referenced fields are known up front, so missing values are reported before rendering
+    and callers can tell whether a change of IntermediateVars affects the prompt.
+
+    Attributes:
+        source (str): The prompt lines joined with newlines.
+        fields (FrozenSet[str]): The names of the fields the prompt references, including the ones
+            nested in format specs, e.g. {"codes", "unimplemented_file"} for "{codes:{unimplemented_file}}".
+    """
+
+    def __init__(self, lines: Sequence[str]):
+        """
+        Compile a prompt.
+
+        Args:
+            lines (Sequence[str]): The lines of the prompt.
+
+        Raises:
+            ValueError: If a line is not a valid format string or references a field by position or attribute.
+        """
+        self.source = "\n".join(lines)
+        # (literal text, field name, format spec, conversion, whether the spec holds fields itself)
+        self._segments = []
+        fields = set()
+        for literal, field_name, format_spec, conversion in _FORMATTER.parse(self.source):
+            if field_name is None:
+                self._segments.append((literal, None, "", None, False))
+                continue
+            if not field_name.isidentifier():
+                raise ValueError(f"Unsupported prompt field '{{{field_name}}}', use a plain name")
+            nested_fields = {name for _, name, _, _ in _FORMATTER.parse(format_spec or "") if name}
+            fields.add(field_name)
+            fields.update(nested_fields)
+            self._segments.append((literal, field_name, format_spec or "", conversion, bool(nested_fields)))
+        self.fields: FrozenSet[str] = frozenset(fields)
+        self._field_order = tuple(sorted(fields))
+        # (key of the values, rendering) of the last render, replaced as a whole so threads never see half of it
+        self._last = (None, None)
+
+    def validate(self, available_fields: Iterable[str]) -> None:
+        """
+        Check that every field of the prompt can be provided.
+
+        Args:
+            available_fields (Iterable[str]): The names of the fields the caller provides.
+
+        Raises:
+            ValueError: If the prompt references other fields.
+        """
+        unknown = self.fields.difference(available_fields)
+        if unknown:
+            raise ValueError(f"Unknown prompt fields: {', '.join(sorted(unknown))}")
+
+    def render(self, values: Mapping[str, object]) -> str:
+        """
+        Render the prompt.
+
+        The last rendering is kept, so rendering again with the same values of the referenced fields
+        returns it without formatting anything. Values carrying a "revision", such as a CodeRepository,
+        are compared by identity and revision; other mutable values disable this.
+
+        Args:
+            values (Mapping[str, object]): The values of the fields, at least the ones in self.fields.
+
+        Returns:
+            str: The rendered prompt.
+
+        Raises:
+            KeyError: If values misses fields of the prompt.
+        """
+        missing = self.fields.difference(values)
+        if missing:
+            raise KeyError(f"Missing prompt fields: {', '.join(sorted(missing))}")
+
+        key = _get_render_key(self._field_order, values)
+        last_key, last_render = self._last
+        if key is not None and key == last_key:
+            return last_render
+
+        parts = []
+        for literal, field_name, format_spec, conversion, nested in self._segments:
+            parts.append(literal)
+            if field_name is None:
+                continue
+            value = values[field_name]
+            if conversion:
+                value = _CONVERSIONS[conversion](value)
+            if nested:
+                format_spec = format_spec.format_map(values)
+            parts.append(format(value, format_spec))
+        rendered = "".join(parts)
+
+        if key is not None:
+            self._last = (key, rendered)
+        return rendered
+
+
+def _get_render_key(field_order: tuple, values: Mapping[str, object]) -> Optional[tuple]:
+    key = []
+    for name in field_order:
+        value = values[name]
+        revision = getattr(value, "revision", None)
+        if revision is not None:
+            # The value itself is kept rather than its id, which could be reused by another object
+            key.append((name, value, revision))
+        elif value is None or isinstance(value, (str, int, float)):
+            key.append((name, value))
+        else:
+            # Other mutable values may change in place, so the rendering is not kept
+            return None
+    return tuple(key)
+
+
+@lru_cache(maxsize=None)
+def _compile(lines: tuple) -> PromptTemplate:
+    return PromptTemplate(lines)
+
+
+def get_prompt_template(lines: Sequence[str]) -> PromptTemplate:
+    """
+    Get the compiled template of prompt lines, compiling each distinct prompt once per process.
+
+    Args:
+        lines (Sequence[str]): The lines of the prompt.
+
+    Returns:
+        PromptTemplate: The shared template.
+    """
+    return _compile(tuple(lines))
@@ -1,92 +1,127 @@
-import json
-from typing import Optional
-from chat.message import Message
-
-
-class AgentMessageFormatter:
-    def __init__(self, agents_config_path: str):
-        self.agents_config_path = agents_config_path
-        self.load_agents_config()
-
-    def load_agents_config(self):
-        """
-        Load the agentsconfig file into a dictionary.
-        """
-        with open(self.agents_config_path, 'r') as config_file:
-            self.agents_config = json.load(config_file)
-
-    def format_message(self, agent_role: str, company_prompt: str, task: str) -> str:
-        """
-        Format and return a message based on agent's role, company prompt, and task.
-
-        Args:
-            agent_role (str): The role of the agent.
-            company_prompt (str): The company prompt.
-            task (str): The task description.
-
-        Returns:
-            str: The formatted message.
-        """
-        if agent_role in self.agents_config:
-            agent_info = self.agents_config[agent_role]
-            formatted_message = '\n'.join(agent_info).format(company_prompt=company_prompt, task=task)
-            return formatted_message
-        else:
-            return "Agent role not found in configuration"
-
-
-class SystemMessageFormatter(AgentMessageFormatter):
-    def __init__(self, agents_config_path: str):
-        super().__init__(agents_config_path)
-
-    def format_message(self, agent_role: str, company_prompt: str, task: str) -> str:
-        """
-        Format and return a system message based on agent's role, company prompt, and task.
-
-        Args:
-            agent_role (str): The role of the agent.
-            company_prompt (str): The company prompt.
-            task (str): The task description.
-
-        Returns:
-            str: The formatted system message.
-        """
-        message = Message()
-        message.system(super().format_message(agent_role, company_prompt, task))
-        return message
-
-
-# class TaskMessageFormatter(AgentMessageFormatter):
-#     def __init__(self, agents_config_path: str):
-#         super().__init__(agents_config_path)
-#
-#     def format_message(self, agent_role: str) -> str:
-#         """
-#         Format and return a system message based on agent's role, company prompt, and task.
-#
-#         Args:
-#             agent_role (str): The role of the agent.
-#             company_prompt (str): The company prompt.
-#             task (str): The task description.
-#
-#         Returns:
-#             str: The formatted system message.
-#         """
-#         message = Message()
-#         message.system(super().format_message(agent_role))
-#         return message
-
-
-if __name__ == "__main__":
-    # Define the path to the agentsconfig file
-    agents_config_path = 'agentsconfig.json'
-
-    # Create an instance of the SystemMessageFormatter
-    system_formatter = SystemMessageFormatter(agents_config_path)
-
-    # Example usage for generating a system message for an agent role
-    agent_role = "Chief Executive Officer"
-    company_prompt = "Welcome to ChatDev"
-    task = "Develop a new software feature"
-    system_message = system_formatter.format_message(agent_role, company_prompt, task)
-    print(system_message.messages)
+from functools import lru_cache
+from typing import Optional
+from chat.message import Message
+from utils.config_registry import get_config_registry, get_config_version
+
+# Rendered agent messages kept per process, shared by every formatter and every run of a batch worker
+AGENT_MESSAGE_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=AGENT_MESSAGE_CACHE_SIZE)
+def _render_agent_message(agents_config_path: str, config_version: tuple, agent_role: str, company_prompt: str,
+                          task: str) -> Optional[str]:
+    # config_version is the (mtime, size) of the file, so a changed file gets new renderings
+    agents_config = get_config_registry().get_agents_config(agents_config_path)
+    if agent_role not in agents_config:
+        return None
+    return '\n'.join(agents_config[agent_role]).format(company_prompt=company_prompt, task=task)
+
+
+@lru_cache(maxsize=AGENT_MESSAGE_CACHE_SIZE)
+def _render_system_message(agents_config_path: str, config_version: tuple, agent_role: str, company_prompt: str,
+                           task: str) -> Message:
+    message = Message()
+    message.system(_render_agent_message(agents_config_path, config_version, agent_role, company_prompt, task)
+                   or "Agent role not found in configuration")
+    return message
+
+
+class AgentMessageFormatter:
+    """
+    Renders the AgentsConfig.json prompt of a role.
+
+    Renderings are memoized on (config path, config mtime and size, role, company prompt, task) in a
+    bounded per-process cache, so editing AgentsConfig.json on disk invalidates them.
+    """
+
+    def __init__(self, agents_config_path: str):
+        self.agents_config_path = agents_config_path
+        self.load_agents_config()
+
+    def load_agents_config(self):
+        """
+        Load the agentsconfig file into a dictionary.
+        """
+        self.config_version = get_config_version(self.agents_config_path)
+        self.agents_config = get_config_registry().get_agents_config(self.agents_config_path)
+
+    def _refresh_config_version(self) -> tuple:
+        config_version = get_config_version(self.agents_config_path)
+        if config_version != self.config_version:
+            self.load_agents_config()
+        return self.config_version
+
+    def format_message(self, agent_role: str, company_prompt: str, task: str) -> str:
+        """
+        Format and return a message based on agent's role, company prompt, and task.
+
+        Args:
+            agent_role (str): The role of the agent.
+            company_prompt (str): The company prompt.
+            task (str): The task description.
+
+        Returns:
+            str: The formatted message.
+        """
+        formatted_message = _render_agent_message(self.agents_config_path, self._refresh_config_version(),
+                                                  agent_role, company_prompt, task)
+        if formatted_message is not None:
+            return formatted_message
+        else:
+            return "Agent role not found in configuration"
+
+
+class SystemMessageFormatter(AgentMessageFormatter):
+    def __init__(self, agents_config_path: str):
+        super().__init__(agents_config_path)
+
+    def format_message(self, agent_role: str, company_prompt: str, task: str) -> str:
+        """
+        Format and return a system message based on agent's role, company prompt, and task.
+
+        Args:
+            agent_role (str): The role of the agent.
+            company_prompt (str): The company prompt.
+            task (str): The task description.
+
+        Returns:
+            Message: A copy-on-write copy of the memoized system message, which appending to does not affect.
+        """
+        return _render_system_message(self.agents_config_path, self._refresh_config_version(),
+                                      agent_role, company_prompt, task).copy()
+
+
+# class TaskMessageFormatter(AgentMessageFormatter):
+#     def __init__(self, agents_config_path: str):
+#         super().__init__(agents_config_path)
+#
+#     def format_message(self, agent_role: str) -> str:
+#         """
+#         Format and return a system message based on agent's role, company prompt, and task.
+#
+#         Args:
+#             agent_role (str): The role of the agent.
+#             company_prompt (str): The company prompt.
+#             task (str): The task description.
+#
+#         Returns:
+#             str: The formatted system message.
+#         """
+#         message = Message()
+#         message.system(super().format_message(agent_role))
+#         return message
+
+
+if __name__ == "__main__":
+    # Define the path to the agentsconfig file
+    agents_config_path = 'agentsconfig.json'
+
+    # Create an instance of the SystemMessageFormatter
+    system_formatter = SystemMessageFormatter(agents_config_path)
+
+    # Example usage for generating a system message for an agent role
+    agent_role = "Chief Executive Officer"
+    company_prompt = "Welcome to ChatDev"
+    task = "Develop a new software feature"
+    system_message = system_formatter.format_message(agent_role, company_prompt, task)
+    print(system_message.messages)
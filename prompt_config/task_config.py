@@ -0,0 +1,210 @@
+from dataclasses import dataclass, fields, replace
+from typing import Dict, Optional, Tuple
+
+from llms.openai_llm import ChatGPTConfig
+from prompt_config.prompt_template import get_prompt_template
+from prompt_config.task_config_vars import IntermediateVars
+
+# Keys of a TaskConfig.json or TaskchainConfigs.json entry that override the model of a phase
+MODEL_OVERRIDE_KEYS = ("model", "chat_config", "roles")
+# Roles a "roles" override may name, and the keys each of them may override
+OVERRIDE_ROLES = ("assistant", "user")
+ROLE_OVERRIDE_KEYS = ("model", "chat_config")
+# Placeholders of each TaskConfig.json prompt besides {assistant_role} and the IntermediateVars fields
+PROMPT_EXTRA_FIELDS = {
+    "phase_prompt": (),
+    "file_plan_prompt": (),
+    "file_prompt": ("file_plan", "filename", "responsibility"),
+    "edit_retry_prompt": ("failed_edits", "files"),
+}
+# Keys a TaskConfig.json entry needs to be a phase
+REQUIRED_TASK_KEYS = ("assistant_role_name", "user_role_name", "phase_prompt")
+
+
+def _validate_chat_config(chat_config) -> None:
+    if not isinstance(chat_config, dict):
+        raise ValueError("chat_config must be an object of llmconfig.json fields")
+    unknown_keys = set(chat_config) - {var.name for var in fields(ChatGPTConfig)}
+    if unknown_keys:
+        raise ValueError(f"Unknown chat_config fields: {', '.join(sorted(unknown_keys))}")
+
+
+def validate_model_overrides(overrides: Dict) -> None:
+    """
+    Check the model overrides of a TaskConfig.json or TaskchainConfigs.json entry, so that a
+    misspelled key is reported when the configuration is loaded rather than in the middle of a phase.
+
+    Args:
+        overrides (Dict): The "model", "chat_config" and "roles" of the entry, None values being unset.
+
+    Raises:
+        ValueError: If a model is not a name, a chat_config holds other keys than the ChatGPTConfig
+            fields, or "roles" names another role than "assistant" and "user" or overrides other keys.
+    """
+    if overrides.get("model") is not None and not isinstance(overrides["model"], str):
+        raise ValueError("model must be a model name")
+    if overrides.get("chat_config") is not None:
+        _validate_chat_config(overrides["chat_config"])
+    roles = overrides.get("roles")
+    if roles is None:
+        return
+    if not isinstance(roles, dict):
+        raise ValueError("roles must map 'assistant' and 'user' to their overrides")
+    for role, role_config in roles.items():
+        if role not in OVERRIDE_ROLES:
+            raise ValueError(f"Unknown role '{role}' in roles, expected one of {', '.join(OVERRIDE_ROLES)}")
+        if not isinstance(role_config, dict):
+            raise ValueError(f"The overrides of role '{role}' must be an object")
+        unknown_keys = set(role_config) - set(ROLE_OVERRIDE_KEYS)
+        if unknown_keys:
+            raise ValueError(f"Unknown keys of role '{role}': {', '.join(sorted(unknown_keys))}")
+        try:
+            validate_model_overrides(role_config)
+        except ValueError as e:
+            raise ValueError(f"Role '{role}': {e}") from e
+
+
+@dataclass
+class TaskConfig:
+    """
+    The prompts of a phase and, optionally, the model serving it.
+
+    Attributes:
+        assistant_role_name (str): The role of the assistant agent.
+        user_role_name (str): The role of the user agent.
+        phase_prompt (list[str]): The lines of the phase prompt.
+        model (str, optional): The model of the phase, a ModelType/NvidiaModelType name or a model name.
+        chat_config (Dict, optional): ChatGPTConfig fields overriding llmconfig.json for the phase.
+        roles (Dict, optional): Per-role overrides, e.g. {"user": {"model": ..., "chat_config": {...}}}.
+        file_plan_prompt (list[str], optional): The lines of the prompt asking for the files of the
+            Coding phase, used by parallel coding.
+        file_prompt (list[str], optional): The lines of the prompt asking for a single file, with the
+            {file_plan}, {filename} and {responsibility} placeholders, used by parallel coding.
+        edit_retry_prompt (list[str], optional): The lines of the prompt re-asking for the edits of a
+            patch phase that could not be applied, with the {failed_edits} and {files} placeholders.
+    """
+    assistant_role_name: str
+    user_role_name: str
+    phase_prompt: list[str]
+    model: Optional[str] = None
+    chat_config: Optional[Dict] = None
+    roles: Optional[Dict[str, Dict]] = None
+    file_plan_prompt: Optional[list[str]] = None
+    file_prompt: Optional[list[str]] = None
+    edit_retry_prompt: Optional[list[str]] = None
+
+    def get_model_override(self, role):
+        """
+        Get the model and chat config overrides of a role, the role's own taking precedence.
+
+        Args:
+            role (str): "assistant" or "user".
+
+        Returns:
+            tuple: The model name, or None, and the chat config fields, possibly empty.
+        """
+        role_config = (self.roles or {}).get(role, {})
+        chat_config = dict(self.chat_config or {})
+        chat_config.update(role_config.get("chat_config") or {})
+        return role_config.get("model") or self.model, chat_config
+
+    def with_overrides(self, overrides):
+        """
+        Get a copy of the configuration with the model overrides of a TaskchainConfigs.json entry.
+
+        Args:
+            overrides (Dict): The "model", "chat_config" and "roles" of the entry.
+
+        Returns:
+            TaskConfig: The configuration with the overrides applied.
+
+        Raises:
+            ValueError: If the overrides are invalid, see validate_model_overrides.
+        """
+        validate_model_overrides(overrides)
+        return replace(self, **{key: overrides[key] for key in MODEL_OVERRIDE_KEYS if key in overrides})
+
+    def get_template(self, prompt_name="phase_prompt"):
+        """
+        Get a prompt of the phase compiled into a PromptTemplate, shared by every TaskConfig with the same lines.
+
+        Args:
+            prompt_name (str): The field of the prompt, e.g. "phase_prompt" or "file_prompt".
+
+        Returns:
+            PromptTemplate: The template, None if the phase has no such prompt.
+        """
+        lines = getattr(self, prompt_name)
+        return get_prompt_template(lines) if lines else None
+
+    def validate_prompts(self):
+        """
+        Compile every prompt of the phase and check that all of their placeholders can be filled.
+
+        Raises:
+            ValueError: If a prompt is malformed or references an unknown field.
+        """
+        available_fields = {var.name for var in fields(IntermediateVars)} | {"assistant_role"}
+        for prompt_name, extra_fields in PROMPT_EXTRA_FIELDS.items():
+            try:
+                template = self.get_template(prompt_name)
+                if template is not None:
+                    template.validate(available_fields | set(extra_fields))
+            except ValueError as e:
+                raise ValueError(f"{prompt_name}: {e}") from e
+
+    def validate_overrides(self):
+        """
+        Check the model overrides of the phase, see validate_model_overrides.
+
+        Raises:
+            ValueError: If the overrides are invalid.
+        """
+        validate_model_overrides({key: getattr(self, key) for key in MODEL_OVERRIDE_KEYS})
+
+    @classmethod
+    def from_dict(cls, task_data: Dict) -> "TaskConfig":
+        """
+        Create the configuration of a phase from its TaskConfig.json entry.
+
+        Args:
+            task_data (Dict): The entry, which must hold the keys of REQUIRED_TASK_KEYS.
+
+        Returns:
+            TaskConfig: The configuration, with its prompts not yet validated.
+        """
+        return cls(**{var.name: task_data.get(var.name) for var in fields(cls)})
+
+
+def parse_task_configs(config_data: Dict) -> Tuple[Dict[str, TaskConfig], Dict[str, str]]:
+    """
+    Parse and validate the phases of TaskConfig.json.
+
+    Entries missing a key of REQUIRED_TASK_KEYS are not phases and are ignored, phases whose prompts
+    cannot be rendered or whose model overrides are invalid are skipped.
+
+    Args:
+        config_data (Dict): The content of TaskConfig.json.
+
+    Returns:
+        Tuple[Dict[str, TaskConfig], Dict[str, str]]: The valid phases, and the error of each skipped phase.
+
+    Raises:
+        ValueError: If the content is not an object of phases.
+    """
+    if not isinstance(config_data, dict):
+        raise ValueError("TaskConfig.json must be an object mapping phase names to phases")
+    task_configs, errors = {}, {}
+    for task_name, task_data in config_data.items():
+        if not isinstance(task_data, dict) or not all(key in task_data for key in REQUIRED_TASK_KEYS):
+            continue
+        task_config = TaskConfig.from_dict(task_data)
+        # Prompts are compiled once here, a prompt that cannot be rendered is reported before the run
+        try:
+            task_config.validate_prompts()
+            task_config.validate_overrides()
+        except ValueError as e:
+            errors[task_name] = str(e)
+            continue
+        task_configs[task_name] = task_config
+    return task_configs, errors
@@ -1,47 +1,66 @@
-from dataclasses import dataclass
-from typing import List, Optional
-
-# DemandAnalysis ->modality -> <INFO> PowerPoint
-# LanguageChoose-> language -> <INFO> Python
-# Coding -> codes ->       "FILENAME",
-#       "```LANGUAGE",
-#       "'''",
-#       "DOCSTRING",
-#       "'''",
-#       "CODE",
-#       "```",
-# ArtDesign -> images ->
-# "button_1.png: The button with the number \"1\" on it.",
-# "button_multiply.png: The button with the multiplication symbol (\"*\") on it.
-# ArtIntegration -> gui ->
-# "FILENAME",
-# "```LANGUAGE",
-# "'''",
-# "DOCSTRING",
-# "'''",
-# "CODE",
-# "```",
-# CodeComplete -> unimplemented_file
-# CodeReviewComment -> comments
-# CodeReviewModification
-# test_reports
-# TestErrorSummary -> error_summary
-# TestModification ->
-# EnvironmentDoc ->
-
-
-
-@dataclass
-class IntermediateVars:
-    task: Optional[str] = None
-    modality: Optional[str] = None
-    language: Optional[str] = None
-    ideas: Optional[str] = None
-    gui: Optional[str] = None
-    codes: Optional[str] = None
-    unimplemented_file: Optional[str] = None
-    images: Optional[str] = None
-    comments: Optional[str] = None
-    test_reports: Optional[str] = None
-    error_summary: Optional[str] = None
-    requirements: Optional[str] = None
+from dataclasses import dataclass
+from typing import List, Optional, Union
+
+from postprocess.code_repository import CodeRepository
+
+# DemandAnalysis ->modality -> <INFO> PowerPoint
+# LanguageChoose-> language -> <INFO> Python
+# Coding -> codes ->       "FILENAME",
+#       "```LANGUAGE",
+#       "'''",
+#       "DOCSTRING",
+#       "'''",
+#       "CODE",
+#       "```",
+# ArtDesign -> images ->
+# "button_1.png: The button with the number \"1\" on it.",
+# "button_multiply.png: The button with the multiplication symbol (\"*\") on it.
+# ArtIntegration -> gui ->
+# "FILENAME",
+# "```LANGUAGE",
+# "'''",
+# "DOCSTRING",
+# "'''",
+# "CODE",
+# "```",
+# CodeComplete -> unimplemented_file
+# CodeReviewComment -> comments
+# CodeReviewModification
+# test_reports
+# TestErrorSummary -> error_summary
+# TestModification ->
+# EnvironmentDoc ->
+
+
+
+@dataclass
+class IntermediateVars:
+    task: Optional[str] = None
+    modality: Optional[str] = None
+    language: Optional[str] = None
+    ideas: Optional[str] = None
+    gui: Optional[str] = None
+    # The files of the run; a str in checkpoints written before the CodeRepository
+    codes: Optional[Union[CodeRepository, str]] = None
+    unimplemented_file: Optional[str] = None
+    images: Optional[str] = None
+    comments: Optional[str] = None
+    test_reports: Optional[str] = None
+    error_summary: Optional[str] = None
+    requirements: Optional[str] = None
+
+
+# IntermediateVars fields written by each phase once its output is parsed
+PHASE_OUTPUT_VARS = {
+    "DemandAnalysis": {"modality"},
+    "LanguageChoose": {"language"},
+    "Coding": {"codes"},
+    "ArtDesign": {"images"},
+    "ArtIntegration": {"codes"},
+    "CodeComplete": {"codes", "unimplemented_file"},
+    "CodeReviewComment": {"comments"},
+    "CodeReviewModification": {"codes"},
+    "TestErrorSummary": {"error_summary", "test_reports"},
+    "TestModification": {"codes"},
+    "EnvironmentDoc": {"requirements"},
+}
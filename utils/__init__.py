@@ -1,9 +1,17 @@
-# utils/__init__.py.py
-
-from . import file_utils
-from . import argparse_utils
-from . import config_utils
-from . import logging_utils
-from . import api_key_check
-
-__all__ = ['file_utils', 'argparse_utils', 'config_utils', 'logging_utils', 'api_key_check']
+# utils/__init__.py.py
+
+import importlib
+
+# Submodules are imported on first access, so importing one of them does not import the others and their
+# dependencies, e.g. colorlog for logging_utils
+__all__ = ['file_utils', 'argparse_utils', 'config_utils', 'logging_utils', 'api_key_check']
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,69 +1,204 @@
-import argparse
-from llms.openai_model import ModelType, model_type
-from llms.nvidia_model import NvidiaModelType, nvidia_model_type
-
-def parse_arguments() -> argparse.Namespace:
-    """
-    Parse command-line arguments.
-
-    Returns:
-        argparse.Namespace: An object containing the parsed arguments.
-    """
-    parser = argparse.ArgumentParser(description="Your App Description")
-
-    parser.add_argument(
-        "--app_desc",
-        type=str,
-        required=True,
-        help="A string description for your app",
-    )
-
-    parser.add_argument(
-        "--app_name",
-        type=str,
-        required=True,
-        help="Name of your app",
-    )
-
-    parser.add_argument(
-        "--model",
-        type=str,
-        required=True,
-        help="Choose a model from available options",
-    )
-
-    parser.add_argument(
-        "--openai",
-        action="store_true",
-        help="Use OpenAI model",
-    )
-
-    parser.add_argument(
-        "--nvidia",
-        action="store_true",
-        help="Use Nvidia model",
-    )
-
-    parser.add_argument(
-        "--debug",
-        action="store_true",
-        help="Enable debug logging",
-    )
-
-    args = parser.parse_args()
-
-    # Check if both --openai and --nvidia flags are provided
-    if args.openai and args.nvidia:
-        raise ValueError("Both --openai and --nvidia flags cannot be provided simultaneously")
-
-    # Check if either --openai or --nvidia flag is provided
-    if not args.openai and not args.nvidia:
-        raise ValueError("Either --openai or --nvidia flag must be provided")
-
-    # Extract the enum value from the model argument based on the flag
-    if args.openai:
-        args.model = model_type(args.model).value
-    elif args.nvidia:
-        args.model = nvidia_model_type(args.model).value
-
-    return args
+import argparse
+import os
+from llms.openai_model import ModelType, model_type
+from llms.nvidia_model import NvidiaModelType, nvidia_model_type
+
+def resolve_model(model: str, openai: bool, nvidia: bool) -> str:
+    """
+    Resolve a model type name to the actual model name of the selected backend.
+
+    Args:
+        model (str): The model type name, e.g. "GPT_4".
+        openai (bool): Whether the OpenAI backend is selected.
+        nvidia (bool): Whether the Nvidia backend is selected.
+
+    Returns:
+        str: The actual model name.
+    """
+    if openai:
+        return model_type(model).value
+    if nvidia:
+        return nvidia_model_type(model).value
+    raise ValueError("Either --openai or --nvidia flag must be provided")
+
+
+def resolve_fallback_model(model: str, openai: bool, nvidia: bool) -> str:
+    """
+    Resolve the model type name of the fallback model. With both backends selected the
+    fallback model is served by Nvidia, otherwise by the selected backend.
+
+    Args:
+        model (str): The model type name, e.g. "LLAMA3_70B_INSTRUCT".
+        openai (bool): Whether the OpenAI backend is selected.
+        nvidia (bool): Whether the Nvidia backend is selected.
+
+    Returns:
+        str: The actual model name.
+    """
+    return resolve_model(model, openai and not nvidia, nvidia)
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command-line arguments.
+
+    Returns:
+        argparse.Namespace: An object containing the parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Your App Description")
+
+    parser.add_argument(
+        "--app_desc",
+        type=str,
+        help="A string description for your app",
+    )
+
+    parser.add_argument(
+        "--app_name",
+        type=str,
+        help="Name of your app",
+    )
+
+    parser.add_argument(
+        "--model",
+        type=str,
+        help="Choose a model from available options",
+    )
+
+    parser.add_argument(
+        "--openai",
+        action="store_true",
+        help="Use OpenAI model",
+    )
+
+    parser.add_argument(
+        "--nvidia",
+        action="store_true",
+        help="Use Nvidia model",
+    )
+
+    parser.add_argument(
+        "--fallback_model",
+        type=str,
+        help="Model requests fail over to when the main model errors or slows down; with both --openai "
+             "and --nvidia it is an Nvidia model",
+    )
+
+    parser.add_argument(
+        "--hedge",
+        action="store_true",
+        help="Send a duplicate request to the fallback model (or the same model) when a request is slower "
+             "than usual, and keep the first response",
+    )
+
+    parser.add_argument(
+        "--parallel_coding",
+        action="store_true",
+        help="Plan the files of the Coding phase first, then generate each file in its own concurrent request",
+    )
+
+    parser.add_argument(
+        "--debug",
+        action="store_true",
+        help="Enable debug logging",
+    )
+
+    parser.add_argument(
+        "--console_max_chars",
+        type=int,
+        help="Characters of a log message shown on the console, longer messages such as full responses are "
+             "elided in the middle (default: 2000, 0 shows whole messages; the log files keep them whole)",
+    )
+
+    parser.add_argument(
+        "--batch",
+        type=str,
+        help="Path to a JSONL file with one job per line, e.g. {\"app_name\": ..., \"app_desc\": ...}",
+    )
+
+    parser.add_argument(
+        "--batch_output",
+        type=str,
+        help="Path to the JSONL file receiving one status line per job (default: <batch>.results.jsonl)",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of worker processes used in batch mode",
+    )
+
+    parser.add_argument(
+        "--resume",
+        type=str,
+        help="Path to the output directory of an interrupted run to continue from its last checkpoint",
+    )
+
+    parser.add_argument(
+        "--cache_path",
+        type=str,
+        default=os.path.join("outputs", "cache", "llm_responses.sqlite3"),
+        help="Path to the on-disk LLM response cache shared by runs and batch workers",
+    )
+
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Bypass the LLM response cache for this run",
+    )
+
+    parser.add_argument(
+        "--record",
+        type=str,
+        help="Path to a JSONL transcript receiving every request/response pair of the run",
+    )
+
+    parser.add_argument(
+        "--replay",
+        type=str,
+        help="Path to a transcript written by --record whose responses are served instead of a live backend",
+    )
+
+    parser.add_argument(
+        "--check_config",
+        action="store_true",
+        help="Validate the configuration files in configs/ and exit",
+    )
+
+    args = parser.parse_args()
+
+    # Validating the configuration needs no app, model or backend
+    if args.check_config:
+        return args
+
+    # A resumed run defaults to the model and backends recorded in its checkpoint
+    if not args.model and not args.resume:
+        parser.error("--model is required unless --resume is provided")
+    if args.resume and (args.model or args.fallback_model) and not (args.openai or args.nvidia or args.replay):
+        parser.error("--model and --fallback_model need --openai or --nvidia to be resolved")
+
+    # --app_desc and --app_name are only optional in batch mode or when resuming a run
+    if not args.batch and not args.resume and (not args.app_desc or not args.app_name):
+        parser.error("--app_desc and --app_name are required unless --batch or --resume is provided")
+
+    # Both backends are only used together by routing between them
+    if args.openai and args.nvidia and not args.fallback_model:
+        raise ValueError("--fallback_model is required when both --openai and --nvidia flags are provided")
+
+    # Check if either --openai or --nvidia flag is provided, a replayed run needs no backend
+    if not args.openai and not args.nvidia and not args.replay and not args.resume:
+        raise ValueError("Either --openai or --nvidia flag must be provided")
+
+    if args.no_cache:
+        args.cache_path = None
+
+    # Extract the enum value from the model argument based on the flag, a resumed run without --model
+    # keeps None so that the model of its checkpoint is used
+    if args.openai or args.nvidia:
+        if args.model:
+            args.model = resolve_model(args.model, args.openai, args.nvidia)
+        if args.fallback_model:
+            args.fallback_model = resolve_fallback_model(args.fallback_model, args.openai, args.nvidia)
+
+    return args
@@ -0,0 +1,300 @@
+import json
+import os
+import pickle
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from llms.openai_llm import ChatGPTConfig
+from prompt_config.prompt_template import get_prompt_template
+from prompt_config.task_config import MODEL_OVERRIDE_KEYS, TaskConfig, parse_task_configs, validate_model_overrides
+from utils.config_utils import get_config_paths
+
+# Format of the bundles written by ConfigRegistry.save_bundle, bumped whenever the cached objects change
+CONFIG_BUNDLE_FORMAT = 1
+# Placeholders of an AgentsConfig.json prompt
+AGENT_PROMPT_FIELDS = ("company_prompt", "task")
+
+
+@dataclass(frozen=True)
+class _ConfigEntry:
+    # (mtime in ns, size) of the file the value was parsed from
+    version: Tuple[int, int]
+    value: object
+
+
+def get_config_version(path: str) -> Tuple[int, int]:
+    """
+    Get the version of a configuration file, which changes whenever the file is written.
+
+    Args:
+        path (str): The path to the file.
+
+    Returns:
+        Tuple[int, int]: The modification time in nanoseconds and the size of the file.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+    """
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def parse_agents_config(config_data: Dict) -> Dict[str, List[str]]:
+    """
+    Validate AgentsConfig.json, which maps each role to the lines of its system prompt.
+
+    Raises:
+        ValueError: If a role has no list of lines or its prompt uses other placeholders than
+            {company_prompt} and {task}.
+    """
+    if not isinstance(config_data, dict):
+        raise ValueError("AgentsConfig.json must be an object mapping roles to prompt lines")
+    for role, lines in config_data.items():
+        if not isinstance(lines, list) or not all(isinstance(line, str) for line in lines):
+            raise ValueError(f"The prompt of role '{role}' must be a list of lines")
+        try:
+            get_prompt_template(lines).validate(AGENT_PROMPT_FIELDS)
+        except ValueError as e:
+            raise ValueError(f"The prompt of role '{role}': {e}") from e
+    return config_data
+
+
+def parse_taskchain_config(config_data: Dict) -> Dict:
+    """
+    Validate TaskchainConfigs.json, whose "chain" lists the phases to run.
+
+    Raises:
+        ValueError: If the chain is missing, one of its entries names no phase or has invalid model
+            overrides, see validate_model_overrides.
+    """
+    if not isinstance(config_data, dict) or not isinstance(config_data.get("chain"), list):
+        raise ValueError("TaskchainConfigs.json must hold a 'chain' list")
+    entries = list(config_data["chain"])
+    while entries:
+        entry = entries.pop()
+        if not isinstance(entry, dict) or not isinstance(entry.get("phase"), str):
+            raise ValueError(f"Invalid TaskchainConfigs.json entry {entry!r}: no 'phase'")
+        try:
+            validate_model_overrides({key: entry[key] for key in MODEL_OVERRIDE_KEYS if key in entry})
+        except ValueError as e:
+            raise ValueError(f"The overrides of {entry['phase']}: {e}") from e
+        if entry.get("phaseType") == "ComposedPhase":
+            if not isinstance(entry.get("Composition", []), list):
+                raise ValueError(f"The 'Composition' of {entry['phase']} must be a list")
+            entries.extend(entry.get("Composition", []))
+    return config_data
+
+
+def parse_chat_config(config_data: Dict) -> ChatGPTConfig:
+    """
+    Validate llmconfig.json, the ChatGPTConfig fields of every chat bot.
+
+    Raises:
+        ValueError: If the file holds other keys than the ChatGPTConfig fields.
+    """
+    if not isinstance(config_data, dict):
+        raise ValueError("llmconfig.json must be an object of ChatGPTConfig fields")
+    try:
+        return ChatGPTConfig(**config_data)
+    except TypeError as e:
+        raise ValueError(f"Invalid llmconfig.json: {e}") from e
+
+
+class ConfigRegistry:
+    """
+    Process-wide cache of the parsed and validated configuration files.
+
+    AgentsConfig.json, TaskConfig.json, TaskchainConfigs.json and llmconfig.json are each read and
+    validated once; later lookups only stat the file and return the cached object until its
+    modification time or size changes. The cached objects are shared by every caller and must not be
+    modified.
+
+    A batch parent saves the parsed files into a bundle that its workers load with a single read, see
+    save_bundle and load_bundle.
+    """
+
+    def __init__(self, config_paths: Optional[tuple] = None):
+        """
+        Initialize the ConfigRegistry.
+
+        Args:
+            config_paths (tuple, optional): The paths returned by get_config_paths, by default its result.
+        """
+        (self.agents_config_path, self.llm_config_path, self.taskchain_config_path, self.task_config_path,
+         self.env_path) = config_paths or get_config_paths()
+        # (kind, absolute path) -> entry
+        self._entries: Dict[Tuple[str, str], _ConfigEntry] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind: str, path: str, parse: Callable[[Dict], object]):
+        path = os.path.abspath(path)
+        # Stat before reading, so a file written while it is read is read again on the next lookup
+        version = get_config_version(path)
+        entry = self._entries.get((kind, path))
+        if entry is not None and entry.version == version:
+            return entry.value
+
+        with open(path, "r", encoding="utf-8") as config_file:
+            try:
+                config_data = json.load(config_file)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON in {os.path.basename(path)}: {e}") from e
+        value = parse(config_data)
+        with self._lock:
+            self._entries[(kind, path)] = _ConfigEntry(version, value)
+        return value
+
+    def get_agents_config(self, path: Optional[str] = None) -> Dict[str, List[str]]:
+        """
+        Get AgentsConfig.json, the lines of the system prompt of each role.
+
+        Args:
+            path (str, optional): The path to the file, the one of get_config_paths by default.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+            ValueError: If the file is invalid.
+        """
+        return self._get("agents", path or self.agents_config_path, parse_agents_config)
+
+    def get_task_configs(self, path: Optional[str] = None) -> Tuple[Dict[str, TaskConfig], Dict[str, str]]:
+        """
+        Get the phases of TaskConfig.json.
+
+        Args:
+            path (str, optional): The path to the file, the one of get_config_paths by default.
+
+        Returns:
+            Tuple[Dict[str, TaskConfig], Dict[str, str]]: A new dict of the valid phases, and the error of
+            each phase that was skipped because its prompts cannot be rendered.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+            ValueError: If the file is invalid.
+        """
+        task_configs, errors = self._get("task", path or self.task_config_path, parse_task_configs)
+        return dict(task_configs), errors
+
+    def get_taskchain_config(self, path: Optional[str] = None) -> Dict:
+        """
+        Get TaskchainConfigs.json.
+
+        Args:
+            path (str, optional): The path to the file, the one of get_config_paths by default.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+            ValueError: If the file is invalid.
+        """
+        return self._get("taskchain", path or self.taskchain_config_path, parse_taskchain_config)
+
+    def get_chat_config(self, path: Optional[str] = None) -> ChatGPTConfig:
+        """
+        Get llmconfig.json, the chat config of every chat bot.
+
+        Args:
+            path (str, optional): The path to the file, the one of get_config_paths by default.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+            ValueError: If the file is invalid.
+        """
+        return self._get("llm", path or self.llm_config_path, parse_chat_config)
+
+    def preload(self) -> Dict[str, str]:
+        """
+        Load and validate every configuration file, so that a broken one is reported before a run starts.
+
+        Returns:
+            Dict[str, str]: The error of each file that could not be loaded, and of each TaskConfig.json
+            phase that is skipped, e.g. "TaskConfig.json[Coding]", empty if all are valid.
+        """
+        errors = {}
+        for name, get_config in (("AgentsConfig.json", self.get_agents_config),
+                                 ("TaskConfig.json", self.get_task_configs),
+                                 ("TaskchainConfigs.json", self.get_taskchain_config),
+                                 ("llmconfig.json", self.get_chat_config)):
+            try:
+                config = get_config()
+            except (OSError, ValueError) as e:
+                errors[name] = str(e)
+                continue
+            if name == "TaskConfig.json":
+                errors.update((f"{name}[{task_name}]", error) for task_name, error in config[1].items())
+        return errors
+
+    def save_bundle(self, bundle_path: str) -> Dict[str, str]:
+        """
+        Load every configuration file and save the parsed objects to a bundle.
+
+        The bundle is a pickle, it must only be loaded by processes trusting its writer, e.g. the
+        workers of the batch that wrote it.
+
+        Args:
+            bundle_path (str): The path to the bundle, replaced atomically.
+
+        Returns:
+            Dict[str, str]: The error of each file left out of the bundle, see preload.
+        """
+        errors = self.preload()
+        with self._lock:
+            bundle = {"format": CONFIG_BUNDLE_FORMAT, "entries": dict(self._entries)}
+        os.makedirs(os.path.dirname(os.path.abspath(bundle_path)), exist_ok=True)
+        temp_path = f"{bundle_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as bundle_file:
+            pickle.dump(bundle, bundle_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, bundle_path)
+        return errors
+
+    def load_bundle(self, bundle_path: str) -> int:
+        """
+        Load the parsed configuration files of a bundle written by save_bundle.
+
+        Entries whose file changed since the bundle was written are dropped and read again on their
+        next lookup.
+
+        Args:
+            bundle_path (str): The path to the bundle.
+
+        Returns:
+            int: The number of configuration files taken from the bundle, 0 if the bundle is missing or
+            has another format.
+        """
+        try:
+            with open(bundle_path, "rb") as bundle_file:
+                bundle = pickle.load(bundle_file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return 0
+        if not isinstance(bundle, dict) or bundle.get("format") != CONFIG_BUNDLE_FORMAT:
+            return 0
+
+        loaded = 0
+        for (kind, path), entry in bundle["entries"].items():
+            try:
+                current = entry.version == get_config_version(path)
+            except OSError:
+                current = False
+            if current:
+                with self._lock:
+                    self._entries[(kind, path)] = entry
+                loaded += 1
+        return loaded
+
+
+_registry: Optional[ConfigRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_config_registry() -> ConfigRegistry:
+    """
+    Get the config registry of the process, created on first use with the paths of get_config_paths.
+
+    Returns:
+        ConfigRegistry: The shared registry.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ConfigRegistry()
+        return _registry
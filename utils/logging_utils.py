@@ -1,105 +1,230 @@
-import logging
-import os
-from datetime import datetime
-from pathlib import Path
-from colorlog import ColoredFormatter
-
-
-def setup_logger(log_folder: Path, app_name: str, log_level: int = logging.INFO) -> logging.Logger:
-    """
-    Set up a logger for the application.
-
-    Args:
-        log_folder (Path): The path to the folder where log files will be stored.
-        app_name (str): The name of the application.
-        log_level (int): The log level for the logger.
-
-    Returns:
-        logging.Logger: The configured logger.
-    """
-
-    # Generate a unique log file name based on app_name and timestamp
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    log_file = os.path.join(log_folder, f"{app_name}_{timestamp}.log")
-
-    logger = logging.getLogger(app_name)
-    logger.setLevel(log_level)
-
-    # Create a file handler to log messages to the file
-    file_handler = logging.FileHandler(log_file)
-    file_handler.setLevel(log_level)
-
-    # Create a console handler to log messages to the console
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(log_level)
-
-    # Define a formatter for log messages
-    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s")
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
-
-    # Add the handlers to the logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-
-    # Log the initial timestamp
-    logger.info("Logging started at %s.", timestamp)
-
-    return logger
-
-
-def setup_colored_logger(log_folder: Path, app_name: str, log_level: int = logging.INFO) -> logging.Logger:
-    """
-    Set up a logger for the application with colored output.
-
-    Args:
-        log_folder (Path): The path to the folder where log files will be stored.
-        app_name (str): The name of the application.
-        log_level (int): The log level for the logger.
-
-    Returns:
-        logging.Logger: The configured logger.
-    """
-
-    # Generate a unique log file name based on app_name and timestamp
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    log_file = os.path.join(log_folder, f"{app_name}_{timestamp}.log")
-
-    logger = logging.getLogger(app_name)
-    logger.setLevel(log_level)
-
-    # Create a file handler to log messages to the file
-    file_handler = logging.FileHandler(log_file)
-    file_handler.setLevel(log_level)
-
-    # Create a console handler to log messages to the console
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(log_level)
-
-    # Define a formatter for log messages with colors
-    formatter = ColoredFormatter(
-        "%(log_color)s%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s",
-        datefmt=None,
-        reset=True,
-        log_colors={
-            'DEBUG':    'cyan',
-            'INFO':     'green',
-            'WARNING':  'yellow',
-            'ERROR':    'red',
-            'CRITICAL': 'red,bg_white',
-        },
-        secondary_log_colors={},
-        style='%'
-    )
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
-
-    # Add the handlers to the logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-
-    # Log the initial timestamp
-    logger.info("Logging started at %s.", timestamp)
-
-    return logger
-
+import copy
+import json
+import logging
+import os
+import queue
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Optional
+from colorlog import ColoredFormatter
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s"
+# Size at which the .log and .jsonl files of a run are rotated, and the number of rotated files kept
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+# Characters of a message shown on the console, longer messages are elided in the middle, 0 shows all
+CONSOLE_MAX_CHARS = 2000
+# Attributes of every LogRecord, the other ones were passed in `extra` and are written to the JSONL sink
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", logging.INFO, "", 0, "", None, None))) | {
+    "message", "asctime", "taskName",
+}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Formats a record as a single-line JSON object for machine consumption, without colors.
+
+    The object holds the time, level, logger, file, line and message of the record, its exception if
+    any, and the fields passed in `extra`, e.g. logger.info(response, extra={"phase": "Coding"}).
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "file": record.filename,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            event["exception"] = record.exc_text
+        event.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+class ElidingFormatter(logging.Formatter):
+    """
+    Wraps a formatter, eliding the middle of messages longer than max_chars, e.g. full LLM responses
+    on the console. The files of the run keep the whole messages.
+    """
+
+    def __init__(self, formatter: logging.Formatter, max_chars: int):
+        super().__init__()
+        self.formatter = formatter
+        self.max_chars = max_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        if self.max_chars and len(message) > self.max_chars:
+            # The record is shared with the other handlers of the listener
+            record = copy.copy(record)
+            head = self.max_chars // 2
+            record.msg = (f"{message[:head]} ... [{len(message) - self.max_chars} characters elided] ... "
+                          f"{message[len(message) - (self.max_chars - head):]}")
+            record.args = None
+        return self.formatter.format(record)
+
+
+class _SnapshotQueueHandler(QueueHandler):
+    # Unlike QueueHandler.prepare, the message is not formatted into the record, so that every handler of the
+    # listener applies its own format. The arguments are merged right away since they may change before
+    # the listener handles the record, and the exception is rendered so that its frames are released.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _attach_queued_handlers(logger: logging.Logger, *handlers: logging.Handler) -> None:
+    """
+    Attach handlers to a logger behind a queue, so that logging never blocks on disk or terminal I/O:
+    the logger only enqueues records and a QueueListener thread hands them to the handlers.
+    """
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    queue_handler = _SnapshotQueueHandler(log_queue)
+    # Kept on the handler, where teardown_logger finds it
+    queue_handler.listener = listener
+    listener.start()
+    logger.addHandler(queue_handler)
+
+
+def _create_file_handlers(log_file: str, log_level: int, max_bytes: int, backup_count: int) -> tuple:
+    """
+    Create the rotating plain-text and JSONL file handlers of a log file.
+    """
+    file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    file_handler.setLevel(log_level)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    jsonl_handler = RotatingFileHandler(f"{os.path.splitext(log_file)[0]}.jsonl", maxBytes=max_bytes,
+                                        backupCount=backup_count, encoding="utf-8")
+    jsonl_handler.setLevel(log_level)
+    jsonl_handler.setFormatter(JsonLinesFormatter())
+    return file_handler, jsonl_handler
+
+
+def setup_logger(log_folder: Path, app_name: str, log_level: int = logging.INFO,
+                 max_bytes: int = LOG_MAX_BYTES, backup_count: int = LOG_BACKUP_COUNT,
+                 console_max_chars: Optional[int] = CONSOLE_MAX_CHARS) -> logging.Logger:
+    """
+    Set up a logger for the application, writing a .log file, a .jsonl file and the console
+    from a background thread.
+
+    Args:
+        log_folder (Path): The path to the folder where log files will be stored.
+        app_name (str): The name of the application.
+        log_level (int): The log level for the logger.
+        max_bytes (int): The size at which the log files are rotated.
+        backup_count (int): The number of rotated log files kept.
+        console_max_chars (int, optional): The characters of a message shown on the console, None or 0 for all.
+
+    Returns:
+        logging.Logger: The configured logger, to be released with teardown_logger.
+    """
+
+    # Generate a unique log file name based on app_name and timestamp
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    log_file = os.path.join(log_folder, f"{app_name}_{timestamp}.log")
+
+    logger = logging.getLogger(app_name)
+    logger.setLevel(log_level)
+
+    # Create the rotating handlers of the plain-text and JSONL log files
+    file_handler, jsonl_handler = _create_file_handlers(log_file, log_level, max_bytes, backup_count)
+
+    # Create a console handler to log messages to the console
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(log_level)
+    console_handler.setFormatter(ElidingFormatter(logging.Formatter(LOG_FORMAT), console_max_chars))
+
+    # Add the handlers to the logger behind a queue
+    _attach_queued_handlers(logger, file_handler, jsonl_handler, console_handler)
+
+    # Log the initial timestamp
+    logger.info("Logging started at %s.", timestamp)
+
+    return logger
+
+
+def setup_colored_logger(log_folder: Path, app_name: str, log_level: int = logging.INFO,
+                         max_bytes: int = LOG_MAX_BYTES, backup_count: int = LOG_BACKUP_COUNT,
+                         console_max_chars: Optional[int] = CONSOLE_MAX_CHARS) -> logging.Logger:
+    """
+    Set up a logger for the application with colored console output, see setup_logger.
+
+    Args:
+        log_folder (Path): The path to the folder where log files will be stored.
+        app_name (str): The name of the application.
+        log_level (int): The log level for the logger.
+        max_bytes (int): The size at which the log files are rotated.
+        backup_count (int): The number of rotated log files kept.
+        console_max_chars (int, optional): The characters of a message shown on the console, None or 0 for all.
+
+    Returns:
+        logging.Logger: The configured logger, to be released with teardown_logger.
+    """
+
+    # Generate a unique log file name based on app_name and timestamp
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    log_file = os.path.join(log_folder, f"{app_name}_{timestamp}.log")
+
+    logger = logging.getLogger(app_name)
+    logger.setLevel(log_level)
+
+    # Create the rotating handlers of the plain-text and JSONL log files, which get no color codes
+    file_handler, jsonl_handler = _create_file_handlers(log_file, log_level, max_bytes, backup_count)
+
+    # Create a console handler to log messages to the console
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(log_level)
+
+    # Define a formatter for console messages with colors
+    formatter = ColoredFormatter(
+        "%(log_color)s" + LOG_FORMAT,
+        datefmt=None,
+        reset=True,
+        log_colors={
+            'DEBUG':    'cyan',
+            'INFO':     'green',
+            'WARNING':  'yellow',
+            'ERROR':    'red',
+            'CRITICAL': 'red,bg_white',
+        },
+        secondary_log_colors={},
+        style='%'
+    )
+    console_handler.setFormatter(ElidingFormatter(formatter, console_max_chars))
+
+    # Add the handlers to the logger behind a queue
+    _attach_queued_handlers(logger, file_handler, jsonl_handler, console_handler)
+
+    # Log the initial timestamp
+    logger.info("Logging started at %s.", timestamp)
+
+    return logger
+
+
+def teardown_logger(logger: logging.Logger) -> None:
+    """
+    Flush, close and detach every handler of a logger, first writing the records still queued.
+
+    Args:
+        logger (logging.Logger): The logger to tear down.
+    """
+    for handler in list(logger.handlers):
+        listener = getattr(handler, "listener", None)
+        if listener is not None:
+            listener.stop()
+            for queued_handler in listener.handlers:
+                queued_handler.close()
+        handler.close()
+        logger.removeHandler(handler)
@@ -0,0 +1,293 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+# Labels (and the recorder) of the LLM calls made in the current thread or asyncio task
+_metrics_labels: ContextVar[Dict] = ContextVar("metrics_labels", default={})
+# The call currently being measured, so retry hooks and backends can annotate it
+_current_call: ContextVar[Optional["CallMetrics"]] = ContextVar("current_call", default=None)
+# perf_counter value at the start of the call being measured
+_call_started: ContextVar[float] = ContextVar("call_started", default=0.0)
+
+
+@dataclass
+class CallMetrics:
+    """
+    Measurements of a single LLM call.
+
+    Attributes:
+        phase (str): The phase key of the call, e.g. "Coding".
+        turn (int): The exchange index within the phase.
+        role (str): "assistant" or "user", the agent whose reply was requested.
+        provider (str): The provider name, e.g. "openai".
+        model (str): The model name.
+        request_tokens (int): Tokens sent, None if unknown.
+        response_tokens (int): Tokens received, None if unknown.
+        ttfb_s (float): Seconds until the first byte of the response.
+        ttft_s (float): Seconds until the first streamed token, None for non-streamed calls.
+        latency_s (float): Seconds until the whole response was received.
+        retries (int): Number of retried attempts.
+        cache_hit (bool): Whether the response came from the response cache.
+        error (bool): Whether the call returned an error.
+    """
+    phase: Optional[str] = None
+    turn: Optional[int] = None
+    role: Optional[str] = None
+    provider: Optional[str] = None
+    model: Optional[str] = None
+    request_tokens: Optional[int] = None
+    response_tokens: Optional[int] = None
+    ttfb_s: Optional[float] = None
+    ttft_s: Optional[float] = None
+    latency_s: float = 0.0
+    retries: int = 0
+    cache_hit: bool = False
+    error: bool = False
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * pct / 100)))]
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRecorder:
+    """
+    Collects the CallMetrics of a run and exports them as JSON or Prometheus text.
+    """
+
+    def __init__(self):
+        self._calls: List[CallMetrics] = []
+        self._lock = threading.Lock()
+
+    def record(self, call: CallMetrics) -> None:
+        """
+        Add the measurements of a finished call.
+
+        Args:
+            call (CallMetrics): The measurements.
+        """
+        with self._lock:
+            self._calls.append(call)
+
+    def calls(self) -> List[CallMetrics]:
+        """
+        Get the measurements of every recorded call.
+
+        Returns:
+            List[CallMetrics]: The measurements in completion order.
+        """
+        with self._lock:
+            return list(self._calls)
+
+    def summary(self) -> Dict[str, Dict]:
+        """
+        Aggregate the recorded calls per phase.
+
+        Returns:
+            Dict[str, Dict]: Calls, tokens, retries, cache hits/misses, errors and latency
+            statistics for every phase.
+        """
+        phases = {}
+        for call in self.calls():
+            phases.setdefault(call.phase or "unknown", []).append(call)
+
+        summary = {}
+        for phase, calls in phases.items():
+            latencies = [call.latency_s for call in calls]
+            ttfbs = [call.ttfb_s for call in calls if call.ttfb_s is not None]
+            ttfts = [call.ttft_s for call in calls if call.ttft_s is not None]
+            summary[phase] = {
+                "calls": len(calls),
+                "turns": len({call.turn for call in calls}),
+                "request_tokens": sum(call.request_tokens or 0 for call in calls),
+                "response_tokens": sum(call.response_tokens or 0 for call in calls),
+                "retries": sum(call.retries for call in calls),
+                "cache_hits": sum(call.cache_hit for call in calls),
+                "cache_misses": sum(not call.cache_hit for call in calls),
+                "errors": sum(call.error for call in calls),
+                "latency_total_s": sum(latencies),
+                "latency_p50_s": _percentile(latencies, 50),
+                "latency_p95_s": _percentile(latencies, 95),
+                "ttfb_mean_s": sum(ttfbs) / len(ttfbs) if ttfbs else None,
+                "ttft_mean_s": sum(ttfts) / len(ttfts) if ttfts else None,
+                "ttft_p95_s": _percentile(ttfts, 95) if ttfts else None,
+            }
+        return summary
+
+    def export_json(self, path: str) -> None:
+        """
+        Write the per-phase summary and every call to a JSON file.
+
+        Args:
+            path (str): The path to the JSON file.
+        """
+        with open(path, "w", encoding="utf-8") as metrics_file:
+            json.dump({"summary": self.summary(), "calls": [asdict(call) for call in self.calls()]},
+                      metrics_file, indent=2)
+
+    def to_prometheus(self) -> str:
+        """
+        Render the recorded calls in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics, labelled by phase, role and model.
+        """
+        series = {}
+        for call in self.calls():
+            labels = (call.phase or "unknown", call.role or "unknown", call.model or "unknown")
+            values = series.setdefault(labels, {
+                "requests": 0, "cache_hits": 0, "errors": 0, "retries": 0, "request_tokens": 0,
+                "response_tokens": 0, "latency_sum": 0.0, "ttfb_sum": 0.0, "ttfb_count": 0,
+                "ttft_sum": 0.0, "ttft_count": 0,
+            })
+            values["requests"] += 1
+            values["cache_hits"] += call.cache_hit
+            values["errors"] += call.error
+            values["retries"] += call.retries
+            values["request_tokens"] += call.request_tokens or 0
+            values["response_tokens"] += call.response_tokens or 0
+            values["latency_sum"] += call.latency_s
+            if call.ttfb_s is not None:
+                values["ttfb_sum"] += call.ttfb_s
+                values["ttfb_count"] += 1
+            if call.ttft_s is not None:
+                values["ttft_sum"] += call.ttft_s
+                values["ttft_count"] += 1
+
+        metrics = [
+            ("agent_llm_requests_total", "counter", "LLM requests sent.", "requests"),
+            ("agent_llm_cache_hits_total", "counter", "LLM requests served from the response cache.", "cache_hits"),
+            ("agent_llm_errors_total", "counter", "LLM requests that returned an error.", "errors"),
+            ("agent_llm_retries_total", "counter", "Retried LLM request attempts.", "retries"),
+            ("agent_llm_request_tokens_total", "counter", "Tokens sent to the LLM.", "request_tokens"),
+            ("agent_llm_response_tokens_total", "counter", "Tokens received from the LLM.", "response_tokens"),
+        ]
+        lines = []
+        for name, metric_type, help_text, key in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, values in series.items():
+                lines.append(f"{name}{{{self._render_labels(labels)}}} {values[key]}")
+        for name, help_text, sum_key, count_key in [
+            ("agent_llm_latency_seconds", "Total latency of LLM requests.", "latency_sum", "requests"),
+            ("agent_llm_ttfb_seconds", "Time to first byte of LLM responses.", "ttfb_sum", "ttfb_count"),
+            ("agent_llm_ttft_seconds", "Time to first token of streamed LLM responses.", "ttft_sum", "ttft_count"),
+        ]:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} summary")
+            for labels, values in series.items():
+                rendered = self._render_labels(labels)
+                lines.append(f"{name}_sum{{{rendered}}} {values[sum_key]}")
+                lines.append(f"{name}_count{{{rendered}}} {values[count_key]}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_labels(labels) -> str:
+        phase, role, model = labels
+        return f'phase="{_escape_label(phase)}",role="{_escape_label(role)}",model="{_escape_label(model)}"'
+
+    def export_prometheus(self, path: str) -> None:
+        """
+        Write the metrics in the Prometheus text exposition format.
+
+        Args:
+            path (str): The path to the text file.
+        """
+        with open(path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(self.to_prometheus())
+
+
+@contextmanager
+def metrics_context(**labels):
+    """
+    Attach labels, and optionally the recorder, to the LLM calls made inside the block.
+
+    Args:
+        **labels: recorder (MetricsRecorder), phase (str), turn (int) and role (str).
+    """
+    token = _metrics_labels.set({**_metrics_labels.get(), **labels})
+    try:
+        yield
+    finally:
+        _metrics_labels.reset(token)
+
+
+@contextmanager
+def track_call(provider: str, model: str):
+    """
+    Measure an LLM call and record it with the recorder of the current metrics context.
+
+    Args:
+        provider (str): The provider name, e.g. "openai".
+        model (str): The model name.
+
+    Yields:
+        CallMetrics: The measurements, to be annotated with tokens, cache hits and errors.
+    """
+    labels = _metrics_labels.get()
+    call = CallMetrics(phase=labels.get("phase"), turn=labels.get("turn"), role=labels.get("role"),
+                       provider=provider, model=model)
+    token = _current_call.set(call)
+    start = time.perf_counter()
+    start_token = _call_started.set(start)
+    try:
+        yield call
+    finally:
+        call.latency_s = time.perf_counter() - start
+        if call.ttfb_s is None:
+            call.ttfb_s = call.latency_s
+        _call_started.reset(start_token)
+        _current_call.reset(token)
+        recorder = labels.get("recorder")
+        if recorder is not None:
+            recorder.record(call)
+
+
+def get_metrics_labels() -> Dict:
+    """
+    Get the labels attached to the LLM calls made in the current thread or asyncio task.
+
+    Returns:
+        Dict: The labels set by the enclosing metrics_context blocks, e.g. phase, turn and role.
+    """
+    return dict(_metrics_labels.get())
+
+
+def get_current_call() -> Optional[CallMetrics]:
+    """
+    Get the measurements of the LLM call in progress, if any.
+
+    Returns:
+        Optional[CallMetrics]: The call being measured by track_call.
+    """
+    return _current_call.get()
+
+
+def mark_first_token() -> None:
+    """
+    Record the time to first token, and first byte, of the streamed call in progress.
+    """
+    call = _current_call.get()
+    if call is not None and call.ttft_s is None:
+        call.ttft_s = time.perf_counter() - _call_started.get()
+        if call.ttfb_s is None:
+            call.ttfb_s = call.ttft_s
+
+
+def count_retry(retry_state) -> None:
+    """
+    tenacity before_sleep hook counting retries on the call in progress.
+    """
+    call = _current_call.get()
+    if call is not None:
+        call.retries += 1